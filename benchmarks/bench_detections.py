@@ -0,0 +1,86 @@
+"""
+Benchmark: per-box Python post-processing vs. the vectorized Detections type.
+
+Replays what get_object_detections did per box (tolist, int, float, names
+lookup, dicts, sort) against Detections.from_yolo + filter_classes + top_k +
+centers, on synthetic YOLO outputs with a growing number of boxes.
+
+    python benchmarks/bench_detections.py --counts 10 100 300 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+from detections import Detections
+
+NAMES = {i: f"class_{i}" for i in range(80)}
+NAMES[47], NAMES[49] = "apple", "orange"
+
+
+class FakeBoxes:
+    """Mimics ultralytics.engine.results.Boxes for N random boxes."""
+
+    def __init__(self, count):
+        xy = torch.rand(count, 2) * 600
+        wh = torch.rand(count, 2) * 100 + 1
+        self.xyxy = torch.cat([xy, xy + wh], dim=1)
+        self.conf = torch.rand(count)
+        self.cls = torch.randint(0, 80, (count,)).float()
+        self.data = torch.cat([self.xyxy, self.conf[:, None], self.cls[:, None]], dim=1)
+
+
+class FakeResult:
+    def __init__(self, count):
+        self.boxes = FakeBoxes(count)
+        self.names = NAMES
+
+
+def loop_postprocess(result, object_name):
+    """The old per-box loop from get_object_detections, without drawing."""
+    detections = []
+    for box, label, score in zip(result.boxes.xyxy, result.boxes.cls, result.boxes.conf):
+        detected_object_name = NAMES[int(label)]
+        x1, y1, x2, y2 = map(int, box.tolist())
+        if detected_object_name == object_name:
+            detections.append({'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'score': float(score)})
+    detections = sorted(detections, key=lambda x: -x['score'])
+    if detections:
+        return [detections[0]['x1'] + (detections[0]['x2'] - detections[0]['x1']) // 2,
+                detections[0]['y1'] + (detections[0]['y2'] - detections[0]['y1']) // 2]
+    return None
+
+
+def vectorized_postprocess(result, object_name):
+    """The same work with the Detections type."""
+    detections = Detections.from_yolo(result, NAMES).filter_classes([object_name]).top_k(1)
+    if len(detections):
+        return detections.centers()[0]
+    return None
+
+
+def time_per_call(fn, result, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(result, "apple")
+    return 1e6 * (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 10, 50, 100, 300, 1000])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} | {'loop (us)':>10} | {'vectorized (us)':>15} | {'speed-up':>8}")
+    for count in args.counts:
+        result = FakeResult(count)
+        loop_us = time_per_call(loop_postprocess, result, args.repeats)
+        vector_us = time_per_call(vectorized_postprocess, result, args.repeats)
+        print(f"{count:>6} | {loop_us:10.1f} | {vector_us:15.1f} | {loop_us / vector_us:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: DETR throughput (images/sec) by batch size.
+
+Runs detect_objects_batch over the sample images in use_cases/images/
+(repeated to --count images) for each batch size, and compares the
+vectorized post-processing with DetrImageProcessor.post_process_object_detection.
+Nothing is plotted, so matplotlib is never imported.
+
+    python benchmarks/bench_detr_batch.py --batch-sizes 1 2 4 8 16 --count 32
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import torch
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+os.environ["VLM_RESULT_CACHE"] = "off"  # Measure the models, not result-cache lookups
+from model_registry import get_model
+from pkg_transformers_Detr import detect_objects_batch, postprocess_batch
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images")
+
+
+def bench_postprocess(batch_size, repeats=50, queries=100, classes=92):
+    """Times the processor's per-image post-processing against postprocess_batch on random outputs."""
+    _, processor = get_model("detr")
+
+    class Outputs:
+        logits = torch.randn(batch_size, queries, classes)
+        pred_boxes = torch.rand(batch_size, queries, 4)
+
+    sizes = torch.tensor([[640, 480]] * batch_size)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        processor.post_process_object_detection(Outputs, target_sizes=sizes.flip(1), threshold=0.5)
+    processor_ms = 1000 * (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        postprocess_batch(Outputs.logits, Outputs.pred_boxes, sizes, threshold=0.5)
+    vectorized_ms = 1000 * (time.perf_counter() - start) / repeats
+    return processor_ms, vectorized_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--count", type=int, default=32, help="Images per measurement")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Directory with sample images")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    samples = [Image.open(path).convert("RGB") for path in paths]
+    images = [samples[i % len(samples)] for i in range(args.count)]
+
+    detect_objects_batch(images[:1], args.threshold)  # Load and warm up outside the measurement
+    print(f"{'batch':>5} | {'images/s':>8} | {'ms/image':>8} | {'post-process ms (processor / vectorized)':>40}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            detect_objects_batch(images[i:i + batch_size], args.threshold)
+        elapsed = time.perf_counter() - start
+        processor_ms, vectorized_ms = bench_postprocess(batch_size)
+        print(f"{batch_size:5d} | {len(images) / elapsed:8.2f} | {1000 * elapsed / len(images):8.1f} | "
+              f"{processor_ms:19.2f} / {vectorized_ms:.2f}")
+
+if __name__ == "__main__":
+    main()
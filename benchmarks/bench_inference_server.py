@@ -0,0 +1,86 @@
+"""
+Benchmark: aggregate throughput of the inference server with concurrent clients.
+
+Start the server first (python use_cases/inference_server.py), then run N
+client threads for each concurrency level. Each client sends requests for
+the sample images back to back. With one client every request is its own
+batch, like a standalone script; with more clients the server batches them.
+Start the server with VLM_RESULT_CACHE=off so repeated images reach the models.
+
+    python benchmarks/bench_inference_server.py --model yolo --clients 1 2 4 8 --requests 20
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+from frame_pipeline import LatencyStats
+from inference_server import InferenceClient, encode_image
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images")
+PARAMS = {"yolo": {}, "detr": {"threshold": 0.9}, "blip": {"preset": "fast"},
+          "vilt": {"question": "What color is the cat?"}}
+
+
+def run_client(url, model, images, count, stats, errors):
+    client = InferenceClient(url)
+    for i in range(count):
+        start = time.perf_counter()
+        try:
+            client.request(model, images[i % len(images)], **PARAMS[model])
+            stats.record("request", time.perf_counter() - start)
+        except RuntimeError:
+            errors.append(i)  # Rejected by backpressure (503) or failed
+    client.close()
+
+
+def server_stats(url, model):
+    if url.startswith("unix:"):
+        return {}
+    with urllib.request.urlopen(url.rstrip("/") + "/stats") as response:
+        return json.loads(response.read()).get(model, {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="Server URL or unix:/path/to/socket")
+    parser.add_argument("--model", default="yolo", choices=list(PARAMS))
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--images", default=IMAGES_DIR)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(encode_image(f.read()))  # Already encoded; sent as-is
+
+    run_client(args.url, args.model, images, 2, LatencyStats(), [])  # Warm-up
+    print(f"{'clients':>7} | {'req/s':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'rejected':>8} | {'mean batch':>10}")
+    for clients in args.clients:
+        stats, errors = LatencyStats(window=clients * args.requests), []
+        before = server_stats(args.url, args.model)
+        threads = [threading.Thread(target=run_client, args=(args.url, args.model, images, args.requests, stats,
+                                                              errors)) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        after = server_stats(args.url, args.model)
+        batches = after.get("batches", 0) - before.get("batches", 0)
+        served = after.get("requests", 0) - before.get("requests", 0)
+        summary = stats.summary().get("request", {"p50_ms": 0.0, "p95_ms": 0.0})
+        print(f"{clients:7d} | {(clients * args.requests - len(errors)) / elapsed:7.2f} | {summary['p50_ms']:7.1f} | "
+              f"{summary['p95_ms']:7.1f} | {len(errors):8d} | {served / batches if batches else 0:10.2f}")
+
+if __name__ == "__main__":
+    main()
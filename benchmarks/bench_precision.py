@@ -0,0 +1,137 @@
+"""
+Accuracy-vs-latency report for the precision modes (fp32 / bf16 / int8).
+
+Runs YOLO, DETR, BLIP and ViLT on the sample images in use_cases/images/
+once per precision and compares every result with fp32:
+detections by class-matched IoU >= 0.5 (F1), captions by exact match,
+VQA answers by agreement. In int8 mode YOLO runs a weight-quantized ONNX
+export; it has no bf16 mode, so its bf16 row is fp32.
+
+    python benchmarks/bench_precision.py --precisions fp32 bf16 int8 --json precision_report.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+os.environ["VLM_RESULT_CACHE"] = "off"  # Measure the models, not result-cache lookups
+import detection_yolo8
+import pkg_transformers_Detr
+from model_registry import PRECISIONS, registry
+from pkg_transformers_Blip import generate_caption
+from pkg_transformers_Vilt import VqaSession
+
+QUESTIONS = ["How many animals are there?", "What color is the cat?", "Where was this image taken?"]
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images")
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) x1, y1, x2, y2 boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def detection_f1(reference, detections, iou_threshold=0.5):
+    """F1 score of `detections` against `reference`, matching boxes of the same class greedily."""
+    if len(reference) == 0 and len(detections) == 0:
+        return 1.0
+    if len(reference) == 0 or len(detections) == 0:
+        return 0.0
+    iou = box_iou(reference.boxes, detections.boxes)
+    iou[reference.class_ids[:, None] != detections.class_ids[None, :]] = 0
+    matches = 0
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        iou[i, :] = 0
+        iou[:, j] = 0
+        matches += 1
+    return 2 * matches / (len(reference) + len(detections))
+
+
+def timed(fn, repeats):
+    fn()  # First call after loading may still pay lazy initialization
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, 1000 * (time.perf_counter() - start) / repeats
+
+
+def run_precision(precision, images, repeats):
+    """Returns {task: {"latency_ms": ..., "outputs": [...]}} for one precision."""
+    registry.default_dtype = precision
+    report = {"yolo": [], "detr": [], "blip": [], "vilt": []}
+    latency = {task: 0.0 for task in report}
+
+    for path, image in images:
+        bgr = cv2.imread(path)
+        result, ms = timed(lambda: detection_yolo8.detect_objects(bgr), repeats)
+        report["yolo"].append(result)
+        latency["yolo"] += ms
+
+        result, ms = timed(lambda: pkg_transformers_Detr.detect_objects(image, threshold=0.9), repeats)
+        report["detr"].append(result)
+        latency["detr"] += ms
+
+        result, ms = timed(lambda: generate_caption(image), repeats)
+        report["blip"].append(result)
+        latency["blip"] += ms
+
+        result, ms = timed(lambda: VqaSession().answer(image, QUESTIONS), repeats)
+        report["vilt"].extend(result)
+        latency["vilt"] += ms
+
+    for name in ("yolo", "blip", "detr", "vilt"):
+        registry.evict(name, dtype=precision)
+    return {task: {"latency_ms": latency[task] / len(images), "outputs": report[task]} for task in report}
+
+
+def agreement(task, reference, outputs):
+    if task in ("yolo", "detr"):
+        return float(np.mean([detection_f1(r, o) for r, o in zip(reference, outputs)]))
+    return float(np.mean([r == o for r, o in zip(reference, outputs)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--images", default=IMAGES_DIR, help="Directory with sample images")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    images = [(path, Image.open(path).convert("RGB")) for path in paths]
+    precisions = ["fp32"] + [p for p in args.precisions if p != "fp32"]  # fp32 is the reference
+
+    results = {precision: run_precision(precision, images, args.repeats) for precision in precisions}
+    reference = results["fp32"]
+
+    rows = []
+    print(f"{'task':>6} | {'precision':>9} | {'latency (ms)':>12} | {'speed-up':>8} | {'agreement':>9}")
+    for task in ("yolo", "detr", "blip", "vilt"):
+        for precision in precisions:
+            r = results[precision][task]
+            row = {"task": task, "precision": precision, "latency_ms": r["latency_ms"],
+                   "speedup": reference[task]["latency_ms"] / r["latency_ms"],
+                   "agreement": agreement(task, reference[task]["outputs"], r["outputs"])}
+            rows.append(row)
+            print(f"{task:>6} | {precision:>9} | {row['latency_ms']:12.1f} | {row['speedup']:7.2f}x | "
+                  f"{row['agreement']:9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
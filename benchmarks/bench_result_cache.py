@@ -0,0 +1,69 @@
+"""
+Benchmark: result-cache lookups vs. inference for YOLO, DETR, BLIP and ViLT.
+
+Runs each model over the sample images three times against a fresh cache
+database: cold (every image is inferred and stored), warm (served from the
+in-memory LRU) and from disk (a new cache instance, as in a repeat run).
+
+    python benchmarks/bench_result_cache.py --models yolo detr blip vilt
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+os.environ["VLM_RESULT_CACHE"] = os.path.join(tempfile.mkdtemp(), "results.sqlite")  # Start from an empty cache
+import detection_yolo8
+import result_cache
+from model_registry import get_model
+from pkg_transformers_Blip import generate_caption
+from pkg_transformers_Detr import detect_objects
+from pkg_transformers_Vilt import VqaSession
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images")
+QUESTION = "What color is the cat?"
+
+
+def run_model(model, paths):
+    for path in paths:
+        if model == "yolo":
+            detection_yolo8.detect_objects(cv2.imread(path))
+            continue
+        image = Image.open(path).convert("RGB")
+        if model == "detr":
+            detect_objects(image)
+        elif model == "blip":
+            generate_caption(image)
+        else:
+            VqaSession().answer(image, [QUESTION])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=["yolo", "detr", "blip", "vilt"],
+                        choices=["yolo", "detr", "blip", "vilt"])
+    parser.add_argument("--images", default=IMAGES_DIR)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    print(f"{'model':>5} | {'cold ms/img':>11} | {'memory ms/img':>13} | {'disk ms/img':>11}")
+    for model in args.models:
+        get_model(model)  # Keep model loading out of the cold timing
+        timings = []
+        for phase in ("cold", "memory", "disk"):
+            if phase == "disk":
+                result_cache._result_cache = None  # Reopen, dropping the in-memory LRU
+            start = time.perf_counter()
+            run_model(model, paths)
+            timings.append(1000 * (time.perf_counter() - start) / len(paths))
+        print(f"{model:>5} | {timings[0]:11.1f} | {timings[1]:13.2f} | {timings[2]:11.2f}")
+    result_cache.get_result_cache().report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: ViLT per-question latency with and without the shared image embedding.
+
+Compares the old path (processor + full model call per question) with
+VqaSession for the first question on an image, later questions, and all
+questions answered in one batch.
+
+    python benchmarks/bench_vilt_session.py --image use_cases/images/cat_dogs.jpg
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+os.environ["VLM_RESULT_CACHE"] = "off"  # Measure the models, not result-cache lookups
+from model_registry import get_model, prepare_inputs
+from pkg_transformers_Vilt import VqaSession
+
+QUESTIONS = [
+    "Where was this image taken?",
+    "What do you see on the ground?",
+    "Name the animals in this image.",
+    "How many cats do you see in this image?",
+    "What color is the cat?",
+    "What color is the right dog?",
+    "Which animal is the funniest in this image?"
+]
+
+
+def answer_uncached(image, question):
+    """The old answer_question: full preprocessing and forward pass per question."""
+    model, processor = get_model("vilt")
+    encoding = prepare_inputs(processor(image, question, return_tensors="pt"), model)
+    with torch.no_grad():
+        outputs = model(**encoding)
+    return model.config.id2label[outputs.logits.argmax(-1).item()]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, 1000 * (time.perf_counter() - start)
+
+
+def main():
+    default_image = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images", "cat_dogs.jpg")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", default=default_image)
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB")
+    answer_uncached(image, QUESTIONS[0])  # Warm-up
+
+    uncached = [timed(lambda: answer_uncached(image, q))[1] for q in QUESTIONS]
+
+    session = VqaSession()
+    cached = [timed(lambda: session.answer(image, [q]))[1] for q in QUESTIONS]
+
+    batch_session = VqaSession()
+    _, batched = timed(lambda: batch_session.answer(image, QUESTIONS))
+
+    agree = sum(answer_uncached(image, q) == a for q, a in zip(QUESTIONS, session.answer(image, QUESTIONS)))
+    print(f"{'path':>24} | {'first (ms)':>10} | {'later avg (ms)':>14}")
+    print(f"{'uncached':>24} | {uncached[0]:10.1f} | {sum(uncached[1:]) / len(uncached[1:]):14.1f}")
+    print(f"{'session':>24} | {cached[0]:10.1f} | {sum(cached[1:]) / len(cached[1:]):14.1f}")
+    print(f"{'session, one batch':>24} | {batched:10.1f} | {batched / len(QUESTIONS):14.1f} (per question)")
+    print(f"Answers identical to the uncached path: {agree}/{len(QUESTIONS)}")
+
+if __name__ == "__main__":
+    main()
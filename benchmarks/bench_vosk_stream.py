@@ -0,0 +1,49 @@
+"""
+Benchmark: streaming Vosk recognition of a recorded WAV file.
+
+Feeds the file through StreamingRecognizer as fast as it can decode (or at
+real-time pace with --realtime) and reports the real-time factor, the
+number of partial/final events and when the first partial arrived.
+
+    python benchmarks/bench_vosk_stream.py recordings/command.wav --block 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+from speech_2_text_offline import StreamingRecognizer, WavSource, load_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wav", help="16-bit mono WAV file")
+    parser.add_argument("--block", type=float, default=0.1, help="Seconds of audio per block")
+    parser.add_argument("--realtime", action="store_true", help="Pace the audio like a live microphone")
+    parser.add_argument("--no-partials", action="store_true", help="Only decode final results")
+    args = parser.parse_args()
+
+    load_model()
+    source = WavSource(args.wav, block_seconds=args.block, realtime=args.realtime)
+    recognizer = StreamingRecognizer(source, partials=not args.no_partials)
+
+    counts = {"partial": 0, "final": 0}
+    first_partial = None
+    start = time.perf_counter()
+    recognizer.start()
+    for event in recognizer.events():
+        counts[event.kind] += 1
+        if event.kind == "partial" and first_partial is None:
+            first_partial = time.perf_counter() - start
+        if event.kind == "final":
+            print(f"[{event.audio_seconds:7.2f} s] {event.text}")
+    recognizer.join()
+
+    print(f"\n{counts['partial']} partial and {counts['final']} final events")
+    if first_partial is not None:
+        print(f"First partial after {first_partial * 1000:.0f} ms")
+    recognizer.report()
+
+if __name__ == "__main__":
+    main()
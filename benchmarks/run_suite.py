@@ -0,0 +1,383 @@
+"""
+End-to-end benchmark suite on recorded fixtures; no camera or microphone needed.
+
+Frame fixtures are a directory of images (default: use_cases/images/) or a
+video file. They are replayed through the camera pipeline. WAV fixtures
+replace the microphone; if none are given, the TTS stage synthesizes spoken
+commands and those WAVs are reused. The real detection, VQA, captioning,
+ASR and TTS code paths run on them.
+
+Each stage runs in its own process, so peak RSS and model load time are
+per stage. Throughput, p50/p95/p99 latency, peak RSS and model load time
+are written as JSON. With --compare, every metric is checked against a
+stored baseline; the script exits with status 1 if any metric regressed by
+more than --tolerance.
+
+    python benchmarks/run_suite.py --output baseline.json
+    python benchmarks/run_suite.py --output current.json --compare baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+os.environ["VLM_RESULT_CACHE"] = "off"  # Measure the models, not result-cache lookups
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "robotics"))
+from frame_pipeline import (Frame, FrameCapture, ImageSequenceCapture, InferenceWorker, LatencyStats, LatestQueue,
+                            open_capture)
+from model_registry import registry
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases", "images")
+FIXTURES_DIR = os.path.join(tempfile.gettempdir(), "vlm_bench_fixtures")
+QUESTIONS = ["How many animals are there?", "What color is the cat?", "Where was this image taken?"]
+PHRASES = ["Follow the orange.", "Can you follow the apple?", "Stop tracking."]
+
+# Metrics compared against the baseline and whether higher values are better
+COMPARED_METRICS = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False,
+                    "peak_rss_mb": False, "load_seconds": False}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KiB elsewhere
+
+
+def load_images(directory):
+    from PIL import Image
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith((".jpg", ".jpeg", ".png")))
+    return [Image.open(path).convert("RGB") for path in paths]
+
+
+def audio_fixtures(args):
+    """
+    Returns the WAV fixtures as 16 kHz float32 arrays, synthesizing spoken commands if none were given.
+
+    Returns:
+        list: (name, audio) pairs.
+    """
+    from batch_transcribe import decode_audio
+    paths = args.wav
+    if not paths:
+        from tts_worker import SpeechWorker
+        worker = SpeechWorker(cache_dir=FIXTURES_DIR, play=False)  # Cached on disk, so later stages reuse them
+        worker.start()
+        for phrase in PHRASES:
+            worker.say(phrase)
+        worker.wait()
+        paths = [worker.cache_path(phrase) for phrase in PHRASES]
+
+    fixtures = []
+    for path in paths:
+        with open(path, "rb") as f:
+            fixtures.append((os.path.basename(path), decode_audio(f.read()).astype("float32") / 32768.0))
+    return fixtures
+
+
+def stage_detection(args):
+    """
+    YOLO through the capture -> inference pipeline, fed by replayed frames at camera rate.
+
+    Replay is paced at --camera-fps like a real camera, so the capture thread
+    does not spin a core and skew the measurement.
+    """
+    from detection_yolo8_camera import detect_frame
+    from frame_buffers import FrameRing
+    from model_registry import get_model
+
+    get_model("yolo")
+    if os.path.isdir(args.frames):
+        # Typical webcam resolution and frame rate
+        cap = ImageSequenceCapture(args.frames, fps=args.camera_fps, size=(640, 480))
+    else:
+        cap = open_capture(args.frames)  # Played at the video's own frame rate
+
+    stats = LatencyStats(window=args.count)
+    frames = LatestQueue(maxsize=1, on_drop=Frame.release)
+    results = LatestQueue(maxsize=1, on_drop=Frame.release)
+    capture = FrameCapture(cap, frames, ring=FrameRing(size=5))
+    worker = InferenceWorker(frames, results, lambda frame: detect_frame(frame.image), stats)
+    capture.start()
+    worker.start()
+
+    start = time.perf_counter()
+    for _ in range(args.count):
+        frame = results.get(timeout=60)
+        stats.record("frame_age", time.perf_counter() - frame.captured_at)
+        frame.release()
+    seconds = time.perf_counter() - start
+    capture.stop()
+    worker.stop()
+    capture.join()
+    worker.join()
+    cap.release()
+    return {"stats": stats, "latency_stage": "inference", "items": args.count, "seconds": seconds,
+            "frames_dropped": frames.dropped}
+
+
+def _timed_loop(stats, stage, calls):
+    """Runs each call, recording its latency; returns the total seconds."""
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        stats.record(stage, time.perf_counter() - call_start)
+    return time.perf_counter() - start
+
+
+def stage_detr(args):
+    """DETR detection on each still image."""
+    from pkg_transformers_Detr import detect_objects
+    images = load_images(args.images)
+    detect_objects(images[0])  # Load and warm up outside the measurement
+    stats = LatencyStats()
+    calls = [lambda image=image: detect_objects(image) for image in images] * args.repeats
+    return {"stats": stats, "latency_stage": "detect", "items": len(calls),
+            "seconds": _timed_loop(stats, "detect", calls)}
+
+
+def stage_vqa(args):
+    """ViLT answering QUESTIONS per image; the first pass on an image includes its embedding."""
+    from pkg_transformers_Vilt import VqaSession
+    images = load_images(args.images)
+    VqaSession().answer(images[0], QUESTIONS[:1])
+    stats = LatencyStats()
+    calls = []
+    for _ in range(args.repeats):
+        session = VqaSession()  # New session per repeat, so image embeddings are recomputed
+        calls += [lambda image=image, question=question, session=session: session.answer(image, [question])
+                  for image in images for question in QUESTIONS]
+    return {"stats": stats, "latency_stage": "question", "items": len(calls),
+            "seconds": _timed_loop(stats, "question", calls)}
+
+
+def stage_caption(args):
+    """BLIP captioning with the 'fast' preset on each still image."""
+    from pkg_transformers_Blip import generate_caption
+    images = load_images(args.images)
+    generate_caption(images[0])
+    stats = LatencyStats()
+    calls = [lambda image=image: generate_caption(image) for image in images] * args.repeats
+    return {"stats": stats, "latency_stage": "caption", "items": len(calls),
+            "seconds": _timed_loop(stats, "caption", calls)}
+
+
+def stage_tts(args):
+    """Time to first audio for each phrase, synthesized cold and then served from the cache."""
+    from tts_worker import SpeechWorker
+    with tempfile.TemporaryDirectory() as cache_dir:
+        worker = SpeechWorker(cache_dir=cache_dir, play=False)
+        worker.start()
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            for phrase in PHRASES:
+                worker.say(phrase)
+                worker.wait()
+        seconds = time.perf_counter() - start
+    return {"stats": worker.stats, "latency_stage": "first_audio", "items": args.repeats * len(PHRASES),
+            "seconds": seconds, "cache_hits": worker.cache_hits, "cache_misses": worker.cache_misses}
+
+
+def stage_asr_whisper(args):
+    """Streaming Whisper on the WAV fixtures, fed as fast as it decodes."""
+    from speech_2_text_whisper import ArrayBuffer, StreamingTranscriber
+    fixtures = audio_fixtures(args)
+    transcriber = StreamingTranscriber(model_size=args.whisper_size, language="en")
+    stats = LatencyStats()
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        for _, audio in fixtures:
+            file_start = time.perf_counter()
+            for _ in transcriber.stream(ArrayBuffer(audio)):
+                pass
+            stats.record("transcribe", time.perf_counter() - file_start)
+            audio_seconds += len(audio) / 16000
+    seconds = time.perf_counter() - start
+    return {"stats": stats, "latency_stage": "transcribe", "items": args.repeats * len(fixtures),
+            "seconds": seconds, "real_time_factor": seconds / audio_seconds}
+
+
+def stage_asr_vosk(args):
+    """Streaming Vosk on the WAV fixtures, fed as fast as it decodes."""
+    from speech_2_text_offline import ArraySource, StreamingRecognizer, load_model
+    fixtures = audio_fixtures(args)
+    load_model()
+    stats = LatencyStats()
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        for _, audio in fixtures:
+            recognizer = StreamingRecognizer(ArraySource(audio))
+            file_start = time.perf_counter()
+            recognizer.start()
+            for _ in recognizer.events():
+                pass
+            recognizer.join()
+            stats.record("transcribe", time.perf_counter() - file_start)
+            audio_seconds += recognizer.audio_seconds
+    seconds = time.perf_counter() - start
+    return {"stats": stats, "latency_stage": "transcribe", "items": args.repeats * len(fixtures),
+            "seconds": seconds, "real_time_factor": seconds / audio_seconds}
+
+
+def stage_command(args):
+    """CommandListener replaying the fixtures at microphone pace: end of speech to recognized command."""
+    import numpy as np
+    from command_listener import CommandListener
+    fixtures = audio_fixtures(args)
+    gap = np.zeros(16000, dtype=np.float32)  # One second of silence between commands
+    audio = np.concatenate([part for _, clip in fixtures for part in (gap, clip)] + [gap])
+
+    listener = CommandListener(model_size=args.whisper_size)
+    stats = LatencyStats()
+    recognized = 0
+    start = time.perf_counter()
+    listener.start(audio=audio)
+    deadline = start + len(audio) / 16000 + 10
+    while recognized < len(fixtures) and time.perf_counter() < deadline:
+        if listener.get(timeout=0.5) is not None:
+            recognized += 1
+            stats.record("command", listener.last_latency)
+    seconds = time.perf_counter() - start
+    listener.stop()
+    return {"stats": stats, "latency_stage": "command", "items": recognized, "seconds": seconds,
+            "commands_expected": len(fixtures)}
+
+
+STAGES = {
+    "detection": stage_detection,
+    "detr": stage_detr,
+    "vqa": stage_vqa,
+    "caption": stage_caption,
+    "tts": stage_tts,
+    "asr_whisper": stage_asr_whisper,
+    "asr_vosk": stage_asr_vosk,
+    "command": stage_command,
+}
+
+
+def run_stage(name, args):
+    """Runs one stage in this process and returns its metrics."""
+    try:
+        result = STAGES[name](args)
+    except Exception as e:
+        print(f"Error running stage {name}: {e}")
+        return {"error": str(e)}
+
+    stats, latency_stage = result.pop("stats"), result.pop("latency_stage")
+    summary = stats.summary()
+    metrics = {key: value for key, value in summary.get(latency_stage, {}).items() if key != "count"}
+    metrics.update({
+        "items": result.pop("items"),
+        "seconds": result.pop("seconds"),
+        "peak_rss_mb": peak_rss_mb(),
+        "load_seconds": sum(s["load_seconds"] + s["warmup_seconds"] for s in registry.stats().values()),
+        "other_latency": {stage: s for stage, s in summary.items() if stage != latency_stage},
+    })
+    metrics["throughput"] = metrics["items"] / metrics["seconds"] if metrics["seconds"] else None
+    metrics.update(result)
+    return metrics
+
+
+def run_isolated(name, args):
+    """Runs one stage in a fresh interpreter, so its peak RSS and model loads are its own."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "stage.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "--in-process", "--stages", name, "--output", output,
+               "--frames", args.frames, "--images", args.images, "--count", str(args.count),
+               "--repeats", str(args.repeats), "--whisper-size", args.whisper_size,
+               "--camera-fps", str(args.camera_fps)]
+        if args.wav:
+            cmd += ["--wav"] + args.wav
+        if subprocess.run(cmd).returncode != 0 or not os.path.exists(output):
+            return {"error": "stage process failed"}
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)["stages"][name]
+
+
+def compare(current, baseline, tolerance):
+    """
+    Prints every compared metric next to the baseline and returns the regressions.
+
+    Args:
+        current (dict): Report from this run.
+        baseline (dict): Stored report.
+        tolerance (float): Allowed relative change in the bad direction, e.g. 0.1 for 10 %.
+
+    Returns:
+        list: (stage, metric, baseline value, current value) per regression.
+    """
+    regressions = []
+    print(f"\n{'stage':>12} | {'metric':>12} | {'baseline':>10} | {'current':>10} | {'change':>8}")
+    for stage, metrics in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or "error" in base or "error" in metrics:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            if regressed:
+                regressions.append((stage, metric, old, new))
+            print(f"{stage:>12} | {metric:>12} | {old:10.2f} | {new:10.2f} | {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--frames", default=IMAGES_DIR, help="Frame directory or video file replayed as the camera")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Directory of still images for DETR/VQA/captioning")
+    parser.add_argument("--wav", nargs="*", default=[], help="WAV fixtures replayed as the microphone")
+    parser.add_argument("--count", type=int, default=100, help="Frames measured in the detection stage")
+    parser.add_argument("--camera-fps", type=float, default=30, help="Rate at which frame directories are replayed")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the still-image and audio fixtures")
+    parser.add_argument("--whisper-size", default="base")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Baseline JSON; exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    parser.add_argument("--in-process", action="store_true", help="Run all stages in this process (peak RSS and load time then accumulate across stages)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+                 "precision": registry.default_dtype, "args": vars(args)},
+        "stages": {},
+    }
+    for name in args.stages:
+        print(f"Running stage {name}...")
+        report["stages"][name] = run_stage(name, args) if args.in_process else run_isolated(name, args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}.")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
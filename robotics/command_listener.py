@@ -0,0 +1,217 @@
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import sounddevice as sd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+import instrumentation
+from model_registry import registry
+from speech_2_text_whisper import SAMPLE_RATE
+
+
+class CommandListener:
+    """
+    Always-on voice command listener with energy-based voice activity gating.
+
+    Audio is read continuously in a background thread. A cheap RMS gate with an
+    adaptive noise floor cuts the stream into speech segments, and only those
+    segments reach a warm Whisper model on a second thread. Recognized text is
+    published on a queue that the tracking loop can poll without blocking.
+    Commands nobody read within `max_age_seconds` (e.g. said while a menu was
+    waiting for keyboard input) are discarded rather than acted on late.
+
+    Args:
+        model_size (str): Whisper model size; small models keep command latency low.
+        block_seconds (float): Audio block length analysed by the gate.
+        energy_threshold (float): Minimum RMS (float32 samples) treated as speech.
+        noise_factor (float): Speech must also exceed the running noise floor by this factor.
+        silence_seconds (float): Trailing silence that ends a segment.
+        preroll_seconds (float): Audio kept from before speech starts, so first syllables are not cut.
+        max_segment_seconds (float): Segments are cut at this length even without silence.
+        language (str): Spoken language passed to Whisper.
+        mute (callable): Optional `mute()` returning True while audio should be ignored, e.g.
+            `SpeechWorker.is_speaking` so the robot does not hear its own voice as a command.
+        max_age_seconds (float): Recognized commands older than this are dropped unread.
+    """
+
+    def __init__(self, model_size="base", block_seconds=0.03, energy_threshold=0.01, noise_factor=3.0,
+                 silence_seconds=0.35, preroll_seconds=0.3, max_segment_seconds=6.0, language="en", mute=None,
+                 max_age_seconds=5.0):
+        self.model_size = model_size
+        self.block = int(block_seconds * SAMPLE_RATE)
+        self.energy_threshold = energy_threshold
+        self.noise_factor = noise_factor
+        self.silence_blocks = max(1, int(silence_seconds / block_seconds))
+        self.max_segment_blocks = int(max_segment_seconds / block_seconds)
+        self.language = language
+        self.mute = mute
+        self.max_age_seconds = max_age_seconds
+        self.commands = queue.Queue()  # (text, recognized at)
+        self.last_latency = None  # Seconds from end of speech to the published command
+
+        self._blocks = queue.Queue(maxsize=int(5 / block_seconds))  # (block, muted); bounded, oldest audio is dropped
+        self._segments = queue.Queue(maxsize=4)
+        self._preroll = deque(maxlen=max(1, int(preroll_seconds / block_seconds)))  # Ring buffer of recent audio
+        self._noise_floor = energy_threshold / noise_factor
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._stream = None
+        self._model = None
+
+    def start(self, audio=None):
+        """
+        Loads the warmed-up model, then starts listening in the background.
+
+        Args:
+            audio (numpy.ndarray): Optional 16 kHz float32 recording played into the listener in
+                real time instead of the microphone, so command latency can be measured without one.
+        """
+        self._model = registry.acquire(f"whisper-{self.model_size}")  # Kept resident until `stop`
+
+        self._threads = [threading.Thread(target=self._segment_loop, daemon=True),
+                         threading.Thread(target=self._recognize_loop, daemon=True)]
+        if audio is None:
+            self._stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype="float32",
+                                          blocksize=self.block, callback=self._callback)
+        else:
+            self._threads.append(threading.Thread(target=self._replay_loop, args=(audio,), daemon=True))
+        for thread in self._threads:
+            thread.start()
+        if self._stream is not None:
+            self._stream.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+        for thread in self._threads:
+            thread.join()
+        if self._model is not None:
+            self._model = None
+            registry.release(f"whisper-{self.model_size}")
+
+    def _fresh(self, item):
+        text, recognized_at = item
+        if time.perf_counter() - recognized_at > self.max_age_seconds:
+            instrumentation.count("stale_commands_dropped")
+            return None
+        return text
+
+    def poll(self):
+        """Returns the next recognized command, or None if there is none yet."""
+        while True:
+            try:
+                text = self._fresh(self.commands.get_nowait())
+            except queue.Empty:
+                return None
+            if text is not None:
+                return text
+
+    def get(self, timeout=None):
+        """Blocks until a command is recognized; returns None on timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                text = self._fresh(self.commands.get(timeout=remaining))
+            except queue.Empty:
+                return None
+            if text is not None:
+                return text
+
+    def clear(self):
+        """Discards all commands recognized so far, e.g. when a new listening turn starts."""
+        while self.poll() is not None:
+            pass
+
+    def _callback(self, indata, frames, time_info, status):
+        item = (indata[:, 0].copy(), self.mute is not None and self.mute())
+        while True:
+            try:
+                self._blocks.put_nowait(item)
+                return
+            except queue.Full:
+                # Recognizer is far behind; dropping the oldest audio beats growing latency
+                instrumentation.count("audio_blocks_dropped")
+                try:
+                    self._blocks.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _replay_loop(self, audio):
+        """Feeds a recording to the gate block by block at microphone pace, then keeps feeding silence."""
+        audio = np.asarray(audio, dtype=np.float32)
+        silence = np.zeros((self.block, 1), dtype=np.float32)
+        start = time.perf_counter()
+        for i in itertools.count():
+            if self._stop_event.is_set():
+                break
+            block = audio[i * self.block:(i + 1) * self.block]
+            self._callback(block[:, None] if len(block) == self.block else silence, self.block, None, None)
+            time.sleep(max(0.0, start + (i + 1) * self.block / SAMPLE_RATE - time.perf_counter()))
+
+    def _is_speech(self, block):
+        rms = float(np.sqrt(np.mean(block * block)))
+        speech = rms > max(self.energy_threshold, self._noise_floor * self.noise_factor)
+        if not speech:
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * rms  # Track background noise
+        return speech
+
+    def _segment_loop(self):
+        segment = []
+        silent_blocks = 0
+        while not self._stop_event.is_set():
+            try:
+                block, muted = self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if muted:  # Our own voice (or otherwise ignored audio); also discard any segment it interrupts
+                segment = []
+                self._preroll.clear()
+                continue
+
+            speech = self._is_speech(block)
+            if not segment:
+                if speech:
+                    segment = list(self._preroll) + [block]
+                    silent_blocks = 0
+                else:
+                    self._preroll.append(block)
+                continue
+
+            segment.append(block)
+            silent_blocks = 0 if speech else silent_blocks + 1
+            if silent_blocks >= self.silence_blocks or len(segment) >= self.max_segment_blocks:
+                try:
+                    self._segments.put_nowait((np.concatenate(segment), time.perf_counter()))
+                except queue.Full:
+                    instrumentation.count("speech_segments_dropped")
+                if instrumentation.enabled:
+                    instrumentation.gauge("queue_depth", self._segments.qsize(), queue="speech_segments")
+                segment = []
+                self._preroll.clear()
+
+    def _recognize_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                audio, ended_at = self._segments.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            with instrumentation.span("whisper_command"):
+                result = self._model.transcribe(audio, language=self.language, condition_on_previous_text=False,
+                                                fp16=self._model.device.type == "cuda")
+            text = result["text"].strip().lower()
+            if text:
+                self.last_latency = time.perf_counter() - ended_at
+                instrumentation.observe("command_latency", self.last_latency)
+                self.commands.put((text, time.perf_counter()))
@@ -0,0 +1,161 @@
+import difflib
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from openai import OpenAI
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+import instrumentation
+from frame_pipeline import LatencyStats
+
+
+def normalize_utterance(text):
+    """Lower-cases the utterance and strips punctuation and extra whitespace."""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+class OpenAIChatBackend:
+    """
+    Chat-completion backend that reuses one OpenAI client for every request.
+
+    Args:
+        instruction (list): Messages prepended to every utterance.
+        model (str): Chat model name.
+        timeout (float): Request timeout in seconds.
+    """
+
+    def __init__(self, instruction, model="gpt-3.5-turbo", timeout=3.0):
+        self.instruction = instruction
+        self.model = model
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(timeout=self.timeout, max_retries=0)  # Keeps its HTTP connection pool
+        return self._client
+
+    def __call__(self, utterance):
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=self.instruction + [{"role": "user", "content": utterance}]
+        )
+        return completion.choices[0].message.content
+
+
+class IntentResolver:
+    """
+    Maps an utterance to an intent with three tiers, cheapest first.
+
+    1. Keyword matcher: exact or fuzzy (difflib) match of words against each intent's keywords.
+       Used only when exactly one intent matches.
+    2. LRU cache with TTL, keyed on the normalized utterance, holding earlier LLM answers.
+    3. LLM callable for the remaining ambiguous utterances, with a timeout and a fixed fallback.
+
+    Args:
+        keywords (dict): Intent -> list of keywords, e.g. {"apple": ["apple"], "stop": ["stop", "end"]}.
+        llm (callable): Called as `llm(utterance)` and returns the intent text; None disables tier 3.
+        cache_size (int): Maximum number of cached utterances.
+        cache_ttl (float): Seconds a cached answer stays valid.
+        llm_timeout (float): Seconds to wait for the LLM before using `fallback`.
+        fuzzy_cutoff (float): Minimum difflib similarity for a fuzzy keyword match.
+        fallback (str): Intent returned when nothing else resolves the utterance.
+    """
+
+    def __init__(self, keywords, llm=None, cache_size=256, cache_ttl=300.0, llm_timeout=3.0,
+                 fuzzy_cutoff=0.8, fallback="error"):
+        self.keyword_to_intent = {keyword: intent for intent, words in keywords.items() for keyword in words}
+        self.intents = set(keywords)
+        self.llm = llm
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.llm_timeout = llm_timeout
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fallback = fallback
+        self.hits = {"keyword": 0, "cache": 0, "llm": 0, "fallback": 0}
+        self.stats = LatencyStats(window=1000, name="intent")
+        self._cache = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _match_keywords(self, words):
+        intents = set()
+        for word in words:
+            if word in self.keyword_to_intent:
+                intents.add(self.keyword_to_intent[word])
+                continue
+            close = difflib.get_close_matches(word, self.keyword_to_intent, n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                intents.add(self.keyword_to_intent[close[0]])
+        return intents.pop() if len(intents) == 1 else None
+
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        intent, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return intent
+
+    def _cache_put(self, key, intent):
+        self._cache[key] = (intent, time.monotonic() + self.cache_ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _ask_llm(self, utterance):
+        if self.llm is None:
+            return None
+        try:
+            response = self._executor.submit(self.llm, utterance).result(timeout=self.llm_timeout)
+        except FutureTimeoutError:
+            print("Intent LLM timed out.")
+            return None
+        except Exception as e:
+            print(f"Intent LLM failed: {e}")
+            return None
+        response = normalize_utterance(response or "")
+        return response if response in self.intents else None
+
+    def resolve(self, utterance):
+        """
+        Returns the intent for `utterance`, or `fallback` if it cannot be resolved.
+        """
+        start = time.perf_counter()
+        key = normalize_utterance(utterance)
+
+        tier = "keyword"
+        intent = self._match_keywords(key.split())
+        if intent is None:
+            tier = "cache"
+            intent = self._cache_get(key)
+        if intent is None:
+            tier = "llm"
+            intent = self._ask_llm(utterance)
+            if intent is not None:
+                self._cache_put(key, intent)
+        if intent is None:
+            tier = "fallback"
+            intent = self.fallback
+
+        self.hits[tier] += 1
+        instrumentation.count("intent_resolved", tier=tier)
+        self.stats.record("resolve", time.perf_counter() - start)
+        self.stats.record(tier, time.perf_counter() - start)
+        return intent
+
+    def report(self):
+        """Prints the hit rate per tier and command-resolution latency percentiles."""
+        total = max(1, sum(self.hits.values()))
+        print("Intent tiers: " + ", ".join(f"{tier} {100 * count / total:.0f}%" for tier, count in self.hits.items()))
+        self.stats.report()
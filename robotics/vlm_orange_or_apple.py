@@ -1,20 +1,48 @@
+import http.client
+import os
+import queue
+import re
+import sys
+import threading
 import time
-import speech_recognition as sr
-import cv2
-from PIL import Image
-from ultralytics import YOLO
-import pyttsx3
-from openai import OpenAI
-
-
-# Load YOLOv8 model (pre-trained on COCO dataset)
-model_yolo = YOLO("yolov8l.pt")
-
-# Initialize speech recognizer
-speech_recognizer = sr.Recognizer()
+from collections import deque
+import numpy as np
+
+# Shared helpers live next to the use-case scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+import instrumentation
+from camera_manager import get_camera
+from detections import Detections
+from frame_buffers import FrameRing
+from frame_pipeline import Frame, FrameCapture, InferenceWorker, LatencyStats, LatestQueue
+from inference_server import InferenceClient
+from model_registry import get_model, use_model
+from motion_gate import MotionGate
+from roi_tracker import DetectThenTrack
+from sinks import open_sink
+from tts_worker import get_speech_worker
+
+from command_listener import CommandListener
+from intent_resolver import IntentResolver, OpenAIChatBackend
+
+
+# Always-on voice command listener and command resolver, created on first use
+command_listener = None
+intent_resolver = None
 
 # Define trackable objects
 trackable_objects = ["apple", "orange"]
+stop_words = ["stop", "end", "halt"]
+filler_words = ["please", "ok", "okay", "now", "hey", "robot"]  # May precede a stop word
+
+# Where tracking frames are shown: window, none, video:PATH, mjpeg[:PORT] or dump:DIRECTORY (see sinks.open_sink)
+display_sink = os.environ.get("VLM_SINK", "window")
+
+# Shared inference server (use_cases/inference_server.py), e.g. http://127.0.0.1:8765; None runs YOLO in-process
+inference_server = os.environ.get("VLM_INFERENCE_SERVER")
+_server_clients = threading.local()  # One client connection per thread
+server_backoff = 5.0  # Seconds YOLO runs in-process after the server failed or answered 503 (overloaded)
+_server_retry_at = 0.0
 
 
 def move_robot_arm(x, y):
@@ -22,89 +50,207 @@ def move_robot_arm(x, y):
     print(f"Moving robot arm to coordinates: ({x}, {y})")
 
 
-def say(text):
-    """ Convert text to speech using pyttsx3. """
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 200)
-    engine.say(text)
-    engine.runAndWait()
+def say(text, interrupt=False):
+    """ Queue text for speech on the background pyttsx3 worker; returns immediately. """
+    get_speech_worker(rate=200).say(text, interrupt=interrupt)
     print("Robot says:", text)
 
 
-def get_command(message):
-    """ Generate a response using GPT-based AI model. """
-    client = OpenAI()
-    completion = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=message
-    )
-    return completion.choices[0].message.content
-
-
-def get_object_detections(frame, object_name):
-    """ Detect specified objects in a video frame using YOLOv8. """
-    detections = []
-    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    image = Image.fromarray(image)
-
-    # Run YOLOv8 inference
-    results = model_yolo(image)
-    for result in results:
-        for box, label, score in zip(result.boxes.xyxy, result.boxes.cls, result.boxes.conf):
-            rec_color = (125, 0, 0)
-            detected_object_name = model_yolo.names[int(label)]
-            x1, y1, x2, y2 = map(int, box.tolist())
-
-            if detected_object_name == object_name:
-                detections.append({'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'score': float(score)})
-                rec_color = (0, 0, 255)
-
-            # Draw bounding box
-            cv2.rectangle(frame, (x1, y1), (x2, y2), rec_color, 2)
-            cv2.putText(frame, f"{detected_object_name} ({score:.2f})", (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-    return sorted(detections, key=lambda x: -x['score'])
-
-
-def track_apple_or_orange(object_name, following_time=30):
-    """ Tracks an apple or orange using the camera for a set duration. """
-    image_center = [640 / 2, 480 / 2]
-    cap = cv2.VideoCapture(0)  # Change camera index if needed
+def get_intent_resolver():
+    """ Returns the shared intent resolver: keywords and cache first, GPT only for ambiguous commands. """
+    global intent_resolver
+    if intent_resolver is None:
+        keywords = {object_name: [object_name] for object_name in trackable_objects}
+        keywords["stop"] = stop_words
+        intent_resolver = IntentResolver(keywords, llm=OpenAIChatBackend(get_instruction()))
+    return intent_resolver
+
+
+@instrumentation.timed("get_command")
+def get_command(utterance):
+    """ Resolve a voice command to 'apple', 'orange', 'stop' or 'error'. """
+    return get_intent_resolver().resolve(utterance)
+
+
+def get_object_detections(frame, object_name, imgsz=None):
+    """
+    Detect specified objects in a video frame using YOLOv8.
+
+    Runs in-process, or on the shared inference server when VLM_INFERENCE_SERVER is set. If the
+    server is overloaded or unreachable, falls back to in-process YOLO for `server_backoff` seconds.
+
+    Args:
+        imgsz (int): Inference size; smaller values make detection on crops cheaper.
+
+    Returns:
+        Detections: Detections of `object_name`, highest score first.
+    """
+    global _server_retry_at
+    detections = None
+    if inference_server and time.monotonic() >= _server_retry_at:
+        if getattr(_server_clients, "client", None) is None:
+            _server_clients.client = InferenceClient(inference_server)
+        try:
+            with instrumentation.span("yolo", backend="server", crop=bool(imgsz)):
+                response = _server_clients.client.request("yolo", frame, **({"imgsz": imgsz} if imgsz else {}))
+            detections = Detections.from_dicts(response["detections"])
+        except (RuntimeError, OSError, http.client.HTTPException) as e:
+            print(f"Error from inference server, running YOLO locally for {server_backoff:.0f}s: {e}")
+            _server_clients.client.close()
+            _server_retry_at = time.monotonic() + server_backoff
+    if detections is None:
+        # Run YOLOv8 inference directly on the BGR frame (the layout ultralytics expects)
+        with use_model("yolo") as model_yolo:
+            with instrumentation.span("yolo", backend="local", crop=bool(imgsz)):
+                results = model_yolo(frame, **({"imgsz": imgsz} if imgsz else {}))
+            detections = Detections.from_yolo(results[0], model_yolo.names)
+    return detections.filter_classes([object_name]).sort_by_score()
+
+
+def track_infer_function(object_name, mode, motion_threshold=0.01, max_staleness=2.0):
+    """
+    Builds the inference stage for `track_apple_or_orange`.
+
+    Args:
+        mode (str): 'detect' runs full-frame YOLO on every frame; 'track' runs it every few
+            frames and follows the target with a lightweight tracker (or YOLO on a crop) in between.
+        motion_threshold (float): Scene change needed before either mode runs again; frames below it
+            reuse the previous detections. 0 disables the gate.
+        max_staleness (float): Seconds after which detections are refreshed even if nothing moved.
+
+    Returns:
+        tuple: (infer function taking a Frame, DetectThenTrack or None, MotionGate)
+    """
+    if mode == "detect":
+        tracker = None
+        detect = lambda image: get_object_detections(image, object_name)
+    else:
+        tracker = DetectThenTrack(lambda image: get_object_detections(image, object_name),
+                                  detect_roi=lambda image: get_object_detections(image, object_name, imgsz=320),
+                                  detect_every=10)
+        detect = tracker.update
+    gate = MotionGate(detect, threshold=motion_threshold, max_staleness=max_staleness)
+    return lambda frame: gate.update(frame.image), tracker, gate
+
+
+def track_apple_or_orange(object_name, following_time=30, commands=None, mode="track", sink=None, max_fps=15,
+                          motion_threshold=0.01):
+    """
+    Tracks an apple or orange using the camera for a set duration.
+
+    Capture, YOLO inference and arm control run as three pipeline stages
+    linked by single-slot queues, so arm commands always act on the newest frame.
+    Drawing runs on a fourth thread at no more than `max_fps`, into `sink` (defaults
+    to `display_sink`; 'none' skips rendering entirely); a window is shown by the control loop.
+    If `commands` (a CommandListener) is given, a spoken "stop" ends tracking early; other
+    commands heard meanwhile are returned so the caller can act on them afterwards.
+    The camera stays open between calls, so only the first session pays device start-up.
+    See `track_infer_function` for the 'detect' and 'track' modes and the motion gate that
+    skips inference while the scene is static (`motion_threshold=0` disables it).
+
+    Returns:
+        list: Non-stop commands heard while tracking, oldest first.
+    """
+    session_start = time.perf_counter()
+    cap = get_camera(0)  # Change camera index if needed
+    image_center = np.array(cap.frame_size) / 2
+    first_detection_at = None
+    control_frames = 0
+    unhandled = []
+
+    stats = LatencyStats(name="tracking")  # Also exported as spans when VLM_METRICS is set
+    # Dropped frames return their buffer to the ring; the control loop releases the frames it handles
+    frames = LatestQueue(maxsize=1, name="frames", on_drop=Frame.release)
+    results = LatestQueue(maxsize=1, name="results", on_drop=Frame.release)
+    capture = FrameCapture(cap, frames, stats, ring=FrameRing(size=6))
+    infer, tracker, gate = track_infer_function(object_name, mode, motion_threshold)
+    worker = InferenceWorker(frames, results, infer, stats)
+    output = open_sink(sink or display_sink, title="Detections", max_fps=max_fps)
+    capture.start()
+    worker.start()
 
     start_time = time.time()
-    while (time.time() - start_time) < following_time:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        detections = get_object_detections(frame, object_name)
-        if detections:
-            center = [detections[0]['x1'] + (detections[0]['x2'] - detections[0]['x1']) // 2 - image_center[0],
-                      detections[0]['y1'] + (detections[0]['y2'] - detections[0]['y1']) // 2 - image_center[1]]
-            move_robot_arm(center[0], center[1])
-
-        cv2.imshow("Detections", frame)
-        cv2.waitKey(1)
-
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        while (time.time() - start_time) < following_time and capture.is_alive() and not output.quit_requested:
+            try:
+                frame = results.get(timeout=0.1)
+            except queue.Empty:
+                frame = None
+
+            command = commands.poll() if commands is not None else None
+            if command and is_stop_command(command):
+                print(f"Stop command received ({commands.last_latency:.2f} s after speech ended).")
+                break
+            if command:
+                print(f"Heard '{command}' while tracking; handling it when tracking ends.")
+                unhandled.append(command)
+            if frame is None:
+                output.pump()  # Show the last drawn frame; window display stays on this thread
+                continue
+
+            control_start = time.perf_counter()
+            if first_detection_at is None:
+                first_detection_at = control_start
+                print(f"First detection {first_detection_at - session_start:.2f} s after tracking started.")
+            detections = frame.result  # None if inference failed on this frame
+            if detections is not None and len(detections):
+                center = detections.centers()[0] - image_center
+                move_robot_arm(center[0], center[1])
+
+            output.submit(frame.image, detections)  # Copied and drawn on the sink thread
+            frame.release()
+
+            control_frames += 1
+            now = time.perf_counter()
+            stats.record("control", now - control_start)
+            stats.record("frame_age", now - frame.captured_at)  # Capture-to-actuation latency
+    finally:
+        capture.stop()
+        worker.stop()
+        capture.join()
+        worker.join()
+        output.close()
+
+    stats.report()
+    print(f"Control loop: {control_frames / (time.time() - start_time):.1f} Hz")
+    if tracker is not None:
+        tracker.report()
+    gate.report()
+    print(f"Dropped frames: capture->inference {frames.dropped}, inference->control {results.dropped}")
+    return unhandled
+
+
+def get_command_listener():
+    """ Returns the background command listener, starting it (and warming up Whisper) on first use. """
+    global command_listener
+    if command_listener is None:
+        try:
+            mute = get_speech_worker().is_speaking  # Don't take the robot's own voice for a command
+        except RuntimeError as e:
+            print(f"Error starting text-to-speech, listening without echo suppression: {e}")
+            mute = None
+        command_listener = CommandListener(model_size="base", mute=mute).start()
+    return command_listener
+
+
+def is_stop_command(text):
+    """
+    True if the utterance asks the robot to stop (e.g. "stop", "end tracking", "okay robot, halt").
+
+    The stop word must open the utterance (after filler words), so "follow the apple to the end" is not a stop.
+    """
+    words = re.findall(r"[a-z']+", text.lower())
+    while words and words[0] in filler_words:
+        words.pop(0)
+    return bool(words) and words[0] in stop_words
 
 
 def listener():
-    """ Listens to a voice command and converts it to text using Whisper. """
-    with sr.Microphone() as source:
-        print("Listening for a command...")
-        audio = speech_recognizer.listen(source)
-
-    try:
-        text = speech_recognizer.recognize_whisper(audio, language="english")
-        return text.lower()
-    except sr.UnknownValueError:
-        print("Could not understand the audio.")
-    except sr.RequestError:
-        print("Error with Whisper API.")
-    return ""
+    """ Waits for the next voice command recognized by the always-on Whisper listener. """
+    commands = get_command_listener()
+    commands.clear()  # Only act on what is said from now on, not on speech heard during menus or speech output
+    print("Listening for a command...")
+    return commands.get() or ""
 
 
 def get_instruction():
@@ -122,41 +268,50 @@ def get_instruction():
 
 def gpt_based_demo():
     """ GPT-based demo for object tracking via voice commands. """
-    instruction = get_instruction()
-
+    pending = deque()  # Commands heard during tracking
     while True:
-        prompt = listener()
+        prompt = pending.popleft() if pending else listener()
         if not prompt:
             continue
 
-        response = get_command(instruction + [{"role": "user", "content": prompt}])
+        response = get_command(prompt)
 
         if response == "stop":
+            get_intent_resolver().report()
             break
         if response in trackable_objects:
             say(f"I'm going to follow, {response}.")
-            track_apple_or_orange(response)
+            pending.extend(track_apple_or_orange(response, commands=get_command_listener()))
 
 
 def keyword_based_demo():
     """ Keyword-based demo for object tracking via simple voice commands. """
+    pending = deque()  # Commands heard during tracking
     while True:
-        command = listener()
+        command = pending.popleft() if pending else listener()
         if not command:
             continue
 
-        if "stop" in command:
+        if is_stop_command(command):
             break
 
         for object_name in trackable_objects:
             if object_name in command:
-                track_apple_or_orange(object_name)
-                return
+                pending.extend(track_apple_or_orange(object_name, commands=get_command_listener()))
+                break
+        else:
+            print(f"Please say either 'apple' or 'orange' to track.")
+            continue
 
-        print(f"Please say either 'apple' or 'orange' to track.")
+        if not pending:  # Nothing said while tracking; back to the menu
+            return
 
 
 def main():
+    get_camera(0)  # Open the camera up front so the first voice command does not wait for it
+    if not inference_server:
+        get_model("yolo")  # Load and warm up YOLO before the first command as well
+
     while True:
         print("Select mode:")
         print("1 - Keyword-based demo")
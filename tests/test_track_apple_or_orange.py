@@ -0,0 +1,86 @@
+"""
+Runs short tracking sessions of robotics/vlm_orange_or_apple.py against a fake
+camera, fake detector and fake command listener.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "robotics"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "use_cases"))
+vlm = pytest.importorskip("vlm_orange_or_apple")
+from detections import Detections
+
+
+class FakeCamera:
+    """Delivers black 64x48 frames at about 100 FPS."""
+
+    frame_size = (64, 48)
+
+    def read(self, image=None):
+        time.sleep(0.01)
+        if image is None:
+            image = np.zeros((48, 64, 3), dtype=np.uint8)
+        return True, image
+
+
+class FakeListener:
+    """Hands out one scripted utterance per poll once `delay` seconds have passed."""
+
+    def __init__(self, utterances, delay=0.1):
+        self.utterances = list(utterances)
+        self.ready_at = time.perf_counter() + delay
+        self.last_latency = 0.0
+
+    def poll(self):
+        if not self.utterances or time.perf_counter() < self.ready_at:
+            return None
+        return self.utterances.pop(0)
+
+
+@pytest.fixture
+def fake_robot(monkeypatch):
+    monkeypatch.setattr(vlm, "get_camera", lambda source=0: FakeCamera())
+    monkeypatch.setattr(vlm, "get_object_detections", lambda image, object_name, imgsz=None: Detections.empty({}))
+
+
+def test_returns_commands_heard_while_tracking(fake_robot):
+    commands = FakeListener(["follow the orange", "faster please"])
+    unhandled = vlm.track_apple_or_orange("apple", following_time=0.5, commands=commands, mode="detect",
+                                          sink="none", motion_threshold=0)
+    assert unhandled == ["follow the orange", "faster please"]
+
+
+def test_returns_empty_list_without_commands(fake_robot):
+    unhandled = vlm.track_apple_or_orange("apple", following_time=0.3, commands=FakeListener([]), mode="detect",
+                                          sink="none", motion_threshold=0)
+    assert unhandled == []
+
+
+def test_stop_command_ends_tracking_early(fake_robot):
+    commands = FakeListener(["orange", "stop"])
+    start = time.perf_counter()
+    unhandled = vlm.track_apple_or_orange("apple", following_time=10, commands=commands, mode="detect",
+                                          sink="none", motion_threshold=0)
+    assert time.perf_counter() - start < 5
+    assert unhandled == ["orange"]
+
+
+@pytest.mark.parametrize("utterance, expected", [
+    ("stop", True),
+    ("Stop!", True),
+    ("end tracking", True),
+    ("okay robot, halt", True),
+    ("follow the apple to the end", False),
+    ("don't stop", False),
+    ("orange", False),
+])
+def test_stop_words_only_count_at_the_start(utterance, expected):
+    assert vlm.is_stop_command(utterance) == expected
@@ -0,0 +1,328 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from jsonl_output import load_done_hashes
+from model_registry import get_model
+
+SAMPLE_RATE = 16000  # Whisper and the Vosk models both expect 16 kHz mono
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".opus", ".m4a", ".aac", ".webm")
+
+def find_audio(source):
+    """
+    Lists the audio files to transcribe.
+
+    Args:
+        source (str): Directory (searched recursively) or manifest file. A manifest is
+            either a text file with one path per line or a JSONL file with a "path" field;
+            relative paths are resolved against the manifest's directory.
+
+    Returns:
+        list: Audio file paths.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(os.path.join(base, path))
+    return paths
+
+def decode_audio(data, samplerate=SAMPLE_RATE):
+    """
+    Decodes any format ffmpeg understands to mono 16-bit PCM at `samplerate`.
+
+    Args:
+        data (bytes): Encoded audio file contents.
+        samplerate (int): Output sampling rate.
+
+    Returns:
+        numpy.ndarray: int16 samples.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0", "-f", "s16le", "-ac", "1",
+           "-acodec", "pcm_s16le", "-ar", str(samplerate), "-"]
+    result = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+def split_on_silence(audio, samplerate=SAMPLE_RATE, max_segment_seconds=30.0, frame_seconds=0.03,
+                     energy_threshold=0.01, padding_seconds=0.2):
+    """
+    Cuts audio into speech segments at silent frames.
+
+    Voiced regions (frame RMS above `energy_threshold`) are merged while the
+    merged span plus padding stays within `max_segment_seconds` (Whisper's 30 s
+    window), and longer regions are cut into pieces of that length. Silence
+    between segments is never decoded.
+
+    Args:
+        audio (numpy.ndarray): int16 or float samples.
+        samplerate (int): Sampling rate of the audio.
+        max_segment_seconds (float): Longest segment, padding included.
+        frame_seconds (float): Frame length of the energy analysis.
+        energy_threshold (float): Minimum RMS (float scale) treated as speech.
+        padding_seconds (float): Audio kept before and after each segment.
+
+    Returns:
+        list: (start, end) sample indices per segment.
+    """
+    if audio.dtype == np.int16:
+        audio = audio.astype(np.float32) / 32768.0
+    frame = int(frame_seconds * samplerate)
+    n = len(audio) // frame
+    if n == 0:
+        return []
+    rms = np.sqrt(np.mean(audio[:n * frame].reshape(n, frame) ** 2, axis=1))
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], (rms > energy_threshold).astype(np.int8), [0]))))
+
+    max_frames = int((max_segment_seconds - 2 * padding_seconds) / frame_seconds)  # Padding must fit too
+    segments = []
+    for start, end in edges.reshape(-1, 2):
+        if segments and end - segments[-1][0] <= max_frames:
+            segments[-1][1] = end
+            continue
+        for piece in range(start, end, max_frames):
+            segments.append([piece, min(piece + max_frames, end)])
+
+    padding = int(padding_seconds * samplerate)
+    return [(max(0, start * frame - padding), min(len(audio), end * frame + padding)) for start, end in segments]
+
+def load_file(path, done, max_segment_seconds=30.0):
+    """
+    Reads, hashes, decodes and segments one audio file (runs on a worker).
+
+    Args:
+        path (str): Audio file path.
+        done (set): Content hashes that are already transcribed.
+        max_segment_seconds (float): Longest segment.
+
+    Returns:
+        tuple: (path, sha1, int16 audio or None if skipped or unreadable, segments)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    sha1 = hashlib.sha1(data).hexdigest()
+    if sha1 in done:
+        return path, sha1, None, []
+
+    try:
+        audio = decode_audio(data)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Skipping {path}: {e}")
+        return path, sha1, None, []
+    return path, sha1, audio, split_on_silence(audio, max_segment_seconds=max_segment_seconds)
+
+def prefetch(executor, fn, items, ahead, *args):
+    """
+    Yields `fn(item, *args)` results in order, keeping at most `ahead` calls in flight.
+
+    Args:
+        executor (concurrent.futures.Executor): Thread or process pool.
+        fn (callable): Function submitted per item.
+        items (iterable): Work items.
+        ahead (int): Maximum pending calls.
+    """
+    pending = deque()
+    items = iter(items)
+    for item in items:
+        pending.append(executor.submit(fn, item, *args))
+        if len(pending) >= ahead:
+            break
+    while pending:
+        result = pending.popleft().result()
+        item = next(items, None)
+        if item is not None:
+            pending.append(executor.submit(fn, item, *args))
+        yield result
+
+def segment_records(path, sha1, segments, texts, engine):
+    """Builds the JSONL records of one file; a file without speech gets a single empty record."""
+    if not segments:
+        return [{"path": path, "sha1": sha1, "start": 0.0, "end": 0.0, "text": "", "engine": engine}]
+    return [{"path": path, "sha1": sha1, "start": round(start / SAMPLE_RATE, 2), "end": round(end / SAMPLE_RATE, 2),
+             "text": text, "engine": engine} for (start, end), text in zip(segments, texts)]
+
+def transcribe_whisper_batch(model, segments, language=None):
+    """
+    Transcribes up to 30 s audio segments with one batched Whisper decode.
+
+    Args:
+        model (whisper.model.Whisper): Loaded model.
+        segments (list): float32 16 kHz audio arrays.
+        language (str): Spoken language; None detects it per segment.
+
+    Returns:
+        list: One text per segment; segments Whisper judges silent give "".
+    """
+    import torch
+    import whisper
+    mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(segment), n_mels=model.dims.n_mels)
+                        for segment in segments]).to(model.device)
+    options = whisper.DecodingOptions(language=language, without_timestamps=True,
+                                      fp16=model.device.type == "cuda")
+    with torch.no_grad():
+        results = whisper.decode(model, mels, options)
+    # Same no-speech rule as whisper.transcribe
+    return ["" if r.no_speech_prob > 0.6 and r.avg_logprob < -1.0 else r.text.strip() for r in results]
+
+def _run_whisper(paths, done, output, model_size, batch_size, workers, language):
+    """Decodes files on a thread pool and transcribes their segments in cross-file batches."""
+    model = get_model(f"whisper-{model_size}")
+    files = {}  # sha1 -> [path, segments, texts, remaining]
+    batch = []  # (sha1, index, float32 audio)
+
+    def flush():
+        texts = transcribe_whisper_batch(model, [item[2] for item in batch], language)
+        for (sha1, index, _), text in zip(batch, texts):
+            files[sha1][2][index] = text
+            files[sha1][3] -= 1
+        batch.clear()
+
+    def write_finished():
+        for sha1 in [sha1 for sha1, entry in files.items() if entry[3] == 0]:
+            path, segments, texts, _ = files.pop(sha1)
+            for record in segment_records(path, sha1, segments, texts, f"whisper-{model_size}"):
+                output.write(json.dumps(record) + "\n")
+            done.add(sha1)
+        output.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, sha1, audio, segments in prefetch(executor, load_file, paths, workers * 2, done):
+            if audio is None or sha1 in files or sha1 in done:  # Skipped, or a duplicate of another file
+                yield path, None
+                continue
+            files[sha1] = [path, segments, [""] * len(segments), len(segments)]
+            audio = audio.astype(np.float32) / 32768.0
+            for index, (start, end) in enumerate(segments):
+                batch.append((sha1, index, audio[start:end]))
+                if len(batch) >= batch_size:
+                    flush()
+            write_finished()
+            yield path, len(audio) / SAMPLE_RATE
+        if batch:
+            flush()
+        write_finished()
+
+_vosk_model = None
+_vosk_done = set()
+
+def _init_vosk_worker(done):
+    global _vosk_model, _vosk_done
+    _vosk_model = get_model("vosk")
+    _vosk_done = done  # Sent once per worker instead of with every file
+
+def _vosk_transcribe_file(path):
+    """Runs in a worker process: decodes, segments and transcribes one file with Vosk."""
+    import vosk
+    path, sha1, audio, segments = load_file(path, _vosk_done)
+    if audio is None:
+        return path, sha1, None, []
+    recognizer = vosk.KaldiRecognizer(_vosk_model, SAMPLE_RATE)
+    texts = []
+    for start, end in segments:
+        recognizer.AcceptWaveform(audio[start:end].tobytes())
+        texts.append(json.loads(recognizer.FinalResult())["text"])  # FinalResult also resets the recognizer
+    return path, sha1, len(audio) / SAMPLE_RATE, segment_records(path, sha1, segments, texts, "vosk")
+
+def _run_vosk(paths, done, output, workers):
+    """Transcribes whole files on a process pool with one resident Vosk model per worker."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_vosk_worker, initargs=(set(done),)) as executor:
+        for path, sha1, duration, records in prefetch(executor, _vosk_transcribe_file, paths, workers * 2):
+            if duration is None or sha1 in done:  # Skipped, or a duplicate of a file written before
+                yield path, None
+                continue
+            for record in records:
+                output.write(json.dumps(record) + "\n")
+            output.flush()
+            done.add(sha1)
+            yield path, duration
+
+def transcribe_corpus(source, output_path, engine="whisper", model_size="small", batch_size=8, workers=None,
+                      language=None):
+    """
+    Transcribes a directory or manifest of audio files into a timestamped JSONL file.
+
+    Files are decoded and resampled with ffmpeg on a worker pool and cut into
+    speech segments at silences. Whisper decodes segments from several files in
+    one batch; Vosk runs one resident model per worker process. Records are
+    appended as soon as a file is finished, and files whose content hash is
+    already in the output are skipped, so interrupted runs can be restarted.
+
+    Args:
+        source (str): Directory or manifest, see `find_audio`.
+        output_path (str): JSONL file with {"path", "sha1", "start", "end", "text", "engine"} per segment.
+        engine (str): 'whisper' or 'vosk'.
+        model_size (str): Whisper model size.
+        batch_size (int): Whisper segments per decode.
+        workers (int): Decoder threads (Whisper) or recognizer processes (Vosk); defaults to the CPU count.
+        language (str): Spoken language for Whisper; None detects it.
+    """
+    paths = find_audio(source)
+    done = load_done_hashes(output_path)
+    workers = workers or os.cpu_count()
+    print(f"Found {len(paths)} audio files, {len(done)} already transcribed.")
+
+    transcribed = skipped = 0
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as output:
+        if engine == "whisper":
+            results = _run_whisper(paths, done, output, model_size, batch_size, workers, language)
+        elif engine == "vosk":
+            results = _run_vosk(paths, done, output, workers)
+        else:
+            raise ValueError(f"Unknown engine '{engine}'. Choose 'whisper' or 'vosk'.")
+
+        for path, duration in results:
+            if duration is None:
+                skipped += 1
+                continue
+            transcribed += 1
+            audio_seconds += duration
+            elapsed = time.perf_counter() - start
+            print(f"{transcribed} transcribed, {skipped} skipped, {audio_seconds / 60:.1f} min of audio, "
+                  f"{audio_seconds / elapsed:.1f}x real time")
+
+    elapsed = time.perf_counter() - start
+    rtf = elapsed / audio_seconds if audio_seconds else float("nan")
+    print(f"Done: {transcribed} files ({audio_seconds / 3600:.2f} h of audio) in {elapsed:.1f} s, "
+          f"real-time factor {rtf:.3f}, {skipped} skipped.")
+
+def main():
+    """
+    Transcribes a corpus of recordings from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Batch transcription of audio files into a resumable JSONL file.")
+    parser.add_argument("source", help="Directory with audio files, or a manifest (.txt paths or .jsonl with 'path')")
+    parser.add_argument("--output", default="transcripts.jsonl", help="JSONL output (appended, resumable)")
+    parser.add_argument("--engine", choices=("whisper", "vosk"), default="whisper")
+    parser.add_argument("--model-size", default="small", help="Whisper model size")
+    parser.add_argument("--batch-size", type=int, default=8, help="Whisper segments per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Decoder threads / Vosk processes (default: CPU count)")
+    parser.add_argument("--language", default=None, help="Spoken language for Whisper, e.g. 'en'")
+    parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+    transcribe_corpus(args.source, args.output, engine=args.engine, model_size=args.model_size,
+                      batch_size=args.batch_size, workers=args.workers, language=args.language)
+
+if __name__ == "__main__":
+    main()
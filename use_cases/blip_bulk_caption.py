@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import torch
+from PIL import Image
+
+from jsonl_output import load_done_hashes
+from model_registry import get_model
+from result_cache import get_result_cache, image_hash
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+def find_images(directory):
+    """
+    Lists image files below a directory, sorted for a stable processing order.
+
+    Args:
+        directory (str): Root directory.
+
+    Returns:
+        list: Image file paths.
+    """
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+def load_image(path, done, max_new_tokens=30):
+    """
+    Reads, hashes, decodes and preprocesses one image (runs on a loader thread).
+
+    An image captioned before (by any run, with the same weights and settings)
+    is answered from the result cache and not preprocessed at all.
+
+    Args:
+        path (str): Image file path.
+        done (set): Content hashes that are already captioned.
+        max_new_tokens (int): Caption length used by `caption_batch`; part of the cache key.
+
+    Returns:
+        tuple: (path, sha1, pixel_values, cache key, cached caption); pixel_values and caption are
+            both None if the image is skipped or unreadable, and the key is None without a cache.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    sha1 = hashlib.sha1(data).hexdigest()
+    if sha1 in done:
+        return path, sha1, None, None, None
+
+    try:
+        _, processor = get_model("blip")
+        image = Image.open(io.BytesIO(data))
+        size = processor.image_processor.size
+        image.draft("RGB", (size["width"], size["height"]))  # Let JPEG decode at reduced scale
+        image = image.convert("RGB")
+
+        cache, key = get_result_cache(), None
+        if cache is not None:
+            # Drafted pixels differ from a full decode, so these keys never mix with generate_caption's
+            key = cache.key("blip", image_hash(image), max_new_tokens=max_new_tokens, source="bulk")
+            caption = cache.get(key)
+            if caption is not None:
+                return path, sha1, None, key, caption
+        pixel_values = processor(images=image, return_tensors="pt")["pixel_values"]
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
+        return path, sha1, None, None, None
+    return path, sha1, pixel_values[0], key, None
+
+def caption_batch(pixel_values, max_new_tokens=30):
+    """
+    Captions a batch of preprocessed images with one `model.generate` call.
+
+    Args:
+        pixel_values (torch.Tensor): Stacked (N, 3, H, W) pixel values.
+        max_new_tokens (int): Maximum caption length in tokens.
+
+    Returns:
+        list: One caption per image.
+    """
+    model, processor = get_model("blip")
+    with torch.no_grad():
+        caption_ids = model.generate(pixel_values=pixel_values.to(model.device, model.dtype),
+                                     max_new_tokens=max_new_tokens)
+    return processor.batch_decode(caption_ids, skip_special_tokens=True)
+
+def caption_directory(directory, output_path, batch_size=16, workers=None, prefetch=4, max_wait=0.05):
+    """
+    Captions every image in a directory and appends the results to a JSONL file.
+
+    Images are decoded and resized on a thread pool while the model runs, and
+    batches are sent to the model as soon as they are full or no more images
+    arrive within `max_wait`. Images whose content hash is already in the output
+    file are skipped, so an interrupted run can simply be restarted. Captions are
+    also stored in the result cache (VLM_RESULT_CACHE), so captioning the same
+    images into a new output file is a lookup.
+
+    Args:
+        directory (str): Directory with images (searched recursively).
+        output_path (str): JSONL file with one {"path", "sha1", "caption"} record per image.
+        batch_size (int): Maximum images per `model.generate` call.
+        workers (int): Loader threads; defaults to the CPU count.
+        prefetch (int): Batches worth of images loaded ahead of the model.
+        max_wait (float): Seconds to wait for more images before running a partial batch.
+    """
+    get_model("blip")  # Load once up front rather than on the first loader thread
+    paths = find_images(directory)
+    done = load_done_hashes(output_path)
+    print(f"Found {len(paths)} images, {len(done)} already captioned.")
+
+    captioned = skipped = from_cache = 0
+    cache = get_result_cache()
+    start = time.perf_counter()
+    pending = deque()
+    next_path = iter(paths)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor, \
+            open(output_path, "a", encoding="utf-8") as output:
+
+        def fill():
+            while len(pending) < batch_size * prefetch:
+                path = next(next_path, None)
+                if path is None:
+                    return
+                pending.append(executor.submit(load_image, path, done))
+
+        batch = []
+        fill()
+        while pending or batch:
+            # Take finished loads in order; run a partial batch if the next image is slow
+            if pending and (not batch or pending[0].done()):
+                path, sha1, pixel_values, key, caption = pending.popleft().result()
+                fill()
+                if caption is not None:
+                    output.write(json.dumps({"path": path, "sha1": sha1, "caption": caption}) + "\n")
+                    done.add(sha1)
+                    from_cache += 1
+                    continue
+                if pixel_values is None:
+                    skipped += 1
+                    continue
+                batch.append((path, sha1, pixel_values, key))
+                if len(batch) < batch_size:
+                    continue
+            elif pending:
+                try:
+                    pending[0].result(timeout=max_wait)
+                    continue
+                except FutureTimeoutError:
+                    pass
+
+            captions = caption_batch(torch.stack([item[2] for item in batch]))
+            for (path, sha1, _, key), caption in zip(batch, captions):
+                output.write(json.dumps({"path": path, "sha1": sha1, "caption": caption}) + "\n")
+                done.add(sha1)
+                if key is not None:
+                    cache.put(key, "blip", caption)
+            output.flush()
+
+            captioned += len(batch)
+            batch = []
+
+            elapsed = time.perf_counter() - start
+            print(f"{captioned} captioned, {from_cache} from cache, {skipped} skipped, "
+                  f"{captioned / elapsed:.2f} images/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {captioned} images in {elapsed:.1f} s ({captioned / max(elapsed, 1e-9):.2f} images/s), "
+          f"{from_cache} from cache, {skipped} skipped.")
+
+def main():
+    """
+    Captions a directory of images from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Bulk BLIP image captioning into a resumable JSONL file.")
+    parser.add_argument("directory", help="Directory with images")
+    parser.add_argument("--output", default="captions.jsonl", help="JSONL output (appended, resumable)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="Image loader threads (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    caption_directory(args.directory, args.output, batch_size=args.batch_size, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
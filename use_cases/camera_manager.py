@@ -0,0 +1,90 @@
+import atexit
+import threading
+import time
+
+import cv2
+
+from frame_pipeline import open_capture
+
+
+class Camera:
+    """
+    Video source that stays open for the whole process, shared by successive sessions.
+
+    Resolution, FPS and driver buffer size are pinned once at open time, and the
+    first frames are discarded so auto-exposure has settled before anyone reads.
+    Later sessions get frames immediately instead of paying device start-up again.
+
+    Args:
+        source (int | str): Camera index, video file path or stream URL.
+        width (int): Requested frame width; the driver may pick another, see `frame_size`.
+        height (int): Requested frame height.
+        fps (int): Requested frame rate.
+        buffer_size (int): Frames the driver may queue; 1 keeps frames fresh.
+        warmup_frames (int): Frames read and discarded after opening.
+    """
+
+    def __init__(self, source=0, width=640, height=480, fps=30, buffer_size=1, warmup_frames=5):
+        self.source = source
+        self._lock = threading.Lock()
+
+        start = time.perf_counter()
+        self.cap = open_capture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video source '{source}'.")
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        frame = None
+        for _ in range(max(1, warmup_frames)):
+            ret, frame = self.cap.read()
+            if not ret:
+                raise RuntimeError(f"Video source '{source}' did not deliver frames.")
+
+        # Use the size the driver actually delivers, not the one we asked for
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.open_seconds = time.perf_counter() - start
+        print(f"Camera {source} ready: {self.frame_size[0]}x{self.frame_size[1]} @ {self.fps:.0f} FPS "
+              f"in {self.open_seconds:.2f} s")
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        with self._lock:
+            return self.cap.read(image)
+
+    def release(self):
+        with self._lock:
+            self.cap.release()
+
+
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+
+def get_camera(source=0, **settings):
+    """
+    Returns the process-wide Camera for `source`, opening it on first use.
+
+    Args:
+        source (int | str): Camera index, video file path or stream URL.
+        **settings: Camera arguments (width, height, fps, buffer_size, warmup_frames) used when opening.
+    """
+    with _cameras_lock:
+        if source not in _cameras:
+            _cameras[source] = Camera(source, **settings)
+        return _cameras[source]
+
+
+@atexit.register
+def release_cameras():
+    """Releases every camera opened through `get_camera`."""
+    with _cameras_lock:
+        for camera in _cameras.values():
+            camera.release()
+        _cameras.clear()
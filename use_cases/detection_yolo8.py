@@ -1,41 +1,50 @@
+import argparse
+
 import cv2
-import matplotlib.pyplot as plt
-from ultralytics import YOLO
 
-# Load YOLOv8 model (pre-trained on COCO dataset)
-model = YOLO("yolov8l.pt")  # Available versions: 'n' (smallest), 's', 'm', 'l' (largest)
+from detections import Detections
+from model_registry import get_model
+from result_cache import cached
+from sinks import SINK_HELP, open_sink
+
+
+def detect_objects(image):
+    """
+    Runs YOLOv8 inference on a BGR image, or returns the cached result for the same pixels.
 
-# Load and preprocess the image
-image_path = "frame_.png"  # Change this to your image file path
-image = cv2.imread(image_path)
+    Args:
+        image (numpy.ndarray): Image as loaded by cv2.imread.
 
-# Ensure the image is loaded correctly
-if image is None:
-    raise FileNotFoundError(f"Error: Unable to load image at '{image_path}'.")
+    Returns:
+        Detections: Bounding boxes (x1, y1, x2, y2), class IDs and confidence scores.
+    """
+    def compute():
+        model = get_model("yolo")  # YOLOv8 pre-trained on COCO, loaded on first use
+        results = model(image)
+        return Detections.from_yolo(results[0], model.names)
+    return cached("yolo", image, compute)
 
-# Convert image from BGR (OpenCV format) to RGB (Matplotlib format)
-image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-# Run YOLOv8 inference on the image
-results = model(image)
+def plot_detections(image_rgb, detections):
+    """
+    Shows the image with bounding boxes and labels using matplotlib.
 
-# Set up the figure for visualization
-plt.figure(figsize=(8, 6))
-plt.imshow(image_rgb)
-plt.axis("off")  # Hide axis labels
+    The scripts render through `sinks` (OpenCV) instead; matplotlib is only
+    imported when this is called.
 
-# Process detection results
-for result in results:
-    boxes = result.boxes.xyxy  # Bounding box coordinates (x1, y1, x2, y2)
-    labels = result.boxes.cls  # Class IDs
-    scores = result.boxes.conf  # Confidence scores
+    Args:
+        image_rgb (numpy.ndarray): RGB image.
+        detections (Detections): Detection results.
+    """
+    import matplotlib.pyplot as plt
 
-    for box, label, score in zip(boxes, labels, scores):
-        # Convert bounding box coordinates to integers
-        x1, y1, x2, y2 = map(int, box.tolist())
+    # Set up the figure for visualization
+    plt.figure(figsize=(8, 6))
+    plt.imshow(image_rgb)
+    plt.axis("off")  # Hide axis labels
 
-        # Get class name and confidence score
-        class_name = model.names[int(label)]
+    for (x1, y1, x2, y2), class_name, score in zip(detections.boxes.astype(int).tolist(), detections.labels(),
+                                                   detections.scores.tolist()):
         label_text = f"{class_name} ({score:.2f})"
 
         # Draw bounding box
@@ -47,5 +56,31 @@ for result in results:
         plt.text(x1, y1 - 5, label_text, color='red', fontsize=10,
                  bbox=dict(facecolor='white', alpha=0.5))
 
-# Display the image with detections
-plt.show()
+    # Display the image with detections
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLOv8 object detection on an image.")
+    parser.add_argument("image", nargs="?", default="frame_.png", help="Image file path")
+    parser.add_argument("--sink", default="window", help=SINK_HELP)
+    args = parser.parse_args()
+
+    # Load and preprocess the image
+    image = cv2.imread(args.image)
+
+    # Ensure the image is loaded correctly
+    if image is None:
+        raise FileNotFoundError(f"Error: Unable to load image at '{args.image}'.")
+
+    # Run YOLOv8 inference on the image
+    detections = detect_objects(image)
+
+    # Draw with OpenCV straight onto the BGR image; no RGB conversion or matplotlib needed
+    sink = open_sink(args.sink, title="YOLO Object Detection", max_fps=None, hold=True)
+    sink.submit(image, detections)
+    sink.close()
+
+
+if __name__ == "__main__":
+    main()
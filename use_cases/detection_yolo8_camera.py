@@ -1,55 +1,87 @@
-import cv2
-from PIL import Image
-from ultralytics import YOLO
+import argparse
 
-# Load YOLOv8 model (pre-trained on COCO dataset)
-model = YOLO("yolov8l.pt")  # Available sizes: 'n', 's', 'm', 'l' (smallest to largest)
+import instrumentation
+from detections import Detections
+from frame_buffers import FrameRing
+from frame_pipeline import open_capture
+from model_registry import use_model
+from motion_gate import MotionGate
+from sinks import SINK_HELP, open_sink
 
-def camera_object_detection():
-    """Real-time object detection using YOLOv8 and webcam."""
-    cap = cv2.VideoCapture(0)  # Open webcam (change index if needed)
+def detect_frame(frame):
+    """
+    Runs YOLO inference directly on a BGR frame (no RGB/PIL round-trip).
 
-    if not cap.isOpened():
-        print("Error: Could not access webcam.")
-        return
+    Returns:
+        Detections: Detection results for the frame.
+    """
+    with use_model("yolo") as model:  # YOLOv8 pre-trained on COCO, loaded on first use
+        with instrumentation.span("yolo"):
+            results = model(frame)
+        return Detections.from_yolo(results[0], model.names)
 
-    while True:
-        ret, frame = cap.read()  # Capture frame from webcam
-        if not ret:
-            print("Error: Failed to read frame.")
-            break
+def camera_object_detection(source=0, sink="window", max_fps=15, motion_threshold=None, max_staleness=2.0,
+                            motion_method="diff"):
+    """
+    Real-time object detection using YOLOv8 and webcam.
 
-        # Convert frame from BGR to RGB (for PIL processing)
-        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    Frames that barely differ from the last inferred one reuse its detections
+    (see `motion_gate.MotionGate`), so a static scene costs almost no inference.
 
-        # Run YOLO inference
-        results = model(image)
+    Args:
+        source (int | str): Camera index, video file path or stream URL.
+            Use detection_yolo8_multi_camera.py to serve several sources from one model.
+        sink (str): Where annotated frames go, see `sinks.open_sink`; 'none' runs inference only.
+        max_fps (float): Rate at which frames are drawn (on a separate thread) and shown.
+        motion_threshold (float): Scene change needed to run YOLO again; 0 runs it on every frame,
+            None uses the method's default (0.01 for 'diff', 0.1 for 'hash').
+        max_staleness (float): Seconds after which detections are refreshed even in a static scene.
+        motion_method (str): 'diff' (downscaled frame differencing) or 'hash' (perceptual hash).
+    """
+    cap = open_capture(source)  # Open webcam (change index if needed)
 
-        # Process detections
-        for result in results:
-            boxes = result.boxes.xyxy  # Bounding box coordinates
-            labels = result.boxes.cls  # Class IDs
-            scores = result.boxes.conf  # Confidence scores
+    if not cap.isOpened():
+        print(f"Error: Could not access video source '{source}'.")
+        return
 
-            for box, label, score in zip(boxes, labels, scores):
-                x1, y1, x2, y2 = map(int, box.tolist())  # Convert to integers
-                label_text = f"{model.names[int(label)]} ({score:.2f})"
+    ring = FrameRing(size=2)  # Reuse frame buffers instead of allocating one per frame
+    output = open_sink(sink, title="YOLO Object Detection", max_fps=max_fps)
+    gate = MotionGate(detect_frame, threshold=motion_threshold, max_staleness=max_staleness, method=motion_method)
 
-                # Draw bounding box and label on the frame
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                cv2.putText(frame, label_text, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    while not output.quit_requested:  # 'q' in the window stops the loop
+        with instrumentation.span("capture"):
+            ret, frame = ring.read(cap)  # Capture frame from webcam
+        if not ret:
+            print("Error: Failed to read frame.")
+            break
 
-        # Display the frame with detections
-        cv2.imshow("YOLO Object Detection", frame)
+        detections = gate.update(frame)  # Previous detections if the scene has not changed
 
-        # Exit loop if 'q' is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        # Drawing happens on the sink's thread at a capped rate; windows are shown here, on the main thread
+        output.submit(frame, detections)
+        ring.release(frame)  # The sink has copied it; the buffer may be reused
+        instrumentation.frame_tick()
 
-    # Cleanup: Release webcam and close windows
+    # Cleanup: Release webcam and close the sink
     cap.release()
-    cv2.destroyAllWindows()
+    output.close()
+    gate.report()
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time YOLOv8 object detection.")
+    parser.add_argument("source", nargs="?", default="0", help="Device index, video file or stream URL")
+    parser.add_argument("--sink", default="window", help=SINK_HELP)
+    parser.add_argument("--max-fps", type=float, default=15, help="Display/output frame rate cap")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="Fraction of the frame (diff) or of hash bits (hash) that must change before YOLO "
+                             "runs again (0 = every frame; default 0.01 for diff, 0.1 for hash)")
+    parser.add_argument("--max-staleness", type=float, default=2.0,
+                        help="Seconds after which detections are refreshed even if nothing moved")
+    parser.add_argument("--motion-method", choices=["diff", "hash"], default="diff",
+                        help="Change detector: downscaled frame differencing or perceptual hash")
+    args = parser.parse_args()
+    camera_object_detection(args.source, sink=args.sink, max_fps=args.max_fps, motion_threshold=args.motion_threshold,
+                            max_staleness=args.max_staleness, motion_method=args.motion_method)
 
 if __name__ == "__main__":
-    camera_object_detection()
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import queue
+import threading
+import time
+
+from detections import Detections
+from frame_buffers import FrameRing
+from frame_pipeline import Frame, FrameCapture, LatestQueue, LatencyStats, open_capture
+from model_registry import registry
+from sinks import SINK_HELP, open_sink
+
+
+class MultiCameraDetector:
+    """
+    Runs one YOLO model over several camera feeds with a single batched forward pass.
+
+    Each source gets its own capture thread that keeps only its newest frame. The
+    detector collects whatever frames are ready, stacks them into one batch and
+    publishes each result on the source's own result stream.
+
+    Args:
+        sources (list): Device indices, video file paths or stream URLs.
+        result_queue_size (int): Results kept per source before the oldest is dropped.
+    """
+
+    def __init__(self, sources, result_queue_size=1):
+        self.sources = list(sources)
+        self.stats = LatencyStats(name="multi_camera")
+        self.caps = []
+        self.frames = []
+        self.captures = []
+        self.streams = [LatestQueue(maxsize=result_queue_size, name=f"results_{i}", on_drop=Frame.release)
+                        for i in range(len(self.sources))]
+        self.frame_counts = [0] * len(self.sources)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._started_at = None
+        self._cpu_started_at = None
+
+        for source in self.sources:
+            cap = open_capture(source)
+            if not cap.isOpened():
+                raise RuntimeError(f"Could not open video source '{source}'.")
+            frames = LatestQueue(maxsize=1, name=f"frames_{len(self.frames)}", on_drop=Frame.release)
+            self.caps.append(cap)
+            self.frames.append(frames)
+            # Buffers are checked out until the consumer releases the frame (or a queue drops it);
+            # this covers capturing, queued, batched, result stream and display without allocating
+            ring = FrameRing(size=result_queue_size + 4)
+            self.captures.append(FrameCapture(cap, frames, ring=ring))
+
+    def start(self):
+        """Starts the capture threads and the batched inference loop."""
+        self._started_at = time.perf_counter()
+        self._cpu_started_at = time.process_time()
+        for capture in self.captures:
+            capture.start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops all threads and releases the video sources."""
+        self._stop_event.set()
+        for capture in self.captures:
+            capture.stop()
+        if self._thread is not None:
+            self._thread.join()
+        for capture, cap in zip(self.captures, self.caps):
+            capture.join()
+            cap.release()
+
+    def _collect_batch(self, timeout=0.1):
+        """Returns (source index, frame) pairs for every source with a new frame."""
+        deadline = time.perf_counter() + timeout
+        while not self._stop_event.is_set():
+            batch = []
+            for i, frames in enumerate(self.frames):
+                try:
+                    batch.append((i, frames.get(timeout=0)))
+                except queue.Empty:
+                    pass
+            if batch or time.perf_counter() > deadline:
+                return batch
+            time.sleep(0.001)
+        return []
+
+    def _run(self):
+        model = registry.acquire("yolo")  # One resident model shared by all camera feeds, kept until stopped
+        try:
+            self._detect_loop(model)
+        finally:
+            registry.release("yolo")
+
+    def _detect_loop(self, model):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            results = model([frame.image for _, frame in batch], verbose=False)
+            self.stats.record(f"batch_{len(batch)}", time.perf_counter() - start)
+
+            for (i, frame), result in zip(batch, results):
+                frame.result = Detections.from_yolo(result, model.names)
+                self.frame_counts[i] += 1
+                self.streams[i].put(frame)
+
+    def results(self, source_index, timeout=None):
+        """
+        Returns the newest processed frame for one source.
+
+        Args:
+            source_index (int): Position of the source in `sources`.
+            timeout (float): Seconds to wait; raises queue.Empty when nothing arrives.
+
+        Returns:
+            Frame: Frame with `frame.result` set to its `Detections`; call `frame.release()` when done with it.
+        """
+        return self.streams[source_index].get(timeout=timeout)
+
+    def report(self):
+        """Prints frames per second per source and process CPU usage."""
+        elapsed = time.perf_counter() - self._started_at
+        cpu = time.process_time() - self._cpu_started_at
+        for source, count in zip(self.sources, self.frame_counts):
+            print(f"Source {source}: {count / elapsed:.1f} FPS")
+        print(f"Total: {sum(self.frame_counts) / elapsed:.1f} FPS, CPU {100 * cpu / elapsed:.0f}% "
+              f"({cpu / max(1, sum(self.frame_counts)) * 1000:.1f} ms CPU per frame)")
+        self.stats.report()
+
+
+def main():
+    """
+    Runs batched detection over all given sources and sends each source's frames to its own sink.
+    """
+    parser = argparse.ArgumentParser(description="Batched YOLOv8 detection over multiple cameras.")
+    parser.add_argument("sources", nargs="+", help="Device indices, video files or RTSP URLs")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--sink", default="window", help=SINK_HELP)
+    parser.add_argument("--max-fps", type=float, default=15, help="Display/output frame rate cap per source")
+    parser.add_argument("--headless", action="store_true", help="Same as --sink none")
+    args = parser.parse_args()
+
+    detector = MultiCameraDetector(args.sources)
+    sink_spec = "none" if args.headless else args.sink
+    sinks = [open_sink(sink_spec, title=f"YOLO Object Detection - {source}", max_fps=args.max_fps,
+                       index=i if len(args.sources) > 1 else None) for i, source in enumerate(detector.sources)]
+    detector.start()
+    start_time = time.time()
+    try:
+        while args.duration is None or time.time() - start_time < args.duration:
+            if sink_spec == "none":
+                time.sleep(0.1)
+                continue
+
+            for i, sink in enumerate(sinks):
+                try:
+                    frame = detector.results(i, timeout=0.01)
+                except queue.Empty:
+                    sink.pump()  # Window display stays on this thread
+                    continue
+                sink.submit(frame.image, frame.result)  # Copies the image before returning
+                frame.release()
+
+            if any(sink.quit_requested for sink in sinks):  # 'q' in any window
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detector.stop()
+        for sink in sinks:
+            sink.close()
+
+    detector.report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class Detections:
+    """
+    Detection results stored as contiguous numpy arrays instead of per-box Python objects.
+
+    All operations (class filtering, top-k, centres) are vectorized, so their cost
+    barely grows with the number of boxes in crowded scenes.
+
+    Args:
+        boxes (array-like): Bounding boxes as (N, 4) x1, y1, x2, y2 pixel coordinates.
+        class_ids (array-like): (N,) integer class IDs.
+        scores (array-like): (N,) confidence scores.
+        names (dict): Mapping from class ID to class name.
+    """
+
+    def __init__(self, boxes, class_ids, scores, names):
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.class_ids = np.ascontiguousarray(class_ids, dtype=np.int64).reshape(-1)
+        self.scores = np.ascontiguousarray(scores, dtype=np.float32).reshape(-1)
+        self.names = names
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+
+    @classmethod
+    def from_yolo(cls, result, names=None):
+        """
+        Builds detections from one ultralytics result with a single device-to-host copy.
+
+        Args:
+            result (ultralytics.engine.results.Results): Result for one image.
+            names (dict): Class names; defaults to `result.names`.
+        """
+        data = result.boxes.data.cpu().numpy()  # (N, 6): x1, y1, x2, y2, conf, cls
+        return cls(data[:, :4], data[:, 5], data[:, 4], names if names is not None else result.names)
+
+    @classmethod
+    def from_dicts(cls, items, names=None):
+        """
+        Builds detections from `to_dicts` output, e.g. a response of the inference server.
+
+        Args:
+            items (list): Dicts with x1, y1, x2, y2, class_id, label and score.
+            names (dict): Class names; defaults to the labels present in `items`.
+        """
+        if names is None:
+            names = {item["class_id"]: item["label"] for item in items}
+        return cls([[item["x1"], item["y1"], item["x2"], item["y2"]] for item in items],
+                   [item["class_id"] for item in items], [item["score"] for item in items], names)
+
+    @classmethod
+    def from_detr(cls, results, id2label):
+        """
+        Builds detections from the dict returned by `DetrImageProcessor.post_process_object_detection`.
+
+        Args:
+            results (dict): Tensors under "boxes" (x1, y1, x2, y2), "labels" and "scores".
+            id2label (dict): Mapping from class ID to class name.
+        """
+        return cls(results["boxes"].float().cpu().numpy(), results["labels"].cpu().numpy(),
+                   results["scores"].float().cpu().numpy(), id2label)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        """Selects detections with an integer array, slice or boolean mask."""
+        if isinstance(index, (int, np.integer)):
+            index = [index]
+        return Detections(self.boxes[index], self.class_ids[index], self.scores[index], self.names)
+
+    def class_ids_for(self, classes):
+        """Converts a list of class names and/or IDs to an array of class IDs."""
+        name_to_id = {name: class_id for class_id, name in self.names.items()}
+        return np.array([name_to_id.get(c, -1) if isinstance(c, str) else int(c) for c in classes],
+                        dtype=np.int64)
+
+    def filter_classes(self, classes):
+        """
+        Keeps only detections of the given classes.
+
+        Args:
+            classes (list): Class names and/or class IDs.
+        """
+        return self[np.isin(self.class_ids, self.class_ids_for(classes))]
+
+    def filter_scores(self, threshold):
+        """Keeps only detections with a score of at least `threshold`."""
+        return self[self.scores >= threshold]
+
+    def top_k(self, k):
+        """
+        Returns the `k` highest-scoring detections, sorted by descending score.
+        """
+        if k < len(self):
+            index = np.argpartition(-self.scores, k)[:k]
+            index = index[np.argsort(-self.scores[index], kind="stable")]
+        else:
+            index = np.argsort(-self.scores, kind="stable")
+        return self[index]
+
+    def sort_by_score(self):
+        return self.top_k(len(self))
+
+    def centers(self):
+        """
+        Returns:
+            numpy.ndarray: (N, 2) box centres as x, y.
+        """
+        return (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+
+    def labels(self):
+        """Returns the class name of every detection."""
+        return [self.names[class_id] for class_id in self.class_ids.tolist()]
+
+    def to_dicts(self):
+        """Returns detections as a list of dicts (x1, y1, x2, y2, class_id, label, score) for printing or JSON."""
+        return [{"x1": x1, "y1": y1, "x2": x2, "y2": y2, "class_id": class_id, "label": label, "score": score}
+                for (x1, y1, x2, y2), class_id, label, score in zip(self.boxes.tolist(), self.class_ids.tolist(),
+                                                                    self.labels(), self.scores.tolist())]
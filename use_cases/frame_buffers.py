@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class FrameRing:
+    """
+    Pool of preallocated BGR frame buffers reused across capture iterations.
+
+    `cv2.VideoCapture.read(image)` decodes straight into a buffer of the right
+    shape instead of allocating a new array per frame. Frames are handed to YOLO
+    as BGR numpy arrays, which is the layout ultralytics expects, so no colour
+    conversion or PIL copy is needed on the hot path.
+
+    Buffers are checked out by `read` and stay checked out until the last
+    stage that uses the frame hands them back with `release` (see
+    `frame_pipeline.Frame.release`). A buffer still in use is never written
+    to: when all buffers are checked out, `read` decodes into a freshly
+    allocated array instead and counts it in `exhausted`, so a slow consumer
+    costs an allocation, never a torn frame.
+
+    Args:
+        size (int): Number of buffers in the pool.
+        shape (tuple): Frame shape (height, width, 3); allocated lazily from the first frame if None.
+        dtype (numpy.dtype): Pixel type.
+    """
+
+    def __init__(self, size=4, shape=None, dtype=np.uint8):
+        self.size = size
+        self.dtype = dtype
+        self.reallocations = 0  # Times the pool had to be rebuilt because the frame size changed
+        self.exhausted = 0  # Frames decoded into a new array because every buffer was still in use
+        self._lock = threading.Lock()
+        self._free = deque()
+        self._owned = set()  # id() of the buffers belonging to the current pool
+        self._shape = None
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape, adopt=None):
+        """Builds a new pool for `shape`; `adopt` is an already filled array that joins it checked out."""
+        buffers = [np.empty(shape, dtype=self.dtype) for _ in range(self.size - (adopt is not None))]
+        with self._lock:
+            self._shape = shape
+            self._free = deque(buffers)
+            self._owned = {id(buffer) for buffer in buffers}
+            if adopt is not None:
+                self._owned.add(id(adopt))
+
+    def acquire(self):
+        """Checks out a free buffer; returns None before the frame size is known or when all are in use."""
+        with self._lock:
+            if self._shape is None:
+                return None
+            if not self._free:
+                self.exhausted += 1
+                return None
+            return self._free.popleft()
+
+    def release(self, buffer):
+        """Returns a buffer checked out by `acquire`/`read`; arrays that are not part of the pool are ignored."""
+        with self._lock:
+            owned = id(buffer) in self._owned and buffer.shape == self._shape
+            if owned and not any(free is buffer for free in self._free):  # Ignore double releases
+                self._free.append(buffer)
+
+    def read(self, cap):
+        """
+        Reads one frame from `cap` into a free buffer, which stays checked out until `release`d.
+
+        Args:
+            cap (cv2.VideoCapture): Opened capture.
+
+        Returns:
+            tuple: (ret, image) like `cap.read()`; `image` is a pool buffer when one was free.
+        """
+        buffer = self.acquire()
+        ret, image = cap.read(buffer)
+        if not ret:
+            if buffer is not None:
+                self.release(buffer)
+            return ret, image
+        if image is not buffer:
+            if buffer is not None:
+                self.release(buffer)
+            if image.shape != self._shape:
+                # First frame or resolution change: rebuild the pool for the new shape
+                if self._shape is not None:
+                    self.reallocations += 1
+                self._allocate(image.shape, adopt=image)
+        return ret, image
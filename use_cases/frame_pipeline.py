@@ -0,0 +1,375 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import instrumentation
+
+
+class LatestQueue:
+    """
+    Bounded queue that drops the oldest item instead of blocking the producer.
+
+    Used between pipeline stages so a slow consumer always sees the newest
+    frame rather than a backlog of stale ones.
+
+    Args:
+        maxsize (int): Number of items kept.
+        name (str): Optional name under which drops and depth are exported by `instrumentation`.
+        on_drop (callable): Called with every discarded item, e.g. `Frame.release` to
+            return its buffer to the capture ring.
+    """
+
+    def __init__(self, maxsize=1, name=None, on_drop=None):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.name = name
+        self.on_drop = on_drop
+        self.dropped = 0  # Number of items discarded because the consumer fell behind
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                if self.name is not None and instrumentation.enabled:  # Skip qsize() when metrics are off
+                    instrumentation.gauge("queue_depth", self._queue.qsize(), queue=self.name)
+                return
+            except queue.Full:
+                try:
+                    dropped = self._queue.get_nowait()
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop(dropped)
+                    if self.name is not None:
+                        instrumentation.count("queue_dropped", queue=self.name)
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Returns the next item, raising queue.Empty after `timeout` seconds."""
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+def parse_source(source):
+    """
+    Converts a command-line camera source into what cv2.VideoCapture expects.
+
+    Args:
+        source (str | int): Device index ("0"), video file path or stream URL (rtsp://, http://).
+
+    Returns:
+        int | str: Device index as int, anything else unchanged.
+    """
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def open_capture(source, loop=True, realtime=True):
+    """
+    Opens a camera, video file, directory of frames or network stream.
+
+    Local video files are wrapped in a `ReplayCapture` and image directories in
+    an `ImageSequenceCapture`, so recordings can stand in for a live camera or
+    RTSP feed during development and benchmarks.
+
+    Args:
+        source (str | int): Device index, video file path, image directory or stream URL.
+        loop (bool): Restart local recordings when they reach the end.
+        realtime (bool): Play local recordings at their frame rate; False delivers frames as fast as possible.
+
+    Returns:
+        cv2.VideoCapture | ReplayCapture | ImageSequenceCapture: Opened capture (check `isOpened()`).
+    """
+    source = parse_source(source)
+    if isinstance(source, str) and os.path.isdir(source):
+        return ImageSequenceCapture(source, loop=loop, realtime=realtime)
+    if isinstance(source, str) and "://" not in source:
+        return ReplayCapture(source, loop=loop, realtime=realtime)
+    return cv2.VideoCapture(source)
+
+
+class ReplayCapture:
+    """
+    Plays a video file back at its native frame rate, like a live camera would.
+
+    Args:
+        path (str): Video file path.
+        loop (bool): Rewind to the first frame at the end of the file.
+        realtime (bool): Sleep between frames to match the file's FPS; disable for benchmarks.
+    """
+
+    def __init__(self, path, loop=True, realtime=True):
+        self._cap = cv2.VideoCapture(path)
+        self.loop = loop
+        self.realtime = realtime
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self._period = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self._next_frame_at = None
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def get(self, prop):
+        return self._cap.get(prop)
+
+    def set(self, prop, value):
+        return self._cap.set(prop, value)
+
+    def read(self, image=None):
+        ret, image = self._cap.read(image)
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = self._cap.read(image)
+
+        if ret and self.realtime:
+            now = time.perf_counter()
+            if self._next_frame_at is not None and self._next_frame_at > now:
+                time.sleep(self._next_frame_at - now)
+            self._next_frame_at = max(now, self._next_frame_at or now) + self._period
+        return ret, image
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageSequenceCapture:
+    """
+    Plays a directory of still images back like a camera.
+
+    Images are decoded (and optionally resized to a fixed camera resolution)
+    once up front, so `read` costs about as much as a driver handing over a frame.
+
+    Args:
+        directory (str): Directory with .jpg/.png/.bmp frames, played in file name order.
+        loop (bool): Start again after the last image.
+        fps (float): Playback rate when `realtime` is set.
+        realtime (bool): Sleep between frames to match `fps`; disable for benchmarks.
+        size (tuple): (width, height) every frame is resized to; None keeps each image's size.
+    """
+
+    IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, directory, loop=True, fps=30, realtime=True, size=None):
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.lower().endswith(self.IMAGE_EXTENSIONS))
+        self._frames = []
+        for path in paths:
+            image = cv2.imread(path)
+            if image is not None:
+                self._frames.append(cv2.resize(image, size) if size else image)
+        self.loop = loop
+        self.fps = fps
+        self.realtime = realtime
+        self._index = 0
+        self._period = 1.0 / fps
+        self._next_frame_at = None
+
+    def isOpened(self):
+        return bool(self._frames)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self._frames)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self._frames:
+            return self._frames[0].shape[1 if prop == cv2.CAP_PROP_FRAME_WIDTH else 0]
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def read(self, image=None):
+        if self._index >= len(self._frames):
+            if not self.loop or not self._frames:
+                return False, None
+            self._index = 0
+        frame = self._frames[self._index]
+        self._index += 1
+
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next_frame_at is not None and self._next_frame_at > now:
+                time.sleep(self._next_frame_at - now)
+            self._next_frame_at = max(now, self._next_frame_at or now) + self._period
+
+        # Hand out a copy, like a camera would, so callers may draw on it
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def release(self):
+        self._frames = []
+
+
+class Frame:
+    """
+    A captured frame together with its capture time and the result attached by later stages.
+
+    When the image lives in a `FrameRing` buffer, the last stage that uses the
+    frame (or the queue that drops it) must call `release`; until then the
+    capture thread will not reuse the buffer.
+    """
+
+    __slots__ = ("index", "image", "captured_at", "result", "ring")
+
+    def __init__(self, index, image, captured_at, ring=None):
+        self.index = index
+        self.image = image
+        self.captured_at = captured_at  # time.perf_counter() when the frame left the camera
+        self.result = None
+        self.ring = ring
+
+    def release(self):
+        """Hands the image buffer back to its ring; `image` must not be used afterwards."""
+        if self.ring is not None:
+            self.ring.release(self.image)
+            self.ring = None
+
+
+class LatencyStats:
+    """
+    Keeps a rolling window of durations per pipeline stage.
+
+    Args:
+        window (int): Number of most recent samples kept per stage.
+        name (str): Optional component name; samples are then also exported by
+            `instrumentation` as spans named '<name>.<stage>'.
+    """
+
+    def __init__(self, window=300, name=None):
+        self._samples = {}
+        self._window = window
+        self.name = name
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        if self.name is not None and instrumentation.enabled:  # Skip building the name when metrics are off
+            instrumentation.observe(f"{self.name}.{stage}", seconds)
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self._window)
+            self._samples[stage].append(seconds)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Per-stage count, mean, p50, p95, p99 and max latency in milliseconds.
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+
+        summary = {}
+        for stage, values in samples.items():
+            if not values:
+                continue
+            summary[stage] = {
+                "count": len(values),
+                "mean_ms": 1000 * sum(values) / len(values),
+                "p50_ms": 1000 * values[len(values) // 2],
+                "p95_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.95))],
+                "p99_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.99))],
+                "max_ms": 1000 * values[-1],
+            }
+        return summary
+
+    def report(self):
+        """Prints the latency summary as a small table."""
+        for stage, s in self.summary().items():
+            print(f"{stage:>12}: n={s['count']:<5} mean={s['mean_ms']:7.1f} ms  "
+                  f"p50={s['p50_ms']:7.1f} ms  p95={s['p95_ms']:7.1f} ms  p99={s['p99_ms']:7.1f} ms  "
+                  f"max={s['max_ms']:7.1f} ms")
+
+
+class FrameCapture(threading.Thread):
+    """
+    Reads frames from an opened capture as fast as the device delivers them.
+
+    Only the newest frame is kept in `output`, so the driver buffer is drained
+    continuously and downstream stages never work on a backlog.
+
+    Args:
+        cap (cv2.VideoCapture): Opened capture device or video file.
+        output (LatestQueue): Queue receiving `Frame` objects.
+        stats (LatencyStats): Optional latency recorder ("capture" stage).
+        ring (FrameRing): Optional preallocated buffers to decode into instead of
+            allocating a new array per frame. Consumers must `release` every frame,
+            and `output` should release the frames it drops (`on_drop=Frame.release`).
+    """
+
+    def __init__(self, cap, output, stats=None, ring=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.output = output
+        self.stats = stats
+        self.ring = ring
+        self._stop_event = threading.Event()
+
+    def run(self):
+        index = 0
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, image = self.ring.read(self.cap) if self.ring is not None else self.cap.read()
+            if not ret:
+                break
+
+            captured_at = time.perf_counter()
+            if self.stats is not None:
+                self.stats.record("capture", captured_at - start)
+            self.output.put(Frame(index, image, captured_at, ring=self.ring))
+            index += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Takes the newest frame from `source`, runs `infer` on it and forwards it to `output`.
+
+    If `infer` raises, the error is logged and the frame is forwarded with
+    `frame.result = None`, so the worker keeps running.
+
+    Args:
+        source (LatestQueue): Queue of frames produced by `FrameCapture`.
+        output (LatestQueue): Queue receiving frames with `frame.result` set.
+        infer (callable): Function called as `infer(frame)`; its return value becomes `frame.result`.
+        stats (LatencyStats): Optional latency recorder ("inference" stage).
+    """
+
+    def __init__(self, source, output, infer, stats=None):
+        super().__init__(daemon=True)
+        self.source = source
+        self.output = output
+        self.infer = infer
+        self.stats = stats
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                frame = self.source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            start = time.perf_counter()
+            try:
+                frame.result = self.infer(frame)
+            except Exception as e:
+                print(f"Error running inference on frame {frame.index}: {e}")
+                frame.result = None
+            if self.stats is not None:
+                self.stats.record("inference", time.perf_counter() - start)
+            self.output.put(frame)
+            instrumentation.frame_tick()  # Drives the sampled profiling window, if configured
+
+    def stop(self):
+        self._stop_event.set()
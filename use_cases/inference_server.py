@@ -0,0 +1,578 @@
+"""
+Local multi-model inference server with dynamic batching.
+
+One process keeps YOLO, DETR, BLIP and ViLT resident (loaded on first use
+through the model registry) and serves them over HTTP on localhost or a Unix
+socket. Each model has its own bounded request queue and batcher: requests
+arriving within `max_wait` of each other are run as one batch of up to
+`max_batch`, on a thread pool so the event loop keeps accepting requests.
+When a queue is full the server answers 503 right away instead of letting
+latency grow without bound.
+
+    python use_cases/inference_server.py --port 8765
+    python use_cases/inference_server.py --unix /tmp/vlm.sock --max-batch 8 --max-wait 0.01
+
+Requests are JSON POSTs to /v1/<model> with the image as base64 ("image") or,
+when the server was started with --image-root, a server-side file path below
+that directory ("path"), plus model parameters:
+
+    /v1/yolo     {"image": ..., "imgsz": 640}                         -> {"detections": [...]}
+    /v1/detr     {"image": ..., "threshold": 0.9}                    -> {"detections": [...]}
+    /v1/blip     {"image": ..., "prompt": "a photo of", "preset": "fast"} -> {"caption": "..."}
+    /v1/vilt     {"image": ..., "question": "What color is the cat?"} -> {"answer": "..."}
+
+GET /health reports liveness and GET /stats the queue depth, batch sizes and
+latency per model. `InferenceClient` wraps the protocol for Python callers.
+"""
+import argparse
+import asyncio
+import base64
+import http.client
+import io
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from detections import Detections
+from frame_pipeline import LatencyStats
+from model_registry import get_model, prepare_inputs, use_model
+from pkg_transformers_Blip import GENERATION_PRESETS
+from pkg_transformers_Detr import detect_objects_batch
+from pkg_transformers_Vilt import VqaSession
+from result_cache import image_hash
+
+
+class RequestError(Exception):
+    """A request the server rejects; carries the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class DecodedImage:
+    """Request image decoded once into the layouts the models need."""
+
+    __slots__ = ("bgr", "_key", "_pil")
+
+    def __init__(self, data):
+        self.bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if self.bgr is None:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Could not decode image")
+        self._key = None
+        self._pil = None
+
+    @property
+    def key(self):
+        """Pixel hash of the RGB image, the same key the result cache and VqaSession use for it."""
+        if self._key is None:
+            self._key = image_hash(self.pil)
+        return self._key
+
+    @property
+    def pil(self):
+        if self._pil is None:
+            self._pil = Image.fromarray(cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+        return self._pil
+
+
+def decode_request_image(payload, image_root=None):
+    """
+    Reads the image of a request from base64 ("image") or a local file ("path").
+
+    Args:
+        payload (dict): Request body.
+        image_root (str): Directory that "path" requests may read from; None rejects them.
+
+    Raises:
+        RequestError: 400 for a missing or malformed image, 403 for a path outside `image_root`.
+    """
+    if "image" in payload:
+        if not isinstance(payload["image"], str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'image' must be a base64 string")
+        data = base64.b64decode(payload["image"], validate=True)
+    elif "path" in payload:
+        if image_root is None:
+            raise RequestError(HTTPStatus.FORBIDDEN, "This server does not read files; send 'image' instead")
+        if not isinstance(payload["path"], str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'path' must be a string")
+        root = os.path.realpath(image_root)
+        path = os.path.realpath(os.path.join(root, payload["path"]))
+        if os.path.commonpath([root, path]) != root:
+            raise RequestError(HTTPStatus.FORBIDDEN, "'path' must be inside the server's image root")
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Could not read '{payload['path']}': {e.strerror}")
+    else:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Request needs 'image' (base64) or 'path'")
+    return DecodedImage(data)
+
+
+def _number(payload, name, kind, low, high, default=None):
+    """Reads parameter `name` as `kind` within [low, high]; raises RequestError (400) otherwise."""
+    value = payload.get(name, default)
+    if value is None:
+        return None
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a number, got {value!r}")
+    if not low <= value <= high:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be between {low} and {high}, got {value}")
+    return value
+
+
+def _text(payload, name, required=False):
+    """Reads parameter `name` as a string; raises RequestError (400) if it has another type or is missing."""
+    value = payload.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a{' non-empty' if required else ''} string")
+    return value
+
+
+def validate_params(model, payload):
+    """
+    Checks and coerces the parameters of a request in place, so a bad value fails only its own request.
+
+    Raises:
+        RequestError: 400 for a missing parameter, or one of the wrong type or out of range.
+    """
+    if model == "yolo":
+        payload["imgsz"] = _number(payload, "imgsz", int, 32, 4096)
+    elif model == "detr":
+        payload["threshold"] = _number(payload, "threshold", float, 0.0, 1.0, default=0.9)
+    elif model == "blip":
+        payload["prompt"] = _text(payload, "prompt")
+        payload["preset"] = _text(payload, "preset") or "fast"
+        if payload["preset"] not in GENERATION_PRESETS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Unknown preset '{payload['preset']}'. "
+                                                       f"Choose one of {sorted(GENERATION_PRESETS)}.")
+    elif model == "vilt":
+        payload["question"] = _text(payload, "question", required=True)
+    return payload
+
+
+def _fail(responses, indices, error):
+    """Answers the requests at `indices` with `error`, logging it; other requests in the batch are unaffected."""
+    print(f"Error serving a group of {len(indices)} request(s): {error}")
+    for i in indices:
+        responses[i] = error
+
+
+def run_yolo(requests):
+    responses = [None] * len(requests)
+    groups = {}  # Requests with the same inference size share one forward pass
+    for i, (_, payload) in enumerate(requests):
+        try:
+            groups.setdefault(validate_params("yolo", payload)["imgsz"], []).append(i)
+        except RequestError as e:
+            responses[i] = e
+
+    with use_model("yolo") as model:  # Not evicted while the batch runs
+        for imgsz, indices in groups.items():
+            try:
+                results = model([requests[i][0].bgr for i in indices], verbose=False,
+                                **({"imgsz": imgsz} if imgsz else {}))
+                for i, result in zip(indices, results):
+                    responses[i] = {"detections": Detections.from_yolo(result, model.names).to_dicts()}
+            except Exception as e:
+                _fail(responses, indices, e)
+    return responses
+
+
+def run_detr(requests):
+    responses = [None] * len(requests)
+    valid = []  # (index, threshold)
+    for i, (_, payload) in enumerate(requests):
+        try:
+            valid.append((i, validate_params("detr", payload)["threshold"]))
+        except RequestError as e:
+            responses[i] = e
+    if not valid:
+        return responses
+
+    # One forward pass at the lowest requested threshold; stricter requests are filtered afterwards
+    batch = detect_objects_batch([requests[i][0].pil for i, _ in valid], threshold=min(t for _, t in valid))
+    for (i, threshold), detections in zip(valid, batch):
+        responses[i] = {"detections": detections.filter_scores(threshold).to_dicts()}
+    return responses
+
+
+def run_blip(requests):
+    responses = [None] * len(requests)
+    groups = {}  # Requests with the same prompt and preset share one generate call
+    for i, (_, payload) in enumerate(requests):
+        try:
+            validate_params("blip", payload)
+            groups.setdefault((payload["prompt"], payload["preset"]), []).append(i)
+        except RequestError as e:
+            responses[i] = e
+
+    with use_model("blip") as (model, processor):
+        for (prompt, preset), indices in groups.items():
+            try:
+                images = [requests[i][0].pil for i in indices]
+                inputs = prepare_inputs(processor(images=images, text=[prompt] * len(images) if prompt else None,
+                                                  return_tensors="pt"), model)
+                with torch.no_grad():
+                    caption_ids = model.generate(**inputs, **GENERATION_PRESETS[preset])
+                for i, caption in zip(indices, processor.batch_decode(caption_ids, skip_special_tokens=True)):
+                    responses[i] = {"caption": caption.strip()}
+            except Exception as e:
+                _fail(responses, indices, e)
+    return responses
+
+
+_vqa_session = VqaSession(max_images=32)
+
+
+def run_vilt(requests):
+    responses = [None] * len(requests)
+    groups = {}  # Questions about the same image are answered in one forward pass
+    for i, (image, payload) in enumerate(requests):
+        try:
+            validate_params("vilt", payload)
+            groups.setdefault(image.key, []).append(i)
+        except RequestError as e:
+            responses[i] = e
+
+    for key, indices in groups.items():
+        try:
+            answers = _vqa_session.answer(requests[indices[0]][0].pil,
+                                          [requests[i][1]["question"] for i in indices], key=key)
+            for i, answer in zip(indices, answers):
+                responses[i] = {"answer": answer}
+        except Exception as e:
+            _fail(responses, indices, e)
+    return responses
+
+
+MODEL_HANDLERS = {"yolo": run_yolo, "detr": run_detr, "blip": run_blip, "vilt": run_vilt}
+
+
+class ModelQueue:
+    """
+    Bounded request queue plus the batcher serving one model.
+
+    Args:
+        name (str): Model name, a key of MODEL_HANDLERS.
+        executor (concurrent.futures.Executor): Pool running the batches.
+        max_batch (int): Most requests per batch.
+        max_wait (float): Seconds the batcher waits for more requests after the first one arrives.
+        max_queue (int): Waiting requests beyond which new ones are rejected.
+    """
+
+    def __init__(self, name, executor, max_batch=8, max_wait=0.01, max_queue=64):
+        self.name = name
+        self.handler = MODEL_HANDLERS[name]
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.stats = LatencyStats()
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def submit(self, image, payload):
+        """
+        Queues a request; returns a future with its response.
+
+        Raises:
+            RequestError: 503 when the queue is full.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image, payload, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, f"{self.name} queue is full, retry later")
+        return future
+
+    async def _collect(self):
+        """Waits for a request, then gathers more until the batch is full or `max_wait` has passed."""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            start = time.perf_counter()
+            for _, _, _, queued_at in batch:
+                self.stats.record("queue_wait", start - queued_at)
+            try:
+                responses = await loop.run_in_executor(self.executor, self.handler,
+                                                       [(image, payload) for image, payload, _, _ in batch])
+            except Exception as e:
+                responses = [e] * len(batch)
+            self.stats.record("batch", time.perf_counter() - start)
+            self.batches += 1
+            self.requests += len(batch)
+
+            for (_, _, future, _), response in zip(batch, responses):
+                if future.cancelled():
+                    continue
+                if isinstance(response, Exception):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+
+    def summary(self):
+        return {"queue_depth": self.queue.qsize(), "requests": self.requests, "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "rejected": self.rejected, "latency": self.stats.summary()}
+
+
+class InferenceServer:
+    """
+    asyncio HTTP/1.1 server routing requests to one ModelQueue per model.
+
+    Args:
+        models (list): Models to serve (keys of MODEL_HANDLERS).
+        max_batch (int): Most requests per batch.
+        max_wait (float): Batching window in seconds.
+        max_queue (int): Waiting requests per model before new ones get 503.
+        workers (int): Inference threads; defaults to one per model so models run concurrently.
+        preload (bool): Load and warm up all models before accepting requests.
+        image_root (str): Directory "path" requests may read images from; None (default) accepts only
+            images sent in the request, so clients cannot read files from the server.
+    """
+
+    def __init__(self, models=tuple(MODEL_HANDLERS), max_batch=8, max_wait=0.01, max_queue=64, workers=None,
+                 preload=True, image_root=None):
+        self.models = list(models)
+        self.executor = ThreadPoolExecutor(max_workers=workers or len(self.models))
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.preload = preload
+        self.image_root = image_root
+        self.queues = {}
+        self.started_at = None
+        self._decoder = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """Loads the models (if `preload`), starts the batchers and listens."""
+        loop = asyncio.get_running_loop()
+        if self.preload:
+            for name in self.models:
+                await loop.run_in_executor(self.executor, get_model, name)
+        for name in self.models:
+            self.queues[name] = ModelQueue(name, self.executor, self.max_batch, self.max_wait, self.max_queue)
+            loop.create_task(self.queues[name].run())
+
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+            print(f"Serving {', '.join(self.models)} on unix:{unix_path}")
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            print(f"Serving {', '.join(self.models)} on http://{host}:{port}/")
+        self.started_at = time.perf_counter()
+        return server
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, response = await self._route(method, path, body)
+                data = json.dumps(response).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n".encode("latin-1"))
+                if status == HTTPStatus.SERVICE_UNAVAILABLE:
+                    writer.write(b"Retry-After: 1\r\n")
+                writer.write(b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok", "models": self.models}
+        if method == "GET" and path == "/stats":
+            return HTTPStatus.OK, {name: queue.summary() for name, queue in self.queues.items()}
+        if method != "POST" or not path.startswith("/v1/"):
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"}
+
+        name = path[len("/v1/"):]
+        if name not in self.queues:
+            return HTTPStatus.NOT_FOUND, {"error": f"Model '{name}' is not served. Available: {self.models}"}
+        try:
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            validate_params(name, payload)  # Reject bad parameters here, before they can join a batch
+            image = await asyncio.get_running_loop().run_in_executor(self._decoder, decode_request_image, payload,
+                                                                     self.image_root)
+            return HTTPStatus.OK, await self.queues[name].submit(image, payload)
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, KeyError, OSError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            print(f"Error serving {name} request: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class InferenceClient:
+    """
+    Blocking client for the inference server; keeps one connection open.
+
+    Not thread-safe: use one client per thread.
+
+    Args:
+        url (str): 'http://host:port' or 'unix:/path/to/socket'.
+        timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=60):
+        self.url = url
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.url.startswith("unix:"):
+            return _UnixHTTPConnection(self.url[len("unix:"):], timeout=self.timeout)
+        host_port = self.url.split("://", 1)[-1].rstrip("/")
+        return http.client.HTTPConnection(host_port, timeout=self.timeout)
+
+    def request(self, model, image=None, path=None, **params):
+        """
+        Sends one request and returns the decoded JSON response.
+
+        Args:
+            model (str): 'yolo', 'detr', 'blip' or 'vilt'.
+            image (numpy.ndarray | PIL.Image | bytes): BGR array, PIL image or encoded image bytes.
+            path (str): Image file relative to the server's --image-root, instead of `image`.
+            **params: Model parameters, e.g. threshold, prompt, preset, question.
+
+        Raises:
+            RuntimeError: When the server answers with an error (503 means overloaded; retry later).
+        """
+        payload = dict(params)
+        if path is not None:
+            payload["path"] = path
+        else:
+            payload["image"] = base64.b64encode(encode_image(image)).decode("ascii")
+        body = json.dumps(payload)
+
+        for attempt in range(2):  # Reconnect once if the kept-alive connection was closed
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request("POST", f"/v1/{model}", body, {"Content-Type": "application/json"})
+                response = self._connection.getresponse()
+                data = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    raise
+        if response.status != HTTPStatus.OK:
+            raise RuntimeError(f"{model} request failed ({response.status}): {data.get('error')}")
+        return data
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def encode_image(image):
+    """Encodes a BGR array or PIL image as JPEG bytes; bytes are passed through."""
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, Image.Image):
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=95)
+        return buffer.getvalue()
+    ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return data.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local multi-model inference server with dynamic batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_HANDLERS), choices=list(MODEL_HANDLERS))
+    parser.add_argument("--max-batch", type=int, default=8, help="Most requests per batch")
+    parser.add_argument("--max-wait", type=float, default=0.01, help="Batching window in seconds")
+    parser.add_argument("--max-queue", type=int, default=64, help="Waiting requests per model before 503")
+    parser.add_argument("--workers", type=int, default=None, help="Inference threads (default: one per model)")
+    parser.add_argument("--image-root", default=None,
+                        help="Let clients send 'path' requests for images below this directory (default: off)")
+    args = parser.parse_args()
+
+    async def serve():
+        server = InferenceServer(args.models, max_batch=args.max_batch, max_wait=args.max_wait,
+                                 max_queue=args.max_queue, workers=args.workers, image_root=args.image_root)
+        listener = await server.start(args.host, args.port, unix_path=args.unix)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Lightweight spans, histograms and counters for the detection, speech and VQA paths.
+
+Instrumentation is off by default. While it is off, `span()` returns a shared
+no-op context manager and `count()`, `gauge()` and `observe()` return after
+one flag check, so the calls can stay in hot loops.
+
+Turn it on with environment variables, or by calling `configure()`:
+
+    VLM_METRICS=prometheus:9464            serve Prometheus text at http://127.0.0.1:9464/metrics
+    VLM_METRICS=jsonl:trace.jsonl          append one JSON line per finished span
+    VLM_METRICS=prometheus:9464,jsonl:trace.jsonl
+    VLM_METRICS=memory                     collect only; read with snapshot() or report()
+    VLM_PROFILE=cprofile:50                profile 50 frames after a 30-frame warm-up
+    VLM_PROFILE=torch:20@100               torch.profiler on 20 frames, starting at frame 100
+
+Loops call `frame_tick()` once per frame to drive the sampled profiling window.
+"""
+import atexit
+import bisect
+import functools
+import http.server
+import json
+import os
+import threading
+import time
+from collections import deque
+
+enabled = False  # Checked first by every call; False keeps instrumentation to a single global lookup
+
+# Default latency buckets in seconds, 1 ms to 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative bucket counts for Prometheus plus a rolling window for percentiles.
+
+    Args:
+        buckets (tuple): Upper bounds in seconds, ascending.
+        window (int): Number of most recent samples kept for percentiles.
+    """
+
+    __slots__ = ("buckets", "counts", "total", "count", "recent")
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=1000):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Count and sum over the whole run, mean/p50/p95/p99/max in ms over the rolling window.
+        """
+        values = sorted(self.recent)
+        if not values:
+            return {"count": self.count, "sum_s": self.total}
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "mean_ms": 1000 * sum(values) / len(values),
+            "p50_ms": 1000 * values[len(values) // 2],
+            "p95_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.95))],
+            "p99_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.99))],
+            "max_ms": 1000 * values[-1],
+        }
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+def _display_name(name, labels):
+    return f"{name}{{{_label_text(labels)}}}" if labels else name
+
+
+class Registry:
+    """
+    Thread-safe store of counters, gauges and span histograms.
+
+    Metrics are keyed by (name, labels), where labels is a sorted tuple of (key, value) pairs.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, key, value):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, key, value):
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, key, seconds):
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: 'counters', 'gauges' and 'spans' (histogram summaries), keyed by display name.
+        """
+        with self._lock:
+            return {
+                "counters": {_display_name(*key): value for key, value in self.counters.items()},
+                "gauges": {_display_name(*key): value for key, value in self.gauges.items()},
+                "spans": {_display_name(*key): h.summary() for key, h in self.histograms.items()},
+            }
+
+    def prometheus_text(self, prefix="vlm"):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{_display_name(f'{prefix}_{name}_total', labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f"{_display_name(f'{prefix}_{name}', labels)} {value}")
+            if self.histograms:
+                lines.append(f"# TYPE {prefix}_span_seconds histogram")
+            for (name, labels), h in sorted(self.histograms.items()):
+                label_text = _label_text((("span", name),) + labels)
+                cumulative = 0
+                for bound, count in zip(h.buckets + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_span_seconds_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{prefix}_span_seconds_sum{{{label_text}}} {h.total}")
+                lines.append(f"{prefix}_span_seconds_count{{{label_text}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class TraceWriter:
+    """
+    Appends one JSON line per finished span to a file.
+
+    Lines are buffered and written by the calling thread under a lock; the
+    file is flushed every `flush_every` spans and on close.
+    """
+
+    def __init__(self, path, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the registry at /metrics (Prometheus text) and /metrics.json (snapshot)."""
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.prometheus_text().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrape logging off the console
+
+
+def serve_prometheus(port=9464, host="127.0.0.1"):
+    """
+    Serves the metrics endpoint on a daemon thread.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics at http://{host}:{port}/metrics")
+    return server
+
+
+class ProfileWindow:
+    """
+    Profiles a sampled window of frames with cProfile or torch.profiler.
+
+    `tick()` is called once per frame. Profiling starts after `skip` frames,
+    so model loading and warm-up stay out of the profile, and stops
+    `frames` frames later. The result is written to `output` and the top
+    entries are printed.
+
+    cProfile only sees the thread that calls `tick()`; torch.profiler records
+    operators from all threads.
+
+    Args:
+        kind (str): 'cprofile' or 'torch'.
+        frames (int): Number of frames profiled.
+        skip (int): Frames before the window starts.
+        output (str): Output file; defaults to profile.prof (cProfile) or profile_trace.json (Chrome trace).
+    """
+
+    def __init__(self, kind="cprofile", frames=50, skip=30, output=None):
+        if kind not in ("cprofile", "torch"):
+            raise ValueError(f"Unknown profiler '{kind}'. Use cprofile or torch.")
+        self.kind = kind
+        self.frames = frames
+        self.skip = skip
+        self.output = output or ("profile.prof" if kind == "cprofile" else "profile_trace.json")
+        self.done = False
+        self._seen = 0
+        self._profiler = None
+        self._lock = threading.Lock()
+
+    def tick(self):
+        with self._lock:
+            if self.done:
+                return
+            self._seen += 1
+            if self._seen == self.skip + 1:
+                self._start()
+            elif self._seen == self.skip + self.frames + 1:
+                self._stop()
+
+    def _start(self):
+        if self.kind == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._profiler = torch.profiler.profile(activities=activities)
+            self._profiler.__enter__()
+        print(f"Profiling {self.frames} frames with {self.kind}...")
+
+    def _stop(self):
+        self.done = True
+        if self.kind == "cprofile":
+            import pstats
+            self._profiler.disable()
+            self._profiler.dump_stats(self.output)
+            pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(15)
+        else:
+            self._profiler.__exit__(None, None, None)
+            self._profiler.export_chrome_trace(self.output)
+            print(self._profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=15))
+        print(f"Profile written to {self.output}")
+        self._profiler = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times a block and records it in the registry (and the trace, if one is open)."""
+
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        registry.observe((self.name, self.labels), seconds)
+        if _trace is not None:
+            record = {"ts": time.time() - seconds, "span": self.name, "ms": 1000 * seconds,
+                      "thread": threading.current_thread().name}
+            record.update(self.labels)
+            _trace.write(record)
+        return False
+
+
+registry = Registry()
+_trace = None
+_profile = None
+_server = None
+
+
+def span(name, **labels):
+    """
+    Context manager timing a named stage, e.g. `with span("yolo"): ...`.
+
+    Returns a shared no-op object while instrumentation is disabled.
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return Span(name, tuple(sorted(labels.items())))
+
+
+def timed(name, **labels):
+    """Decorator wrapping every call of a function in `span(name, **labels)`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(name, tuple(sorted(labels.items()))):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **labels):
+    """Adds `value` to a counter, e.g. `count("cache", result="hit")`."""
+    if enabled:
+        registry.count((name, tuple(sorted(labels.items()))), value)
+
+
+def gauge(name, value, **labels):
+    """Sets a gauge such as a queue depth."""
+    if enabled:
+        registry.gauge((name, tuple(sorted(labels.items()))), value)
+
+
+def observe(name, seconds, **labels):
+    """Records a duration measured elsewhere (e.g. by `LatencyStats`) as a span."""
+    if enabled:
+        registry.observe((name, tuple(sorted(labels.items()))), seconds)
+
+
+def frame_tick():
+    """Marks the end of a frame for the sampled profiling window, if one is configured."""
+    if _profile is not None:
+        _profile.tick()
+
+
+def snapshot():
+    """Returns the current counters, gauges and span summaries as a dict."""
+    return registry.snapshot()
+
+
+def report():
+    """Prints all spans, counters and gauges collected so far."""
+    data = registry.snapshot()
+    for name, s in sorted(data["spans"].items()):
+        if "p50_ms" in s:
+            print(f"{name:>32}: n={s['count']:<6} mean={s['mean_ms']:7.1f} ms  p50={s['p50_ms']:7.1f} ms  "
+                  f"p95={s['p95_ms']:7.1f} ms  max={s['max_ms']:7.1f} ms")
+    for name, value in sorted({**data["counters"], **data["gauges"]}.items()):
+        print(f"{name:>32}: {value}")
+
+
+def configure(metrics=None, profile=None):
+    """
+    Enables instrumentation and its exporters.
+
+    Args:
+        metrics (str): Comma-separated exporters: 'memory', 'prometheus[:PORT]', 'jsonl[:PATH]'.
+        profile (str): 'cprofile:FRAMES[@SKIP]' or 'torch:FRAMES[@SKIP]' to profile a window of frames.
+    """
+    global enabled, _trace, _profile, _server
+    for exporter in filter(None, (metrics or "").split(",")):
+        kind, _, arg = exporter.strip().partition(":")
+        if kind == "prometheus" and _server is None:
+            _server = serve_prometheus(int(arg or 9464))
+        elif kind == "jsonl" and _trace is None:
+            _trace = TraceWriter(arg or "trace.jsonl")
+        elif kind not in ("memory", "prometheus", "jsonl"):
+            raise ValueError(f"Unknown metrics exporter '{exporter}'. Use memory, prometheus[:PORT] or jsonl[:PATH].")
+    if profile:
+        kind, _, window = profile.partition(":")
+        frames, _, skip = window.partition("@")
+        _profile = ProfileWindow(kind, frames=int(frames or 50), skip=int(skip or 30))
+    enabled = bool(metrics) or enabled
+    atexit.register(shutdown)  # Registering twice is harmless; shutdown() only closes once
+
+
+def shutdown():
+    """Closes the trace file, appending a final snapshot of all metrics."""
+    global _trace
+    if _trace is not None:
+        _trace.write({"ts": time.time(), "snapshot": registry.snapshot()})
+        _trace.close()
+        _trace = None
+
+
+if os.environ.get("VLM_METRICS") or os.environ.get("VLM_PROFILE"):
+    configure(os.environ.get("VLM_METRICS"), os.environ.get("VLM_PROFILE"))
@@ -0,0 +1,20 @@
+import json
+import os
+
+
+def load_done_hashes(output_path):
+    """
+    Returns the content hashes already present in a resumable JSONL output file.
+
+    Bulk jobs (`blip_bulk_caption`, `batch_transcribe`) write one record with a
+    "sha1" field per input and skip inputs whose hash is already there.
+    """
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["sha1"])
+                except (ValueError, KeyError):
+                    pass  # Ignore a truncated last line from an interrupted run
+    return done
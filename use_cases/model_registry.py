@@ -0,0 +1,487 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+# Precision modes selectable with VLM_PRECISION
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+class LoadedModel:
+    """A resident model with its load statistics."""
+
+    def __init__(self, key, model, load_seconds, warmup_seconds, memory_bytes):
+        self.key = key
+        self.model = model
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.memory_bytes = memory_bytes
+        self.users = 0  # Outstanding `acquire`s; the model is not evicted while this is above 0
+
+
+def estimate_memory(model):
+    """
+    Estimates the memory held by a model from the tensors in its state dict.
+
+    The state dict also covers the packed weights of quantized layers, which
+    `parameters()` does not list.
+
+    Args:
+        model: A torch module, or a tuple such as (model, processor).
+
+    Returns:
+        int: Size in bytes.
+    """
+    parts = model if isinstance(model, tuple) else (model,)
+    total = 0
+    for part in parts:
+        if not callable(getattr(part, "state_dict", None)):
+            continue
+        for value in part.state_dict().values():
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if hasattr(tensor, "element_size"):
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Loads models lazily and keeps one resident instance per (name, device, dtype).
+
+    `dtype` is one of PRECISIONS: 'fp32', 'bf16' (bfloat16 weights) or 'int8'
+    (dynamically quantized Linear layers; YOLO runs a dynamically quantized
+    ONNX export instead and has no bf16 mode).
+
+    Models are registered with a loader (and optionally a warm-up function) but
+    only loaded the first time `get` asks for them. Concurrent requests for the
+    same model wait for a single load. Families of models such as
+    'whisper-<size>' can be registered with `register_family` and are added on
+    first use.
+
+    When a memory budget is set, the least recently used models are evicted
+    before a load, to make room for the model's size from a previous load or
+    its registered estimate. Models checked out with `acquire` (or `lease`)
+    are never evicted until released. A model returned by plain `get` may be
+    evicted while the caller still holds it; its memory is then only freed
+    once the caller drops it, so code that keeps a model across calls or
+    threads should acquire it.
+
+    Args:
+        memory_budget_mb (float): Maximum estimated model memory; None means unlimited.
+        default_dtype (str): Precision used when `get` is called without one.
+    """
+
+    def __init__(self, memory_budget_mb=None, default_dtype="fp32"):
+        if default_dtype not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{default_dtype}'. Choose one of {PRECISIONS}.")
+        self.memory_budget = memory_budget_mb * 1024 ** 2 if memory_budget_mb else None
+        self.default_dtype = default_dtype
+        self._loaders = {}
+        self._loaded = OrderedDict()  # key -> LoadedModel, least recently used first
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._fingerprints = {}
+        self._size_estimates = {}  # name -> estimated bytes before the first load
+        self._last_sizes = {}  # key -> bytes measured when it was last loaded
+        self._families = {}  # prefix -> factory registering models named prefix + suffix
+
+    def register(self, name, loader, warmup=None, fingerprint=None, size_mb=None):
+        """
+        Registers a model.
+
+        Args:
+            name (str): Model name used with `get`.
+            loader (callable): `loader(device, dtype)` returning the model (or a tuple such as (model, processor)).
+            warmup (callable): Optional `warmup(model)` running one inference on dummy input.
+            fingerprint (callable): Optional `fingerprint()` returning a string that changes whenever
+                the weights the loader would use change; see `fingerprint`.
+            size_mb (float): Approximate fp32 size, used to make room before the first load.
+        """
+        with self._lock:
+            self._loaders[name] = (loader, warmup)
+            self._fingerprints[name] = fingerprint
+            if size_mb:
+                self._size_estimates[name] = size_mb * 1024 ** 2
+
+    def register_family(self, prefix, factory):
+        """
+        Registers models named `prefix` + suffix on first use, e.g. 'whisper-' for 'whisper-large-v3'.
+
+        Args:
+            prefix (str): Name prefix.
+            factory (callable): `factory(suffix)` calling `register` for the full name; raises KeyError
+                for an unknown suffix.
+        """
+        self._families[prefix] = factory
+
+    def _resolve(self, name):
+        """
+        Registers `name` through its family if needed; raises KeyError for unknown models.
+
+        Called without `_lock` held: factories may import frameworks, which must not stall
+        `get` for models that are already resident.
+        """
+        if name in self._loaders:
+            return
+        for prefix, factory in self._families.items():
+            if name.startswith(prefix):
+                factory(name[len(prefix):])
+                return
+        raise KeyError(f"Unknown model '{name}'. Registered: {sorted(self._loaders)}")
+
+    def get(self, name, device="auto", dtype=None, warmup=True):
+        """
+        Returns the resident model, loading (and warming it up) on first use.
+
+        Args:
+            name (str): Registered model name.
+            device (str): Torch device, e.g. 'cpu' or 'cuda'; 'auto' keeps each framework's default.
+            dtype (str): Precision the model is loaded in; defaults to `default_dtype`.
+            warmup (bool): Run the warm-up inference after loading.
+        """
+        return self._get(name, device, dtype, warmup, pin=False)
+
+    def acquire(self, name, device="auto", dtype=None, warmup=True):
+        """Like `get`, but keeps the model resident until a matching `release`."""
+        return self._get(name, device, dtype, warmup, pin=True)
+
+    def release(self, name, device="auto", dtype=None):
+        """Ends one `acquire` of a model, making it evictable again once no other acquire is outstanding."""
+        with self._lock:
+            entry = self._loaded.get((name, device, dtype or self.default_dtype))
+            if entry is not None and entry.users > 0:
+                entry.users -= 1
+
+    @contextmanager
+    def lease(self, name, device="auto", dtype=None, warmup=True):
+        """Context manager around `acquire`/`release`: `with registry.lease("yolo") as model: ...`."""
+        model = self.acquire(name, device, dtype, warmup)
+        try:
+            yield model
+        finally:
+            self.release(name, device, dtype)
+
+    def _checkout(self, key, pin):
+        """Returns the resident model for `key` (marking it used) or None; call with `_lock` held."""
+        entry = self._loaded.get(key)
+        if entry is None:
+            return None
+        self._loaded.move_to_end(key)
+        if pin:
+            entry.users += 1
+        return entry.model
+
+    def _get(self, name, device, dtype, warmup, pin):
+        key = (name, device, dtype or self.default_dtype)
+        with self._lock:
+            model = self._checkout(key, pin)
+            if model is not None:
+                return model
+        self._resolve(name)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                model = self._checkout(key, pin)  # Loaded by another thread while we waited
+                if model is not None:
+                    return model
+
+            with self._lock:
+                self._make_room(self._last_sizes.get(key, self._size_estimates.get(name, 0)))
+
+            loader, warmup_fn = self._loaders[name]
+            print(f"Loading model {name} ({device}, {key[2]})...")
+            start = time.perf_counter()
+            model = loader(device, key[2])
+            load_seconds = time.perf_counter() - start
+
+            warmup_seconds = 0.0
+            if warmup and warmup_fn is not None:
+                start = time.perf_counter()
+                warmup_fn(model)
+                warmup_seconds = time.perf_counter() - start
+
+            entry = LoadedModel(key, model, load_seconds, warmup_seconds, estimate_memory(model))
+            with self._lock:
+                self._last_sizes[key] = entry.memory_bytes
+                self._make_room(entry.memory_bytes)  # The estimate may have been low
+                self._loaded[key] = entry
+                if pin:
+                    entry.users += 1
+            print(f"Loaded {name} in {load_seconds:.2f} s (warm-up {warmup_seconds:.2f} s, "
+                  f"{entry.memory_bytes / 1024 ** 2:.0f} MB)")
+            return model
+
+    def _make_room(self, needed):
+        """Evicts least recently used models not acquired by anyone until `needed` more bytes fit the budget."""
+        if self.memory_budget is None:
+            return
+        used = sum(entry.memory_bytes for entry in self._loaded.values())
+        for key in list(self._loaded):
+            if used + needed <= self.memory_budget:
+                return
+            entry = self._loaded[key]
+            if entry.users:
+                continue
+            del self._loaded[key]
+            used -= entry.memory_bytes
+            print(f"Evicting model {key[0]} ({entry.memory_bytes / 1024 ** 2:.0f} MB) to stay within the memory budget")
+        if used + needed > self.memory_budget:
+            print(f"Models in use need {(used + needed) / 1024 ** 2:.0f} MB, "
+                  f"over the {self.memory_budget / 1024 ** 2:.0f} MB budget")
+
+    def fingerprint(self, name, dtype=None):
+        """
+        Identifies the weights and precision `get` would load, without loading them.
+
+        Used to invalidate cached results when a model's weights change.
+
+        Returns:
+            str: e.g. 'yolo|yolov8l.pt:87769683:1700000000000000000|fp32'.
+        """
+        fingerprint = self._fingerprints.get(name)
+        return f"{name}|{fingerprint() if fingerprint else ''}|{dtype or self.default_dtype}"
+
+    def evict(self, name, device="auto", dtype=None):
+        """Drops a resident model; its memory is reclaimed once callers holding it let go."""
+        with self._lock:
+            self._loaded.pop((name, device, dtype or self.default_dtype), None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Load time, warm-up time and estimated memory per resident model.
+        """
+        with self._lock:
+            return {"/".join(key): {"load_seconds": entry.load_seconds,
+                                    "warmup_seconds": entry.warmup_seconds,
+                                    "memory_mb": entry.memory_bytes / 1024 ** 2}
+                    for key, entry in self._loaded.items()}
+
+    def report(self):
+        """Prints the resident models with their load time and memory."""
+        for name, s in self.stats().items():
+            print(f"{name:>28}: load {s['load_seconds']:6.2f} s  warm-up {s['warmup_seconds']:5.2f} s  "
+                  f"{s['memory_mb']:7.0f} MB")
+
+
+def apply_precision(model, dtype):
+    """
+    Converts a torch model to the requested precision.
+
+    Args:
+        model (torch.nn.Module): Model in fp32.
+        dtype (str): 'fp32', 'bf16' or 'int8' (dynamic quantization of Linear layers, CPU only).
+
+    Returns:
+        torch.nn.Module: Converted model.
+    """
+    import torch
+    if dtype == "bf16":
+        return model.to(torch.bfloat16)
+    if dtype == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def prepare_inputs(inputs, model):
+    """
+    Moves processor outputs to the model's device and casts floating-point tensors to its dtype.
+
+    Args:
+        inputs (dict): Processor output, e.g. a BatchFeature.
+        model (transformers.PreTrainedModel): Target model.
+
+    Returns:
+        dict: Inputs ready for `model(**inputs)`.
+    """
+    import torch
+    prepared = {}
+    for name, value in inputs.items():
+        if isinstance(value, torch.Tensor):
+            value = value.to(model.device, model.dtype) if value.is_floating_point() else value.to(model.device)
+        prepared[name] = value
+    return prepared
+
+
+# Loaders import their frameworks lazily, so importing the registry stays cheap
+def _load_yolo(device, dtype):
+    from ultralytics import YOLO
+    weights = os.environ.get("VLM_YOLO_WEIGHTS", "yolov8l.pt")  # 'n', 's', 'm', 'l' (smallest to largest)
+    model = YOLO(weights)
+    if dtype == "int8" and not weights.endswith(".onnx"):
+        # int8 mode: run a weight-quantized ONNX export through ONNX Runtime where available
+        try:
+            return YOLO(_export_yolo_int8(model, weights), task="detect")
+        except Exception as e:
+            print(f"int8 ONNX export of {weights} not available, keeping fp32 PyTorch weights: {e}")
+    elif dtype == "bf16":
+        print("YOLO has no bf16 mode; keeping fp32 PyTorch weights.")
+    if device != "auto":
+        model.to(device)
+    return model
+
+
+def _export_yolo_int8(model, weights):
+    """
+    Exports YOLO to ONNX and quantizes its weights to int8 with ONNX Runtime.
+
+    The graph is exported with dynamic batch and input size, so batched
+    inference (several cameras, the inference server) and smaller `imgsz`
+    (ROI crops) work as with the PyTorch model. The export is redone whenever
+    the source weights change; their fingerprint is kept in a '.source' file
+    next to the export.
+
+    Returns:
+        str: Path of the quantized ONNX model.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = os.path.splitext(weights)[0] + ".int8.onnx"
+    stamp_path = int8_path + ".source"
+    source = _file_fingerprint(weights)
+    try:
+        with open(stamp_path) as f:
+            if f.read() == source and os.path.exists(int8_path):
+                return int8_path
+    except OSError:
+        pass  # Not exported yet
+
+    print(f"Exporting {weights} to {int8_path}...")
+    onnx_path = model.export(format="onnx", dynamic=True)
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    with open(stamp_path, "w") as f:
+        f.write(source)
+    return int8_path
+
+
+def _file_fingerprint(path):
+    """Path, size and modification time of a weights file; just the path if it is not downloaded yet."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _yolo_fingerprint():
+    return _file_fingerprint(os.environ.get("VLM_YOLO_WEIGHTS", "yolov8l.pt"))
+
+
+def _hf_fingerprint(checkpoint):
+    """Returns a function giving the checkpoint name plus the cached Hub revision (commit hash), if any."""
+    def fingerprint():
+        hub = os.environ.get("HF_HUB_CACHE") or os.path.join(
+            os.environ.get("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")), "hub")
+        ref = os.path.join(hub, "models--" + checkpoint.replace("/", "--"), "refs", "main")
+        try:
+            with open(ref) as f:
+                return f"{checkpoint}@{f.read().strip()}"
+        except OSError:
+            return checkpoint
+    return fingerprint
+
+
+def _warmup_yolo(model):
+    model(np.zeros((480, 640, 3), dtype=np.uint8), verbose=False)
+
+
+def _load_hf(model_class, processor_class, checkpoint):
+    def load(device, dtype):
+        import transformers
+        processor = getattr(transformers, processor_class).from_pretrained(checkpoint)
+        model = getattr(transformers, model_class).from_pretrained(checkpoint).eval()
+        if device != "auto":
+            model.to(device)
+        return apply_precision(model, dtype), processor
+    return load
+
+
+def _dummy_image():
+    from PIL import Image
+    return Image.new("RGB", (384, 384))
+
+
+def _warmup_blip(model_and_processor):
+    import torch
+    model, processor = model_and_processor
+    inputs = prepare_inputs(processor(images=_dummy_image(), return_tensors="pt"), model)
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=2)
+
+
+def _warmup_detr(model_and_processor):
+    import torch
+    model, processor = model_and_processor
+    inputs = prepare_inputs(processor(images=_dummy_image(), return_tensors="pt"), model)
+    with torch.no_grad():
+        model(**inputs)
+
+
+def _warmup_vilt(model_and_processor):
+    import torch
+    model, processor = model_and_processor
+    inputs = prepare_inputs(processor(_dummy_image(), "What is this?", return_tensors="pt"), model)
+    with torch.no_grad():
+        model(**inputs)
+
+
+def _load_whisper(size):
+    def load(device, dtype):
+        import torch
+        import whisper
+        model = whisper.load_model(size, device=None if device == "auto" else device)
+        if dtype == "int8":
+            # Whisper's Linear subclass only adds dtype casting; turn it back into nn.Linear so it can be quantized
+            for module in model.modules():
+                if isinstance(module, whisper.model.Linear):
+                    module.__class__ = torch.nn.Linear
+            return apply_precision(model, dtype)
+        if dtype == "bf16":
+            print("Whisper's decoding pipeline expects fp32/fp16 weights; keeping fp32.")
+        return model
+    return load
+
+
+def _register_whisper(size):
+    """Registers 'whisper-<size>' for any size the installed whisper package offers (e.g. 'large-v3', 'turbo')."""
+    import whisper
+    if size not in whisper.available_models():
+        raise KeyError(f"Unknown Whisper model '{size}'. Available: {whisper.available_models()}")
+    registry.register(f"whisper-{size}", _load_whisper(size), _warmup_whisper)
+
+
+def _warmup_whisper(model):
+    model.transcribe(np.zeros(16000, dtype=np.float32), language="en", fp16=model.device.type == "cuda")
+
+
+def _load_vosk(device, dtype):
+    import vosk
+    return vosk.Model(os.environ.get("VLM_VOSK_MODEL", "vosk-model-en-us-0.22"))
+
+
+registry = ModelRegistry(memory_budget_mb=float(os.environ.get("VLM_MODEL_MEMORY_MB", 0)) or None,
+                         default_dtype=os.environ.get("VLM_PRECISION", "fp32"))
+registry.register("yolo", _load_yolo, _warmup_yolo, _yolo_fingerprint, size_mb=170)
+registry.register("blip", _load_hf("BlipForConditionalGeneration", "BlipProcessor",
+                                   "Salesforce/blip-image-captioning-base"), _warmup_blip,
+                  _hf_fingerprint("Salesforce/blip-image-captioning-base"), size_mb=950)
+registry.register("detr", _load_hf("DetrForObjectDetection", "DetrImageProcessor", "facebook/detr-resnet-50"),
+                  _warmup_detr, _hf_fingerprint("facebook/detr-resnet-50"), size_mb=170)
+registry.register("vilt", _load_hf("ViltForQuestionAnswering", "ViltProcessor", "dandelin/vilt-b32-finetuned-vqa"),
+                  _warmup_vilt, _hf_fingerprint("dandelin/vilt-b32-finetuned-vqa"), size_mb=470)
+registry.register_family("whisper-", _register_whisper)
+registry.register("vosk", _load_vosk)
+
+
+def get_model(name, **kwargs):
+    """Shortcut for `registry.get`; see ModelRegistry.get."""
+    return registry.get(name, **kwargs)
+
+
+def use_model(name, **kwargs):
+    """Shortcut for `registry.lease`: `with use_model("yolo") as model: ...` keeps the model resident meanwhile."""
+    return registry.lease(name, **kwargs)
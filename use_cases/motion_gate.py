@@ -0,0 +1,157 @@
+import time
+
+import cv2
+import numpy as np
+
+import instrumentation
+
+# Default change threshold per method. One flipped dHash bit is already 1/64 ~ 0.016,
+# so 'hash' needs a coarser threshold than the pixel fraction used by 'diff'.
+DEFAULT_THRESHOLDS = {"diff": 0.01, "hash": 0.1}
+
+
+def thumbnail(image, size=(64, 48)):
+    """
+    Shrinks a BGR frame to a small grayscale thumbnail for change detection.
+
+    INTER_AREA averages over each block, which also suppresses sensor noise.
+
+    Args:
+        image (numpy.ndarray): BGR frame.
+        size (tuple): Thumbnail (width, height).
+
+    Returns:
+        numpy.ndarray: uint8 grayscale thumbnail.
+    """
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+
+def difference_hash(image, hash_size=8):
+    """
+    Computes a 64-bit difference hash (dHash) of a frame.
+
+    Each bit says whether a pixel of a (hash_size+1) x hash_size grayscale
+    thumbnail is brighter than its right neighbour, so the hash survives
+    noise, exposure drift and recompression but flips when objects move.
+
+    Returns:
+        numpy.ndarray: Boolean array of hash_size * hash_size bits.
+    """
+    small = thumbnail(image, (hash_size + 1, hash_size))
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+class MotionGate:
+    """
+    Skips inference on frames that look like the last inferred one and reuses its result.
+
+    Each frame is reduced to a thumbnail (method 'diff') or a perceptual hash
+    (method 'hash') and compared with the frame the model last ran on; the
+    reference is not updated on skipped frames, so slow drift still adds up
+    to a fresh inference. A fresh inference is also forced once the result is
+    `max_staleness` seconds old.
+
+    Args:
+        infer (callable): `infer(image)` -> result; called only for changed frames.
+        threshold (float): Change score above which the model runs again. For 'diff' it is the
+            fraction of thumbnail pixels whose brightness changed by more than `pixel_threshold`;
+            for 'hash' the fraction of differing hash bits. 0 runs the model on every frame;
+            None uses the method's default from DEFAULT_THRESHOLDS.
+        max_staleness (float): Seconds after which a result is refreshed even if nothing moved.
+        method (str): 'diff' (downscaled frame differencing) or 'hash' (dHash).
+        pixel_threshold (int): Brightness change (0-255) that counts a thumbnail pixel as changed.
+        size (tuple): Thumbnail (width, height) for 'diff'.
+    """
+
+    def __init__(self, infer, threshold=None, max_staleness=2.0, method="diff", pixel_threshold=20, size=(64, 48)):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown motion gate method '{method}'. Use diff or hash.")
+        self.infer = infer
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.max_staleness = max_staleness
+        self.method = method
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.counts = {"inferred": 0, "skipped": 0, "stale": 0}
+        self.last_score = None
+        self._reference = None
+        self._result = None
+        self._inferred_at = 0.0
+        # Wall time spent in `infer`, and process CPU time meanwhile (all threads: inference
+        # frameworks run their own worker threads, but capture and display threads count too)
+        self._infer_seconds = 0.0
+        self._infer_cpu = 0.0
+        self._gate_seconds = 0.0
+
+    def _signature(self, image):
+        if self.method == "hash":
+            return difference_hash(image)
+        return thumbnail(image, self.size)
+
+    def _change(self, signature):
+        if self.method == "hash":
+            return np.count_nonzero(signature != self._reference) / signature.size
+        changed = cv2.absdiff(signature, self._reference) > self.pixel_threshold
+        return np.count_nonzero(changed) / changed.size
+
+    def update(self, image):
+        """
+        Returns the result for `image`, running `infer` only if the scene changed or the result is stale.
+        """
+        start = time.perf_counter()
+        signature = self._signature(image) if self.threshold > 0 else None
+        if self._reference is not None and signature is not None:
+            self.last_score = self._change(signature)
+            if self.last_score <= self.threshold:
+                if start - self._inferred_at < self.max_staleness:
+                    self.counts["skipped"] += 1
+                    instrumentation.count("motion_gate", result="skipped")
+                    self._gate_seconds += time.perf_counter() - start
+                    return self._result
+                self.counts["stale"] += 1
+                instrumentation.count("motion_gate", result="stale")
+        gated = time.perf_counter()
+        self._gate_seconds += gated - start
+
+        cpu_start = time.process_time()
+        self._result = self.infer(image)
+        self._infer_cpu += time.process_time() - cpu_start
+        self._inferred_at = time.perf_counter()
+        self._infer_seconds += self._inferred_at - gated
+        self._reference = signature
+        self.counts["inferred"] += 1
+        instrumentation.count("motion_gate", result="inferred")
+        return self._result
+
+    __call__ = update
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames answered from the previous result."""
+        total = self.counts["inferred"] + self.counts["skipped"]
+        return self.counts["skipped"] / total if total else 0.0
+
+    def savings(self):
+        """
+        Estimates the work avoided by skipping, from the mean cost of the inferences that did run.
+
+        Returns:
+            dict: Skip ratio, inference wall seconds saved, process CPU seconds saved (an upper bound,
+                as it includes other threads running during inference) and the gate's own overhead.
+        """
+        inferred = max(1, self.counts["inferred"])
+        return {
+            "skip_ratio": self.skip_ratio,
+            "saved_seconds": self.counts["skipped"] * self._infer_seconds / inferred,
+            "saved_process_cpu_seconds": self.counts["skipped"] * self._infer_cpu / inferred,
+            "gate_seconds": self._gate_seconds,
+        }
+
+    def report(self):
+        """Prints how many frames were skipped and the estimated inference time and process CPU saved."""
+        s = self.savings()
+        print(f"Motion gate: {self.counts['skipped']} of {self.counts['inferred'] + self.counts['skipped']} frames "
+              f"skipped ({100 * s['skip_ratio']:.0f}%), {self.counts['stale']} refreshed as stale; saved ~"
+              f"{s['saved_seconds']:.1f} s inference (up to {s['saved_process_cpu_seconds']:.1f} s process CPU) "
+              f"for {1000 * s['gate_seconds']:.0f} ms of gating")
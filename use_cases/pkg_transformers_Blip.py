@@ -1,36 +1,146 @@
+import copy
+import time
 from PIL import Image
 import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
 
-# Load BLIP model and processor for image captioning
-model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
+from model_registry import get_model, prepare_inputs
+from result_cache import cached
 
-def generate_caption(image):
+# Latency/quality trade-offs for caption generation
+GENERATION_PRESETS = {
+    "fast": dict(num_beams=1, do_sample=False, max_new_tokens=20),  # Greedy, same as model.generate defaults
+    "balanced": dict(num_beams=3, max_new_tokens=30, early_stopping=True),
+    "quality": dict(num_beams=5, max_new_tokens=40, early_stopping=True, repetition_penalty=1.2),
+    "creative": dict(do_sample=True, top_p=0.9, temperature=0.8, max_new_tokens=30),
+}
+
+class CaptionSession:
+    """
+    Encodes an image once and runs several caption generations against it.
+
+    The vision encoder output is cached, and for greedy or sampled decoding the
+    text decoder's past key/values for a prompt prefix (e.g. "a photo of") are
+    computed once and reused by every later generation with that prompt.
+
+    Args:
+        image (PIL.Image): Input image.
+    """
+
+    def __init__(self, image):
+        model, processor = get_model("blip")  # BLIP captioning model, loaded on first use
+        inputs = prepare_inputs(processor(images=image, return_tensors="pt"), model)  # Preprocess image
+        with torch.no_grad():
+            self.image_embeds = model.vision_model(pixel_values=inputs["pixel_values"])[0]
+        self.image_attention_mask = torch.ones(self.image_embeds.shape[:-1], dtype=torch.long)
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self._prefixes = {}  # prompt -> (input_ids, past_key_values or None)
+        self._reuse_prefix = True
+
+    def _prompt_ids(self, prompt):
+        """Decoder input IDs for a prompt, laid out like BlipForConditionalGeneration.generate does."""
+        model, processor = get_model("blip")
+        if not prompt:
+            return torch.tensor([[model.config.text_config.bos_token_id]])
+        input_ids = processor(text=prompt, return_tensors="pt")["input_ids"]
+        input_ids[:, 0] = model.config.text_config.bos_token_id
+        return input_ids[:, :-1]  # Drop the trailing [SEP] so generation continues the prompt
+
+    def _prefix(self, prompt):
+        if prompt not in self._prefixes:
+            model, _ = get_model("blip")
+            input_ids = self._prompt_ids(prompt)
+            past_key_values = None
+            if input_ids.shape[1] > 1:
+                with torch.no_grad():
+                    past_key_values = model.text_decoder(input_ids=input_ids[:, :-1],
+                                                         encoder_hidden_states=self.image_embeds,
+                                                         encoder_attention_mask=self.image_attention_mask,
+                                                         use_cache=True).past_key_values
+            self._prefixes[prompt] = (input_ids, past_key_values)
+        return self._prefixes[prompt]
+
+    def caption(self, prompt=None, preset="fast", **generation_kwargs):
+        """
+        Generates a caption from the cached image features.
+
+        Args:
+            prompt (str): Optional text the caption should continue (conditional captioning).
+            preset (str): One of GENERATION_PRESETS.
+            **generation_kwargs: Overrides for the preset (e.g. max_new_tokens=10).
+
+        Returns:
+            str: Generated caption text.
+        """
+        model, processor = get_model("blip")
+        settings = {**GENERATION_PRESETS[preset], **generation_kwargs}
+        input_ids, past_key_values = self._prefix(prompt)
+        expansion = settings.get("num_beams", 1) * settings.get("num_return_sequences", 1)
+
+        kwargs = dict(encoder_hidden_states=self.image_embeds,
+                      encoder_attention_mask=self.image_attention_mask,
+                      eos_token_id=model.config.text_config.sep_token_id,
+                      pad_token_id=model.config.text_config.pad_token_id,
+                      **settings)
+
+        start = time.perf_counter()
+        caption_ids = None
+        if past_key_values is not None and expansion == 1 and self._reuse_prefix:
+            try:
+                with torch.no_grad():
+                    caption_ids = model.text_decoder.generate(input_ids=input_ids,
+                                                              past_key_values=copy.deepcopy(past_key_values),
+                                                              **kwargs)
+            except Exception as e:
+                print(f"Prefix cache not supported by this transformers version, disabling it: {e}")
+                self._reuse_prefix = False
+        if caption_ids is None:
+            with torch.no_grad():
+                caption_ids = model.text_decoder.generate(input_ids=input_ids, **kwargs)
+
+        self.generation_seconds += time.perf_counter() - start
+        self.generated_tokens += caption_ids.shape[0] * (caption_ids.shape[1] - input_ids.shape[1])
+        return processor.batch_decode(caption_ids, skip_special_tokens=True)[0].strip()
+
+    @property
+    def tokens_per_second(self):
+        return self.generated_tokens / self.generation_seconds if self.generation_seconds else 0.0
+
+def generate_caption(image, prompt=None, preset="fast"):
     """
     Generates a caption for the given image using BLIP.
+
+    Deterministic presets are served from the result cache when the same
+    image was captioned with the same prompt and settings before; sampled
+    ('creative') captions are always generated fresh.
     
     Args:
         image (PIL.Image): Input image.
+        prompt (str): Optional text the caption should start with, e.g. "a photo of".
+        preset (str): Generation preset, see GENERATION_PRESETS.
     
     Returns:
         str: Generated caption text.
     """
-    inputs = processor(images=image, return_tensors="pt")  # Preprocess image
-    with torch.no_grad():  # Disable gradient computation for inference
-        caption_ids = model.generate(**inputs)  # Generate caption
-
-    return processor.batch_decode(caption_ids, skip_special_tokens=True)[0]  # Decode output
+    compute = lambda: CaptionSession(image).caption(prompt=prompt, preset=preset)
+    settings = GENERATION_PRESETS[preset]
+    if settings.get("do_sample"):
+        return compute()
+    return cached("blip", image, compute, prompt=prompt, settings=settings)
 
 def main():
     """
-    Loads an image and generates a caption.
+    Loads an image and generates several captions from one image encoding.
     """
     image_path = "city.jpeg"  # Update with your image path
-    image = Image.open(image_path)
+    image = Image.open(image_path).convert("RGB")
     
-    caption = generate_caption(image)
-    print("Caption:", caption)
+    session = CaptionSession(image)  # The vision encoder runs only here
+    print("Caption:", session.caption())
+    print("Caption (quality):", session.caption(preset="quality"))
+    for _ in range(3):
+        print("Caption (a photo of):", session.caption(prompt="a photo of", preset="creative"))
+    print(f"Decoding speed: {session.tokens_per_second:.1f} tokens/s")
 
 if __name__ == "__main__":
     main()
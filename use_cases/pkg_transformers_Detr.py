@@ -1,12 +1,83 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import argparse
+
+import numpy as np
 from PIL import Image
 import torch
-from transformers import DetrImageProcessor, DetrForObjectDetection
 
-# Load DETR model and processor for object detection
-model = DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
-processor = DetrImageProcessor.from_pretrained("facebook/detr-resnet-50")
+import instrumentation
+from detections import Detections
+from model_registry import prepare_inputs, use_model
+from result_cache import get_result_cache, image_hash
+from sinks import SINK_HELP, open_sink
+
+def postprocess_batch(logits, pred_boxes, image_sizes, threshold=0.9):
+    """
+    Thresholds and rescales DETR outputs for a whole batch with tensor ops.
+
+    Equivalent to `DetrImageProcessor.post_process_object_detection`, but
+    without a Python loop per image and with a single device-to-host copy.
+
+    Args:
+        logits (torch.Tensor): (B, Q, C + 1) class logits; the last class is "no object".
+        pred_boxes (torch.Tensor): (B, Q, 4) normalized cx, cy, w, h boxes.
+        image_sizes (torch.Tensor): (B, 2) original (width, height) per image.
+        threshold (float): Confidence threshold.
+
+    Returns:
+        tuple: numpy arrays (boxes (N, 4) x1, y1, x2, y2 in pixels, class_ids (N,), scores (N,),
+            image_index (N,)) for all kept detections of the batch.
+    """
+    scores, class_ids = logits.float().softmax(-1)[..., :-1].max(-1)
+    cx, cy, w, h = pred_boxes.float().unbind(-1)
+    boxes = torch.stack([cx - 0.5 * w, cy - 0.5 * h, cx + 0.5 * w, cy + 0.5 * h], dim=-1)
+    boxes = boxes * image_sizes.to(boxes.device, boxes.dtype).repeat(1, 2)[:, None, :]
+
+    image_index, query_index = torch.nonzero(scores > threshold, as_tuple=True)
+    kept = torch.cat([boxes[image_index, query_index], class_ids[image_index, query_index, None].float(),
+                      scores[image_index, query_index, None], image_index[:, None].float()], dim=1).cpu().numpy()
+    return kept[:, :4], kept[:, 4].astype(np.int64), kept[:, 5], kept[:, 6].astype(np.int64)
+
+def _run_detr(images, threshold):
+    """Runs one padded DETR forward pass over `images`; see `detect_objects_batch`."""
+    with use_model("detr") as (model, processor):  # DETR model and processor, loaded on first use
+        inputs = prepare_inputs(processor(images=images, return_tensors="pt"), model)  # Resize, normalize and pad
+        with torch.no_grad(), instrumentation.span("detr", batch=len(images)):
+            outputs = model(**inputs)
+
+        image_sizes = torch.tensor([image.size for image in images])
+        boxes, class_ids, scores, image_index = postprocess_batch(outputs.logits, outputs.pred_boxes, image_sizes,
+                                                                  threshold)
+        splits = np.searchsorted(image_index, np.arange(1, len(images)))  # Kept detections are grouped by image
+        id2label = model.config.id2label
+        return [Detections(b, c, s, id2label)
+                for b, c, s in zip(np.split(boxes, splits), np.split(class_ids, splits), np.split(scores, splits))]
+
+def detect_objects_batch(images, threshold=0.9):
+    """
+    Detects objects in several images with one padded DETR forward pass.
+
+    Images already in the result cache (same pixels and threshold) are
+    answered from it; only the rest go through the model.
+
+    Args:
+        images (list): PIL images; they may differ in size.
+        threshold (float): Confidence threshold for filtering detections.
+
+    Returns:
+        list: One Detections (x1, y1, x2, y2 boxes, class IDs, scores) per image.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return _run_detr(images, threshold)
+
+    keys = [cache.key("detr", image_hash(image), threshold=threshold) for image in images]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i, detections in zip(missing, _run_detr([images[i] for i in missing], threshold)):
+            cache.put(keys[i], "detr", detections)
+            results[i] = detections
+    return results
 
 def detect_objects(image, threshold=0.9):
     """
@@ -17,65 +88,62 @@ def detect_objects(image, threshold=0.9):
         threshold (float): Confidence threshold for filtering detections.
     
     Returns:
-        dict: Dictionary containing detected bounding boxes, labels, and scores.
+        Detections: Detected bounding boxes (x1, y1, x2, y2), class IDs and scores.
     """
-    inputs = processor(images=image, return_tensors="pt")  # Preprocess image
-    with torch.no_grad():
-        outputs = model(**inputs)  # Run inference
-
-    # Convert target sizes from (width, height) to (height, width) format
-    target_sizes = torch.tensor([image.size[::-1]])
-    
-    # Process output detections
-    results = processor.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=threshold)[0]
-    return results
+    return detect_objects_batch([image], threshold)[0]
 
 def plot_detections(image, results):
     """
     Plots the detected objects with bounding boxes on the image.
+
+    matplotlib is only imported here, so headless detection never loads it; the
+    script itself renders through `sinks` (OpenCV).
     
     Args:
         image (PIL.Image): Original image.
-        results (dict): Object detection results containing bounding boxes, labels, and scores.
+        results (Detections): Object detection results containing bounding boxes, labels, and scores.
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
     fig, ax = plt.subplots(1, figsize=(8, 6))
     ax.imshow(image)
 
-    # Extract bounding boxes, labels, and scores
-    bboxes = results["boxes"]
-    labels = results["labels"]
-    scores = results["scores"]
-
     # Draw bounding boxes
-    for bbox, label, score in zip(bboxes, labels, scores):
-        label_name = model.config.id2label[label.item()]
-        score_value = score.item()
-        x, y, w, h = bbox.tolist()
-
+    for (x1, y1, x2, y2), label_name, score_value in zip(results.boxes.tolist(), results.labels(),
+                                                         results.scores.tolist()):
         # Draw rectangle
-        rect = patches.Rectangle((x, y), w, h, linewidth=2, edgecolor="red", facecolor="none")
+        rect = patches.Rectangle((x1, y1), x2 - x1, y2 - y1, linewidth=2, edgecolor="red", facecolor="none")
         ax.add_patch(rect)
 
         # Add label and confidence score
         label_text = f"{label_name} ({score_value:.2f})"
-        ax.text(x, y - 5, label_text, fontsize=10, color="white",
+        ax.text(x1, y1 - 5, label_text, fontsize=10, color="white",
                 bbox=dict(facecolor="red", alpha=0.5))
 
-        print(f"Detected: {label_name} | BBox: {bbox.tolist()} | Confidence: {score_value:.2f}")
-
     ax.set_xticks([])
     ax.set_yticks([])
     plt.show()
 
 def main():
     """
-    Loads an image, runs DETR object detection, and visualizes the results.
+    Loads images, runs DETR object detection on them as one batch, and visualizes the results.
     """
-    image_path = "/images/cat_dogs.jpg"  # Change to your image file
-    image = Image.open(image_path)
+    parser = argparse.ArgumentParser(description="DETR object detection.")
+    parser.add_argument("images", nargs="*", default=["/images/cat_dogs.jpg"], help="Image files")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--sink", default="window", help=SINK_HELP + "; 'none' only prints the detections")
+    args = parser.parse_args()
 
-    results = detect_objects(image, threshold=0.9)  # Run object detection
-    plot_detections(image, results)  # Display results
+    images = [Image.open(path).convert("RGB") for path in args.images]
+    detections = detect_objects_batch(images, threshold=args.threshold)
+    for i, (path, image, results) in enumerate(zip(args.images, images, detections)):
+        for (x1, y1, x2, y2), label_name, score_value in zip(results.boxes.tolist(), results.labels(),
+                                                             results.scores.tolist()):
+            print(f"{path}: {label_name} | BBox: {[x1, y1, x2, y2]} | Confidence: {score_value:.2f}")
+        sink = open_sink(args.sink, title=path, max_fps=None, index=i if len(images) > 1 else None, hold=True)
+        sink.submit(np.ascontiguousarray(np.asarray(image)[:, :, ::-1]), results)  # OpenCV draws on BGR
+        sink.close()
 
 if __name__ == "__main__":
     main()
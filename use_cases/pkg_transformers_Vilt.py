@@ -1,10 +1,109 @@
 import time
+from collections import OrderedDict
 from PIL import Image
-from transformers import ViltProcessor, ViltForQuestionAnswering
+import torch
 
-# Load ViLT processor and model for Visual Question Answering (VQA)
-processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
+import instrumentation
+from model_registry import prepare_inputs, use_model
+from result_cache import get_result_cache, image_hash
+
+class VqaSession:
+    """
+    Answers questions about images while reusing image-side work across questions.
+
+    Pixel preprocessing and the patch embedding of an image are computed once
+    and kept in a small LRU, so later questions about the same image only run
+    the text embedding and the transformer. Several questions for one image
+    can be answered in a single batched forward pass. Answers are also kept
+    in the persistent result cache, keyed by image content and question.
+
+    Args:
+        max_images (int): Number of recently used images whose embeddings are kept.
+    """
+
+    def __init__(self, max_images=8):
+        self.max_images = max_images
+        self._images = OrderedDict()  # image key -> (image_embeds, image_masks)
+
+    @staticmethod
+    def image_key(image):
+        """Content hash of a PIL image, used as cache key (the same hash as the result cache)."""
+        return image_hash(image)
+
+    def embed_image(self, image, key=None):
+        """
+        Returns the cached patch embeddings of `image`, computing them on first use.
+
+        Args:
+            image (PIL.Image): Input image.
+            key (str): Optional cache key; defaults to a hash of the pixel data.
+
+        Returns:
+            tuple: (image_embeds, image_masks) tensors for a batch of one.
+        """
+        key = key or self.image_key(image)
+        if key in self._images:
+            self._images.move_to_end(key)
+            instrumentation.count("vqa_image_cache", result="hit")
+            return self._images[key]
+        instrumentation.count("vqa_image_cache", result="miss")
+
+        with use_model("vilt") as (model, processor):  # ViLT VQA model and processor, loaded on first use
+            pixels = prepare_inputs(processor.image_processor(image, return_tensors="pt"), model)
+            with torch.no_grad(), instrumentation.span("vilt_embed_image"):
+                image_embeds, image_masks, _ = model.vilt.embeddings.visual_embed(
+                    pixels["pixel_values"], pixels["pixel_mask"], max_image_length=model.config.max_image_length)
+
+        self._images[key] = (image_embeds, image_masks)
+        while len(self._images) > self.max_images:
+            self._images.popitem(last=False)
+        return image_embeds, image_masks
+
+    def answer(self, image, questions, key=None):
+        """
+        Answers one or more questions about an image in a single forward pass.
+
+        Questions answered before for the same image come from the result
+        cache; if all of them do, the image is not even embedded.
+
+        Args:
+            image (PIL.Image): Input image.
+            questions (list): Questions related to the image.
+            key (str): Optional image cache key.
+
+        Returns:
+            list: Predicted answer per question.
+        """
+        cache = get_result_cache()
+        if cache is None:
+            return self._answer(image, questions, key)
+
+        key = key or self.image_key(image)
+        keys = [cache.key("vilt", key, question=question) for question in questions]
+        answers = [cache.get(result_key) for result_key in keys]
+        missing = [i for i, answer in enumerate(answers) if answer is None]
+        if missing:
+            for i, answer in zip(missing, self._answer(image, [questions[i] for i in missing], key)):
+                cache.put(keys[i], "vilt", answer)
+                answers[i] = answer
+        return answers
+
+    def _answer(self, image, questions, key):
+        with use_model("vilt") as (model, processor):
+            image_embeds, image_masks = self.embed_image(image, key)
+            encoding = processor.tokenizer(questions, padding=True, truncation=True,
+                                           max_length=model.config.max_position_embeddings, return_tensors="pt")
+            batch_size = len(questions)
+            with torch.no_grad(), instrumentation.span("vilt_answer"):
+                outputs = model(input_ids=encoding["input_ids"],
+                                attention_mask=encoding["attention_mask"],
+                                token_type_ids=encoding.get("token_type_ids"),
+                                image_embeds=image_embeds.expand(batch_size, -1, -1),
+                                pixel_mask=image_masks.expand(batch_size, -1))
+            return [model.config.id2label[idx] for idx in outputs.logits.argmax(-1).tolist()]
+
+# Shared session, so every question about the same image reuses its embedding
+session = VqaSession()
 
 def answer_question(image, question):
     """
@@ -17,11 +116,7 @@ def answer_question(image, question):
     Returns:
         str: Predicted answer.
     """
-    encoding = processor(image, question, return_tensors="pt")
-    outputs = model(**encoding)
-    logits = outputs.logits
-    idx = logits.argmax(-1).item()
-    return model.config.id2label[idx]
+    return session.answer(image, [question])[0]
 
 def type_out(text, delay=0.1):
     """
@@ -41,7 +136,8 @@ def main():
     Loads an image, asks predefined questions, and allows users to input their own.
     """
     image_path = "/images/cat_dogs.jpg"  # Update with the correct image path
-    image = Image.open(image_path)
+    image = Image.open(image_path).convert("RGB")
+    image_key = session.image_key(image)  # Hash the pixels once for the whole session
 
     # Predefined questions
     questions = [
@@ -58,7 +154,7 @@ def main():
     for question in questions:
         input("\nPress Enter to ask the next question...")
         type_out(question, delay=0.08)
-        answer = answer_question(image, question)
+        answer = session.answer(image, [question], key=image_key)[0]
         print(" →", answer)
 
     print("\n**** Now you can ask your own questions! Type 'exit' to quit. ****\n")
@@ -70,7 +166,7 @@ def main():
             print("Exiting program. Have a great day!")
             break
         
-        answer = answer_question(image, question)
+        answer = session.answer(image, [question], key=image_key)[0]
         print(" →", answer)
 
 if __name__ == "__main__":
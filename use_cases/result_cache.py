@@ -0,0 +1,245 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import instrumentation
+from detections import Detections
+from model_registry import registry
+
+# SQLite file of the shared cache; set VLM_RESULT_CACHE=off to disable caching
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "vlm", "results.sqlite")
+
+
+def image_hash(image):
+    """
+    Content hash of a decoded image (PIL image or numpy array).
+
+    Hashing the pixels rather than the file makes re-encoded copies of the
+    same image hit, and works for images that never came from a file.
+
+    Returns:
+        str: Hex digest.
+    """
+    if isinstance(image, np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(image).data)
+        digest.update(f"{image.dtype}{image.shape}".encode())
+    else:
+        digest = hashlib.sha1(image.tobytes())
+        digest.update(f"{image.mode}{image.size}".encode())
+    return digest.hexdigest()
+
+
+def _encode(value):
+    """
+    Serializes a result without pickle, so a tampered cache file cannot run code.
+
+    Detections are stored as one .npy array (x1, y1, x2, y2, class ID, score per
+    row) after a JSON line with the names of the classes they contain; other
+    results (captions, answers) as JSON.
+    """
+    if isinstance(value, Detections):
+        names = {str(class_id): value.names[class_id] for class_id in set(value.class_ids.tolist())}
+        rows = np.column_stack([value.boxes.astype(np.float64), value.class_ids, value.scores.astype(np.float64)])
+        buffer = io.BytesIO()
+        np.save(buffer, rows, allow_pickle=False)
+        return b"detections\n" + json.dumps(names).encode() + b"\n" + buffer.getvalue()
+    return b"json\n" + json.dumps(value).encode()
+
+
+def _decode(blob):
+    """
+    Inverse of `_encode`.
+
+    Raises:
+        ValueError: For a blob in an unknown format (e.g. written by an older version).
+    """
+    kind, _, data = bytes(blob).partition(b"\n")
+    if kind == b"json":
+        return json.loads(data)
+    if kind == b"detections":
+        names, _, array = data.partition(b"\n")
+        rows = np.load(io.BytesIO(array), allow_pickle=False)
+        names = {int(class_id): name for class_id, name in json.loads(names).items()}
+        return Detections(rows[:, :4], rows[:, 4], rows[:, 5], names)
+    raise ValueError("Unknown result format")
+
+
+class ResultCache:
+    """
+    Content-addressed store of model results, in SQLite with an in-memory LRU in front.
+
+    Entries are keyed by image content hash, model fingerprint (weights and
+    precision, see `ModelRegistry.fingerprint`) and inference parameters.
+    When a model's fingerprint changes, its old rows are deleted the next time
+    the model is used, so results from replaced weights are never served.
+
+    Args:
+        path (str): SQLite database file (created if needed).
+        memory_items (int): Entries kept in the in-memory LRU.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, memory_items=4096):
+        self.path = path
+        self.memory_items = memory_items
+        self.counts = {"memory": 0, "disk": 0, "miss": 0}
+        self._memory = OrderedDict()
+        self._checked = {}  # model -> fingerprint already validated against the database
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")  # Readers in other processes don't block writers
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, model TEXT, value BLOB, "
+                         "created REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, fingerprint TEXT)")
+        self._db.commit()
+
+    def key(self, model, image_key, **params):
+        """
+        Builds the cache key for one result.
+
+        Args:
+            model (str): Registered model name.
+            image_key (str): Content hash of the input image, see `image_hash`.
+            **params: Everything else that changes the result (threshold, question, generation settings).
+
+        Returns:
+            str: Hex digest.
+        """
+        fingerprint = registry.fingerprint(model)
+        self._validate(model, fingerprint)
+        payload = json.dumps([fingerprint, image_key, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _validate(self, model, fingerprint):
+        """Deletes the model's rows once per process if its weights changed since they were stored."""
+        if self._checked.get(model) == fingerprint:
+            return
+        with self._lock:
+            row = self._db.execute("SELECT fingerprint FROM models WHERE model = ?", (model,)).fetchone()
+            if row is None or row[0] != fingerprint:
+                if row is not None:
+                    deleted = self._db.execute("DELETE FROM results WHERE model = ?", (model,)).rowcount
+                    print(f"Weights of {model} changed; dropped {deleted} cached results.")
+                    for key in [key for key, (owner, _) in self._memory.items() if owner == model]:
+                        del self._memory[key]
+                self._db.execute("INSERT OR REPLACE INTO models (model, fingerprint) VALUES (?, ?)",
+                                 (model, fingerprint))
+                self._db.commit()
+            self._checked[model] = fingerprint
+
+    def _remember(self, key, model, value):
+        self._memory[key] = (model, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.counts["memory"] += 1
+                instrumentation.count("result_cache", result="memory")
+                return entry[1]
+            row = self._db.execute("SELECT model, value FROM results WHERE key = ?", (key,)).fetchone()
+            try:
+                value = _decode(row[1]) if row is not None else None
+            except ValueError:
+                value = None  # Unreadable entry; recomputed and overwritten by the caller's `put`
+            if value is None:
+                self.counts["miss"] += 1
+                instrumentation.count("result_cache", result="miss")
+                return None
+            self._remember(key, row[0], value)
+            self.counts["disk"] += 1
+            instrumentation.count("result_cache", result="disk")
+            return value
+
+    def put(self, key, model, value):
+        """Stores a result under `key` (see `key`) for `model`."""
+        blob = _encode(value)
+        with self._lock:
+            self._remember(key, model, value)
+            self._db.execute("INSERT OR REPLACE INTO results (key, model, value, created) VALUES (?, ?, ?, ?)",
+                             (key, model, blob, time.time()))
+            self._db.commit()
+
+    def clear(self, model=None):
+        """Deletes all cached results, or only those of `model`."""
+        with self._lock:
+            if model is None:
+                self._db.execute("DELETE FROM results")
+                self._memory.clear()
+            else:
+                self._db.execute("DELETE FROM results WHERE model = ?", (model,))
+                for key in [key for key, (owner, _) in self._memory.items() if owner == model]:
+                    del self._memory[key]
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def report(self):
+        """Prints memory hits, disk hits and misses."""
+        total = max(1, sum(self.counts.values()))
+        print("Result cache: " + ", ".join(f"{source} {count} ({100 * count / total:.0f}%)"
+                                           for source, count in self.counts.items()))
+
+
+_result_cache = None
+_result_cache_failed = False  # Opening failed once; don't retry (and re-print the error) on every call
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Returns the process-wide ResultCache at VLM_RESULT_CACHE (default DEFAULT_PATH), or None if caching is off.
+    """
+    global _result_cache, _result_cache_failed
+    path = os.environ.get("VLM_RESULT_CACHE", DEFAULT_PATH)
+    if path.lower() in ("", "0", "off", "none") or _result_cache_failed:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            try:
+                _result_cache = ResultCache(path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error opening result cache '{path}', running without it: {e}")
+                _result_cache_failed = True
+                return None
+    return _result_cache
+
+
+def cached(model, image, compute, **params):
+    """
+    Returns `compute()` for `image`, served from the result cache when possible.
+
+    Cached results are shared with later callers, so treat them as read-only.
+
+    Args:
+        model (str): Registered model name producing the result.
+        image (PIL.Image | numpy.ndarray | str): Input image, or its precomputed `image_hash`.
+        compute (callable): Runs the model; called only on a miss.
+        **params: Parameters that change the result.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return compute()
+    key = cache.key(model, image if isinstance(image, str) else image_hash(image), **params)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.put(key, model, value)
+    return value
@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+
+from detections import Detections
+
+
+def create_tracker(kind="kcf"):
+    """
+    Creates an OpenCV single-object tracker.
+
+    KCF and CSRT ship with opencv-contrib-python; depending on the OpenCV
+    version they live in `cv2` or `cv2.legacy`.
+
+    Args:
+        kind (str): 'kcf' (fast) or 'csrt' (more accurate, slower).
+
+    Returns:
+        cv2.Tracker | None: Tracker, or None if this OpenCV build has no such tracker.
+    """
+    name = {"kcf": "TrackerKCF_create", "csrt": "TrackerCSRT_create"}[kind]
+    for module in (cv2, getattr(cv2, "legacy", None)):
+        if module is not None and hasattr(module, name):
+            return getattr(module, name)()
+    return None
+
+
+class DetectThenTrack:
+    """
+    Runs the full-frame detector only every few frames and follows the target cheaply in between.
+
+    Between full detections the target box is updated by an OpenCV tracker
+    (KCF/CSRT) when available, otherwise by running the detector on a crop
+    around the last box. A full detection is forced every `detect_every`
+    frames, when the target is lost, or when the ROI detection confidence
+    drops below `min_confidence`.
+
+    Args:
+        detect (callable): `detect(image)` -> Detections of the target, best first.
+        detect_roi (callable): Detector used on crops; defaults to `detect`
+            (pass one with a smaller input size to make crops cheap).
+        detect_every (int): Frames between forced full-frame detections.
+        min_confidence (float): ROI detections below this score trigger a full detection.
+        tracker (str): 'kcf', 'csrt' or None to always use ROI detection.
+        roi_margin (float): Crop padding around the last box, relative to its size.
+    """
+
+    def __init__(self, detect, detect_roi=None, detect_every=10, min_confidence=0.4, tracker="kcf", roi_margin=0.5):
+        self.detect = detect
+        self.detect_roi = detect_roi or detect
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.tracker_kind = tracker
+        self.roi_margin = roi_margin
+        self.counts = {"detector": 0, "tracker": 0, "roi": 0}
+        self.last_source = None
+        self._tracker = None
+        self._last = None  # Detections holding the single tracked box
+        self._frames_since_detection = 0
+
+    def _full_detection(self, frame):
+        detections = self.detect(frame)
+        self.counts["detector"] += 1
+        self.last_source = "detector"
+        self._frames_since_detection = 0
+        self._last = detections[:1] if len(detections) else None
+
+        self._tracker = None
+        if self._last is not None and self.tracker_kind is not None:
+            self._tracker = create_tracker(self.tracker_kind)
+            if self._tracker is not None:
+                x1, y1, x2, y2 = self._last.boxes[0].astype(int).tolist()
+                self._tracker.init(frame, (x1, y1, x2 - x1, y2 - y1))
+        return detections
+
+    def _track(self, frame):
+        ok, (x, y, w, h) = self._tracker.update(frame)
+        if not ok:
+            return None
+        self.counts["tracker"] += 1
+        self.last_source = "tracker"
+        return Detections([[x, y, x + w, y + h]], self._last.class_ids, self._last.scores, self._last.names)
+
+    def _detect_in_roi(self, frame):
+        x1, y1, x2, y2 = self._last.boxes[0]
+        pad_x, pad_y = (x2 - x1) * self.roi_margin, (y2 - y1) * self.roi_margin
+        height, width = frame.shape[:2]
+        left, top = int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y))
+        right, bottom = int(min(width, x2 + pad_x)), int(min(height, y2 + pad_y))
+        if right - left < 2 or bottom - top < 2:
+            return None
+
+        detections = self.detect_roi(frame[top:bottom, left:right])  # A view, so cropping copies no pixels
+        if not len(detections) or detections.scores[0] < self.min_confidence:
+            return None
+
+        self.counts["roi"] += 1
+        self.last_source = "roi"
+        best = detections[:1]
+        best.boxes += np.array([left, top, left, top], dtype=np.float32)
+        return best
+
+    def update(self, frame):
+        """
+        Returns the target detections for `frame`.
+
+        Returns:
+            Detections: All target detections after a full detection, else the single tracked box.
+        """
+        self._frames_since_detection += 1
+        if self._last is None or self._frames_since_detection >= self.detect_every:
+            return self._full_detection(frame)
+
+        tracked = self._track(frame) if self._tracker is not None else self._detect_in_roi(frame)
+        if tracked is None:
+            return self._full_detection(frame)
+
+        self._last = tracked
+        return tracked
+
+    def report(self):
+        """Prints the fraction of frames served by the detector, tracker and ROI detection."""
+        total = max(1, sum(self.counts.values()))
+        print("Frames served by: " + ", ".join(f"{source} {100 * count / total:.0f}%"
+                                             for source, count in self.counts.items()))
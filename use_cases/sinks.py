@@ -0,0 +1,333 @@
+import http.server
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import instrumentation
+from frame_pipeline import LatencyStats, LatestQueue
+
+
+def draw_detections(image, detections, color=(0, 0, 255), text_color=(0, 255, 0)):
+    """
+    Draws detection boxes and labels onto a BGR image in place with OpenCV.
+
+    Box coordinates and label strings are prepared for all detections at once;
+    only the cv2 drawing calls remain per box.
+
+    Args:
+        image (numpy.ndarray): BGR image.
+        detections (Detections): Detection results in the image's pixel coordinates.
+        color (tuple): BGR box colour.
+        text_color (tuple): BGR label colour.
+    """
+    if detections is None or len(detections) == 0:
+        return image
+    boxes = np.rint(detections.boxes).astype(np.int32).tolist()
+    labels = [f"{name} ({score:.2f})" for name, score in zip(detections.labels(), detections.scores.tolist())]
+    for (x1, y1, x2, y2), label in zip(boxes, labels):
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(image, label, (x1, max(y1 - 10, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
+    return image
+
+
+class Sink:
+    """
+    Destination for annotated frames.
+
+    `submit` draws the detections onto the image and passes it to `write`.
+    Sinks that render nothing override `submit` so no drawing happens at all.
+    """
+
+    quit_requested = False  # Set when the user asks to quit (e.g. 'q' in a window)
+    gui = False  # `write` must run on the main thread (OpenCV HighGUI is not thread-safe)
+
+    def submit(self, image, detections=None, color=(0, 0, 255)):
+        with instrumentation.span("draw"):
+            image = draw_detections(image, detections, color)
+        with instrumentation.span("sink_write", sink=type(self).__name__):
+            self.write(image)
+
+    def write(self, image):
+        raise NotImplementedError
+
+    def pump(self):
+        """Shows frames prepared in the background; only AsyncSink around a GUI sink has any."""
+
+    def close(self):
+        pass
+
+
+class NullSink(Sink):
+    """Discards everything; use for pure inference runs."""
+
+    def submit(self, image, detections=None, color=(0, 0, 255)):
+        pass
+
+
+class WindowSink(Sink):
+    """
+    Shows frames in an OpenCV window; pressing 'q' sets `quit_requested`.
+
+    Args:
+        title (str): Window title.
+        hold (bool): On close, keep the last image on screen until a key is pressed (for still images).
+    """
+
+    gui = True
+
+    def __init__(self, title="Detections", hold=False):
+        self.title = title
+        self.hold = hold
+        self._shown = False
+
+    def write(self, image):
+        cv2.imshow(self.title, image)
+        self._shown = True
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.quit_requested = True
+
+    def close(self):
+        if self._shown:
+            if self.hold:
+                cv2.waitKey(0)
+            cv2.destroyWindow(self.title)
+
+
+class VideoFileSink(Sink):
+    """
+    Writes frames to a video file; the writer is opened with the first frame's size.
+
+    Args:
+        path (str): Output file, e.g. 'detections.mp4' or 'detections.avi'.
+        fps (float): Frame rate stored in the file.
+    """
+
+    def __init__(self, path, fps=15):
+        self.path = path
+        self.fps = fps
+        self._writer = None
+
+    def write(self, image):
+        if self._writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*("mp4v" if self.path.lower().endswith(".mp4") else "MJPG"))
+            self._writer = cv2.VideoWriter(self.path, fourcc, self.fps, (image.shape[1], image.shape[0]))
+        self._writer.write(image)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class _MjpegHandler(http.server.BaseHTTPRequestHandler):
+    """Streams the sink's newest JPEG to each client as multipart/x-mixed-replace."""
+
+    def do_GET(self):
+        sink = self.server.sink
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last = None
+        try:
+            while not sink.closed:
+                jpeg = sink.wait_for_jpeg(last, timeout=1.0)
+                if jpeg is None or jpeg is last:
+                    continue
+                last = jpeg
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                self.wfile.write(jpeg + b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away
+
+    def log_message(self, format, *args):
+        pass  # Keep request logging off the console
+
+
+class MjpegSink(Sink):
+    """
+    Serves frames as an MJPEG stream that any browser can open, e.g. http://127.0.0.1:8080/.
+
+    Frames are JPEG-encoded once and shared by all connected clients.
+
+    Args:
+        port (int): TCP port.
+        host (str): Interface to bind; keep the default to serve only this machine.
+        quality (int): JPEG quality (0-100).
+    """
+
+    def __init__(self, port=8080, host="127.0.0.1", quality=80):
+        self.quality = quality
+        self.closed = False
+        self._jpeg = None
+        self._ready = threading.Condition()
+        self._server = http.server.ThreadingHTTPServer((host, port), _MjpegHandler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"MJPEG stream at http://{host}:{port}/")
+
+    def write(self, image):
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if ok:
+            with self._ready:
+                self._jpeg = jpeg.tobytes()
+                self._ready.notify_all()
+
+    def wait_for_jpeg(self, last, timeout=None):
+        """Returns the newest JPEG once it differs from `last` (or after `timeout`)."""
+        with self._ready:
+            self._ready.wait_for(lambda: self._jpeg is not last or self.closed, timeout=timeout)
+            return self._jpeg
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ImageDumpSink(Sink):
+    """
+    Saves annotated frames as numbered JPEG files.
+
+    Args:
+        directory (str): Output directory (created if needed).
+        prefix (str): File name prefix.
+    """
+
+    def __init__(self, directory, prefix="frame"):
+        self.directory = directory
+        self.prefix = prefix
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, image):
+        cv2.imwrite(os.path.join(self.directory, f"{self.prefix}_{self.count:06d}.jpg"), image)
+        self.count += 1
+
+
+class AsyncSink(Sink):
+    """
+    Runs another sink on its own thread at a capped frame rate.
+
+    `submit` returns immediately: frames arriving faster than `max_fps` are
+    skipped without being copied, and the rest are copied (the caller may reuse
+    its buffer) and handed to the sink thread through a single-slot queue, so
+    drawing and encoding never hold up the inference loop.
+
+    GUI sinks (windows) only draw on the sink thread; the drawn frame is shown
+    by the next `submit` or `pump` on the caller's thread, which must be the
+    main thread. Callers that may go a while without submitting call `pump`.
+
+    Args:
+        sink (Sink): Sink doing the actual rendering.
+        max_fps (float): Maximum frames per second passed to `sink`.
+    """
+
+    def __init__(self, sink, max_fps=15):
+        self.sink = sink
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.stats = LatencyStats(name="sink")
+        self.skipped = 0
+        self._next_at = 0.0
+        self._drawn = None  # Newest frame drawn for a GUI sink, waiting for `pump`
+        self._drawn_lock = threading.Lock()
+        self._queue = LatestQueue(maxsize=1, name="sink")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def quit_requested(self):
+        return self.sink.quit_requested
+
+    @property
+    def dropped(self):
+        """Frames accepted by `submit` but replaced by a newer one before the sink got to them."""
+        return self._queue.dropped
+
+    def submit(self, image, detections=None, color=(0, 0, 255)):
+        self.pump()
+        now = time.perf_counter()
+        if now < self._next_at:
+            self.skipped += 1
+            instrumentation.count("sink_skipped")
+            return
+        self._next_at = now + self.period
+        self._queue.put((image.copy(), detections, color))
+
+    def pump(self):
+        """Shows the newest frame drawn for a GUI sink, if any; call from the main thread."""
+        with self._drawn_lock:
+            image, self._drawn = self._drawn, None
+        if image is not None:
+            start = time.perf_counter()
+            with instrumentation.span("sink_write", sink=type(self.sink).__name__):
+                self.sink.write(image)
+            self.stats.record("display", time.perf_counter() - start)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            start = time.perf_counter()
+            if self.sink.gui:
+                with instrumentation.span("draw"):
+                    image = draw_detections(*item)
+                with self._drawn_lock:
+                    self._drawn = image
+            else:
+                self.sink.submit(*item)
+            self.stats.record("sink", time.perf_counter() - start)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.pump()  # Last drawn frame
+        self.sink.close()
+
+
+def open_sink(spec, title="Detections", max_fps=15, index=None, hold=False):
+    """
+    Creates a sink from a command-line spec.
+
+    Args:
+        spec (str): 'none', 'window', 'video:PATH', 'mjpeg[:PORT]' or 'dump:DIRECTORY'.
+        title (str): Window title for 'window'.
+        max_fps (float): Rate cap; the sink then runs on its own thread. None renders synchronously
+            in the caller (for still images).
+        index (int): Source number when one sink is opened per camera; it is appended to
+            file and directory names and added to the MJPEG port.
+        hold (bool): For 'window', keep the last image shown until a key is pressed on close.
+
+    Returns:
+        Sink: The sink, wrapped in an AsyncSink when `max_fps` is set.
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "none":
+        return NullSink()
+    if kind == "window":
+        sink = WindowSink(title, hold=hold)
+    elif kind == "video":
+        path = arg or "detections.mp4"
+        if index is not None:
+            root, ext = os.path.splitext(path)
+            path = f"{root}_{index}{ext}"
+        sink = VideoFileSink(path, fps=max_fps or 15)
+    elif kind == "mjpeg":
+        sink = MjpegSink(port=int(arg or 8080) + (index or 0))
+    elif kind == "dump":
+        directory = arg or "detections"
+        sink = ImageDumpSink(os.path.join(directory, str(index)) if index is not None else directory)
+    else:
+        raise ValueError(f"Unknown sink '{spec}'. Use none, window, video:PATH, mjpeg[:PORT] or dump:DIRECTORY.")
+    return AsyncSink(sink, max_fps) if max_fps else sink
+
+
+SINK_HELP = ("Where annotated frames go: none, window, video:PATH, mjpeg[:PORT] (http://127.0.0.1:PORT/) "
+             "or dump:DIRECTORY")
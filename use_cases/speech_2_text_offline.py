@@ -1,61 +1,288 @@
-import vosk
-import sys
 import json
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
 import pyaudio
+import vosk
+
+from frame_pipeline import LatencyStats, LatestQueue
+from model_registry import get_model
+
+SAMPLE_RATE = 16000  # Rate of the bundled Vosk models; other rates are accepted by the recognizer
 
-def initialize_recognizer(model_path="vosk-model-en-us-0.22"):
+def load_model():
     """
-    Initializes the Vosk speech recognizer and microphone.
-    
-    Args:
-        model_path (str): Path to the Vosk model directory.
-    
+    Returns the resident Vosk model, loading it once.
+
+    The model directory is taken from VLM_VOSK_MODEL (default 'vosk-model-en-us-0.22').
+
     Returns:
-        tuple: Recognizer object and microphone stream.
+        vosk.Model: Loaded model.
     """
-    print("Loading Vosk model... This may take a few seconds.")
-    
-    # Load speech recognition model
-    model = vosk.Model(model_path)
-    recognizer = vosk.KaldiRecognizer(model, 16000)
+    return get_model("vosk")
 
-    # Initialize microphone
-    try:
-        mic = pyaudio.PyAudio().open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=8000)
-        mic.start_stream()
-        return recognizer, mic
-    except Exception as e:
-        print("Error initializing microphone:", e)
-        sys.exit(1)
+class MicrophoneSource:
+    """
+    Callback-driven 16-bit mono microphone source.
+
+    PyAudio's callback only copies each block into a bounded queue, so the
+    audio thread never waits on the recognizer. If the recognizer falls behind,
+    the oldest blocks are dropped and counted in `dropped`. Use as a context
+    manager so the stream and the PyAudio instance are always closed.
+
+    Args:
+        samplerate (int): Sampling rate of the audio.
+        block_seconds (float): Audio delivered per callback.
+        max_seconds (float): Audio buffered before the oldest blocks are dropped.
+    """
+
+    def __init__(self, samplerate=SAMPLE_RATE, block_seconds=0.1, max_seconds=5.0):
+        self.samplerate = samplerate
+        self.block = int(block_seconds * samplerate)
+        self._blocks = LatestQueue(maxsize=max(1, int(max_seconds / block_seconds)), name="vosk_audio")
+        self._closed = threading.Event()
+        self._audio = None
+        self._stream = None
+
+    @property
+    def dropped(self):
+        return self._blocks.dropped
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self._blocks.put(in_data)
+        return None, pyaudio.paContinue
+
+    def __enter__(self):
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=self.samplerate, input=True,
+                                        frames_per_buffer=self.block, stream_callback=self._callback)
+        self._stream.start_stream()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._closed.set()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+    def chunks(self):
+        """Yields int16 PCM blocks until the source is closed."""
+        while not self._closed.is_set():
+            try:
+                yield self._blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+class ArraySource:
+    """
+    Streams pre-recorded audio from memory, as fast as the recognizer consumes it.
+
+    Args:
+        audio (numpy.ndarray): Mono samples, int16 or float in [-1, 1].
+        samplerate (int): Sampling rate of the audio.
+        block_seconds (float): Audio per yielded block.
+        realtime (bool): Pace the blocks like a live microphone instead of running faster than real time.
+    """
+
+    def __init__(self, audio, samplerate=SAMPLE_RATE, block_seconds=0.1, realtime=False):
+        audio = np.asarray(audio)
+        if audio.dtype != np.int16:
+            audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        self.pcm = audio.tobytes()
+        self.samplerate = samplerate
+        self.block = int(block_seconds * samplerate)
+        self.realtime = realtime
+        self.dropped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def chunks(self):
+        """Yields int16 PCM blocks of `block_seconds` each."""
+        step = self.block * 2  # Two bytes per sample
+        start = time.perf_counter()
+        for i, offset in enumerate(range(0, len(self.pcm), step)):
+            if self.realtime:
+                time.sleep(max(0.0, start + i * self.block / self.samplerate - time.perf_counter()))
+            yield self.pcm[offset:offset + step]
+
+class WavSource(ArraySource):
+    """
+    Streams a 16-bit mono WAV file.
+
+    Args:
+        path (str): WAV file path.
+        block_seconds (float): Audio per yielded block.
+        realtime (bool): Pace the blocks like a live microphone.
+    """
+
+    def __init__(self, path, block_seconds=0.1, realtime=False):
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+                raise ValueError(f"{path}: expected 16-bit mono PCM, got {wf.getsampwidth() * 8}-bit "
+                                 f"with {wf.getnchannels()} channels")
+            samplerate = wf.getframerate()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        super().__init__(audio, samplerate=samplerate, block_seconds=block_seconds, realtime=realtime)
 
-def listen_and_recognize(recognizer, mic):
+class RecognitionEvent:
     """
-    Continuously listens for speech input and prints recognized text.
-    
+    One hypothesis from the streaming recognizer.
+
+    Attributes:
+        kind (str): 'partial' (may still change) or 'final' (end of an utterance).
+        text (str): Recognized text.
+        audio_seconds (float): Position in the audio stream when the event was produced.
+    """
+
+    __slots__ = ("kind", "text", "audio_seconds")
+
+    def __init__(self, kind, text, audio_seconds):
+        self.kind = kind
+        self.text = text
+        self.audio_seconds = audio_seconds
+
+    def __repr__(self):
+        return f"RecognitionEvent({self.kind!r}, {self.text!r}, {self.audio_seconds:.2f})"
+
+class StreamingRecognizer(threading.Thread):
+    """
+    Runs Vosk on a background thread and publishes partial and final hypotheses.
+
+    The recognizer consumes any PCM source (`MicrophoneSource`, `WavSource`,
+    `ArraySource`). Partial hypotheses are emitted whenever they change, so
+    keyword commands can react before the utterance is finalized.
+
     Args:
-        recognizer (KaldiRecognizer): Vosk recognizer instance.
-        mic (PyAudio Stream): Audio stream for input.
+        source: PCM source with `samplerate` and `chunks()`.
+        model (vosk.Model): Loaded model; defaults to the resident model from `load_model`.
+        partials (bool): Emit partial hypotheses as well as finals.
     """
-    print("Listening... (Say 'exit' to stop)")
 
-    while True:
-        data = mic.read(4000, exception_on_overflow=False)
-        
-        if recognizer.AcceptWaveform(data):
-            result_text = json.loads(recognizer.Result())["text"]
-            print("You said:", result_text)
+    def __init__(self, source, model=None, partials=True):
+        super().__init__(daemon=True)
+        self.source = source
+        self.partials = partials
+        self.stats = LatencyStats(name="vosk")
+        self.audio_seconds = 0.0
+        self.elapsed = 0.0
+        self._recognizer = vosk.KaldiRecognizer(model or load_model(), source.samplerate)
+        self._events = queue.Queue()
+        self._stop_event = threading.Event()
 
-            # Exit the program if the user says "exit"
-            if "exit" in result_text.lower():
-                print("Exiting speech recognition...")
+    def run(self):
+        last_partial = ""
+        start = time.perf_counter()
+        for chunk in self.source.chunks():
+            if self._stop_event.is_set():
                 break
+            self.audio_seconds += len(chunk) / 2 / self.source.samplerate
+
+            decode_start = time.perf_counter()
+            if self._recognizer.AcceptWaveform(chunk):
+                self._publish("final", json.loads(self._recognizer.Result())["text"])
+                last_partial = ""
+            elif self.partials:
+                partial = json.loads(self._recognizer.PartialResult())["partial"]
+                if partial != last_partial:
+                    self._publish("partial", partial)
+                    last_partial = partial
+            self.stats.record("decode", time.perf_counter() - decode_start)
+
+        self._publish("final", json.loads(self._recognizer.FinalResult())["text"])
+        self.elapsed = time.perf_counter() - start
+        self._events.put(None)  # End of stream
+
+    def _publish(self, kind, text):
+        if text:
+            self._events.put(RecognitionEvent(kind, text, self.audio_seconds))
+
+    def stop(self):
+        """Stops recognizing after the current block; `events` then ends."""
+        self._stop_event.set()
+        self.source.close()
+
+    def events(self):
+        """
+        Yields RecognitionEvents until the source is exhausted or `stop` is called.
+
+        Yields:
+            RecognitionEvent: Partial and final hypotheses in stream order.
+        """
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+    @property
+    def real_time_factor(self):
+        """Processing time divided by audio duration (below 1.0 is faster than real time)."""
+        return self.elapsed / self.audio_seconds if self.audio_seconds else None
+
+    def report(self):
+        """Prints per-block decode latency, real-time factor and dropped audio blocks."""
+        self.stats.report()
+        if self.real_time_factor is not None:
+            print(f"Real-time factor: {self.real_time_factor:.3f} ({self.audio_seconds:.1f} s of audio)")
+        print(f"Dropped audio blocks: {self.source.dropped}")
+
+def listen_and_recognize(source, keyword="exit"):
+    """
+    Prints recognized speech until `keyword` is heard.
+
+    The keyword is matched on partial hypotheses, so it fires as soon as it is
+    spoken rather than after the end of the utterance.
+
+    Args:
+        source: PCM source, e.g. an open MicrophoneSource.
+        keyword (str): Word that stops recognition.
+    """
+    print(f"Listening... (Say '{keyword}' to stop)")
+    recognizer = StreamingRecognizer(source)
+    recognizer.start()
+
+    for event in recognizer.events():
+        if event.kind == "final":
+            print("You said:", event.text)
+        else:
+            print("… ", event.text, end="\r")
+
+        if keyword in event.text.lower().split():
+            print("\nExiting speech recognition...")
+            recognizer.stop()
+            break
+
+    recognizer.join()
+    recognizer.report()
 
 def main():
     """
-    Main function to initialize the recognizer and start listening.
+    Main function to load the model and recognize speech from the microphone.
     """
-    recognizer, mic = initialize_recognizer()
-    listen_and_recognize(recognizer, mic)
+    print("Loading Vosk model... This may take a few seconds.")
+    load_model()
+    try:
+        with MicrophoneSource() as mic:
+            listen_and_recognize(mic)
+    except Exception as e:
+        print(f"Error recognizing speech from the microphone: {e}")
 
 if __name__ == "__main__":
     main()
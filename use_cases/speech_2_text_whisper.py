@@ -1,53 +1,218 @@
-import whisper
+import string
+import threading
+import time
+
 import sounddevice as sd
 import numpy as np
-import wave
 
-def record_audio(filename="recorded_audio.wav", duration=5, samplerate=44100):
+import instrumentation
+from model_registry import get_model
+
+SAMPLE_RATE = 16000  # Whisper's native sampling rate; recording at it avoids resampling
+
+def load_model(model_size="small"):
     """
-    Records audio from the microphone and saves it as a WAV file.
-    
+    Returns the resident, warmed-up Whisper model of the given size, loading it once.
+
     Args:
-        filename (str): Output WAV file name.
-        duration (int): Recording duration in seconds.
+        model_size (str): Whisper model size (e.g., 'tiny', 'base', 'small', 'medium', 'large-v3', 'turbo').
+
+    Returns:
+        whisper.model.Whisper: Loaded model.
+    """
+    return get_model(f"whisper-{model_size}")
+
+class MicrophoneBuffer:
+    """
+    Records from the microphone at 16 kHz straight into a preallocated float32 buffer.
+
+    Use as a context manager; `wait_for` lets a consumer process audio while
+    recording is still in progress. If the stream is closed or stops delivering
+    audio early, `wait_for` returns what was recorded instead of blocking.
+
+    Args:
+        duration (float): Recording duration in seconds.
         samplerate (int): Sampling rate of the audio.
     """
-    try:
-        print(f"Recording for {duration} seconds...")
-        audio = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype=np.int16)
-        sd.wait()
-        print("Recording finished.")
 
-        # Save the recorded audio to a WAV file
-        with wave.open(filename, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(samplerate)
-            wf.writeframes(audio.tobytes())
+    def __init__(self, duration, samplerate=SAMPLE_RATE):
+        self.samplerate = samplerate
+        self.audio = np.zeros(int(duration * samplerate), dtype=np.float32)
+        self.written = 0
+        self.finished_at = None
+        self.closed = False
+        self._ready = threading.Condition()
+        self._stream = sd.InputStream(samplerate=samplerate, channels=1, dtype="float32", callback=self._callback)
 
-        print(f"Audio saved as {filename}")
+    def _callback(self, indata, frames, time_info, status):
+        with self._ready:
+            count = min(frames, len(self.audio) - self.written)
+            self.audio[self.written:self.written + count] = indata[:count, 0]
+            self.written += count
+            if self.written >= len(self.audio) and self.finished_at is None:
+                self.finished_at = time.perf_counter()
+            self._ready.notify_all()
 
-    except Exception as e:
-        print(f"Error recording audio: {e}")
+    def __enter__(self):
+        self._stream.start()
+        return self
 
-def transcribe_audio(filename="recorded_audio.wav", model_size="small"):
+    def __exit__(self, *exc):
+        self._stream.stop()
+        self._stream.close()
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+    def wait_for(self, end, timeout=None):
+        """
+        Blocks until `end` samples are recorded and returns the audio up to there.
+
+        Args:
+            end (int): Sample index to wait for.
+            timeout (float): Seconds to wait; defaults to the time still needed to record `end` samples
+                plus 2 s. On timeout, or if the stream is closed, recording counts as finished.
+
+        Returns:
+            numpy.ndarray: The recorded audio, shorter than `end` samples if recording ended early.
+        """
+        with self._ready:
+            if timeout is None:
+                timeout = max(0, end - self.written) / self.samplerate + 2.0
+            if not self._ready.wait_for(lambda: self.written >= end or self.closed, timeout=timeout):
+                print(f"Microphone stopped delivering audio after {self.written / self.samplerate:.1f} s.")
+            if self.written < end and self.finished_at is None:
+                self.finished_at = time.perf_counter()
+            return self.audio[:min(end, self.written)]
+
+class ArrayBuffer:
+    """Wraps pre-recorded 16 kHz float32 audio so it can be streamed like the microphone."""
+
+    def __init__(self, audio):
+        self.audio = np.asarray(audio, dtype=np.float32)
+        self.finished_at = time.perf_counter()
+
+    def wait_for(self, end, timeout=None):
+        return self.audio[:end]
+
+def merge_overlap(previous, new, max_words=8):
     """
-    Transcribes speech from an audio file using OpenAI's Whisper model.
-    
+    Appends `new` to `previous`, dropping words repeated because chunks overlap.
+
     Args:
-        filename (str): Path to the audio file.
-        model_size (str): Whisper model size (e.g., 'tiny', 'base', 'small', 'medium', 'large').
-    
+        previous (str): Text transcribed so far.
+        new (str): Text of the latest chunk.
+        max_words (int): Longest overlap (in words) that is checked.
+
+    Returns:
+        str: Merged text.
+    """
+    def normalize(word):
+        return word.lower().strip(string.punctuation)
+
+    previous_words, new_words = previous.split(), new.split()
+    for n in range(min(max_words, len(previous_words), len(new_words)), 0, -1):
+        if [normalize(w) for w in previous_words[-n:]] == [normalize(w) for w in new_words[:n]]:
+            new_words = new_words[n:]
+            break
+    return " ".join(previous_words + new_words)
+
+class StreamingTranscriber:
+    """
+    Transcribes audio in overlapping chunks while it is still being recorded.
+
+    The model stays resident, so once recording ends the transcript is ready
+    after decoding only the last chunk.
+
+    Args:
+        model_size (str): Whisper model size.
+        chunk_seconds (float): Length of each decoded chunk.
+        overlap_seconds (float): Audio shared between consecutive chunks, so words at the boundary are not cut.
+        language (str): Spoken language (e.g. 'en'); None lets Whisper detect it per chunk.
+
+    Raises:
+        ValueError: If `overlap_seconds` is negative or not shorter than `chunk_seconds`.
+    """
+
+    def __init__(self, model_size="small", chunk_seconds=3.0, overlap_seconds=0.5, language=None):
+        if not 0 <= overlap_seconds < chunk_seconds:
+            raise ValueError(f"overlap_seconds ({overlap_seconds}) must be at least 0 and shorter than "
+                             f"chunk_seconds ({chunk_seconds}), otherwise streaming never advances.")
+        self.model = load_model(model_size)
+        self.chunk = int(chunk_seconds * SAMPLE_RATE)
+        self.overlap = int(overlap_seconds * SAMPLE_RATE)
+        self.language = language
+        self.final_latency = None  # Seconds between the end of the audio and the final transcript
+
+    @instrumentation.timed("whisper_chunk")
+    def _decode(self, audio, prompt):
+        result = self.model.transcribe(audio, language=self.language, initial_prompt=prompt or None,
+                                       condition_on_previous_text=False, fp16=self.model.device.type == "cuda")
+        return result["text"].strip()
+
+    def stream(self, buffer):
+        """
+        Yields the transcript so far after each chunk is decoded.
+
+        Args:
+            buffer (MicrophoneBuffer | ArrayBuffer): Audio source.
+
+        Yields:
+            str: Partial transcript; the last value is the full transcript.
+        """
+        total = len(buffer.audio)
+        text = ""
+        start = 0
+        while start < total:
+            end = min(start + self.chunk, total)
+            recorded = buffer.wait_for(end)
+            if len(recorded) < end:  # Recording ended early; transcribe what there is
+                total = end = len(recorded)
+                if end <= start:  # Nothing new since the last chunk
+                    self.final_latency = time.perf_counter() - buffer.finished_at
+                    break
+            audio = recorded[start:end]
+            text = merge_overlap(text, self._decode(audio, prompt=text[-200:]))
+            if end >= total:
+                self.final_latency = time.perf_counter() - buffer.finished_at
+            yield text
+            start = end - self.overlap if end < total else total
+
+def record_audio(duration=5, samplerate=SAMPLE_RATE):
+    """
+    Records audio from the microphone into memory.
+
+    Args:
+        duration (int): Recording duration in seconds.
+        samplerate (int): Sampling rate of the audio.
+
+    Returns:
+        numpy.ndarray: Mono float32 samples in [-1, 1].
+    """
+    print(f"Recording for {duration} seconds...")
+    audio = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype=np.float32)
+    sd.wait()
+    print("Recording finished.")
+    return audio[:, 0]
+
+def transcribe_audio(audio, model_size="small"):
+    """
+    Transcribes speech using OpenAI's Whisper model.
+
+    Args:
+        audio (numpy.ndarray | str): 16 kHz float32 samples or path to an audio file.
+        model_size (str): Whisper model size (e.g., 'tiny', 'base', 'small', 'medium', 'large-v3', 'turbo').
+
     Returns:
         str: Transcribed text.
     """
     try:
-        print(f"Loading Whisper model ({model_size})...")
-        model = whisper.load_model(model_size)
-        
-        print(f"Transcribing {filename}...")
-        result = model.transcribe(filename)
-        
+        model = load_model(model_size)
+
+        print("Transcribing...")
+        with instrumentation.span("whisper_transcribe"):
+            result = model.transcribe(audio, fp16=model.device.type == "cuda")
+
         print("Transcription complete.")
         return result["text"]
 
@@ -57,15 +222,20 @@ def transcribe_audio(filename="recorded_audio.wav", model_size="small"):
 
 def main():
     """
-    Records audio and transcribes it using Whisper.
+    Records audio and transcribes it with Whisper while recording, printing partial text.
     """
     duration = 5  # Set recording duration (seconds)
     model_size = "small"  # Set Whisper model size
-    
-    record_audio(duration=duration)
-    transcript = transcribe_audio(model_size=model_size)
-    
+
+    transcriber = StreamingTranscriber(model_size=model_size)
+    transcript = ""
+    print(f"Recording for {duration} seconds...")
+    with MicrophoneBuffer(duration) as buffer:
+        for transcript in transcriber.stream(buffer):
+            print("… ", transcript)
+
     print("\n🔹 Transcribed Text:\n", transcript)
+    print(f"Transcript ready {transcriber.final_latency:.2f} s after recording ended.")
 
 if __name__ == "__main__":
     main()
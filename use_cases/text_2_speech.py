@@ -1,15 +1,17 @@
-import pyttsx3
+from tts_worker import get_speech_worker
 
 
-def say(text):
-    # Convert text to speech
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 200)
-    engine.say(text)
+def say(text, wait=False):
+    # Queue the text on the long-lived TTS worker (engine is initialized once)
+    get_speech_worker(rate=200).say(text)
 
-    # Wait for the speech to finish
-    engine.runAndWait()
+    # Optionally wait for the speech to finish
+    if wait:
+        get_speech_worker().wait()
     print("Robo: ", text)
 
 
-say("Hello world!")
\ No newline at end of file
+if __name__ == "__main__":
+    say("Hello world!", wait=True)
+    say("Hello world!", wait=True)  # Second time is played from the cache
+    get_speech_worker().report()
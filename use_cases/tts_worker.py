@@ -0,0 +1,252 @@
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+import numpy as np
+import pyttsx3
+import sounddevice as sd
+
+import instrumentation
+from frame_pipeline import LatencyStats
+
+
+def _read_wav(path):
+    """Returns (samples, samplerate) from a 16-bit WAV file; raises wave.Error or EOFError if it is invalid."""
+    with wave.open(path, "rb") as wf:
+        frames = wf.readframes(wf.getnframes())
+        if len(frames) != wf.getnframes() * wf.getnchannels() * wf.getsampwidth():
+            raise EOFError(f"expected {wf.getnframes()} frames")  # Truncated data chunk
+        samples = np.frombuffer(frames, dtype=np.int16)
+        return samples.reshape(-1, wf.getnchannels()), wf.getframerate()
+
+
+class SpeechWorker(threading.Thread):
+    """
+    Long-lived text-to-speech worker with a non-blocking `say`.
+
+    The pyttsx3 engine is created once, on the worker thread (pyttsx3 engines
+    must be driven from the thread that created them). Phrases are synthesized
+    to WAV once and cached on disk and in memory, so repeated phrases such as
+    "I'm going to follow, orange." play back without re-synthesis.
+
+    `start` raises if the engine cannot be created (e.g. no espeak). A phrase
+    that fails to synthesize or play is logged and skipped, so `wait` never
+    hangs on it.
+
+    Args:
+        rate (int): Speech rate in words per minute.
+        cache_dir (str): Directory for synthesized WAV files; None disables caching.
+        coalesce (bool): Ignore a phrase that is already waiting in the queue.
+        play (bool): Play phrases on the sound card; False only synthesizes and caches them
+            (for machines without audio output, e.g. benchmarks).
+        memory_phrases (int): Decoded phrases kept in memory; older ones are re-read from disk.
+    """
+
+    def __init__(self, rate=200, cache_dir=os.path.join(tempfile.gettempdir(), "tts_cache"), coalesce=True,
+                 play=True, memory_phrases=64):
+        super().__init__(daemon=True)
+        self.rate = rate
+        self.cache_dir = cache_dir
+        self.coalesce = coalesce
+        self.play = play
+        self.memory_phrases = memory_phrases
+        self.error = None  # Exception raised while creating the engine
+        self.stats = LatencyStats(name="tts")
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._audio = OrderedDict()  # text -> (samples, samplerate) or None if the platform cannot save WAV; LRU
+        self._engine = None
+        self._engine_rate = None
+        self._started = threading.Event()
+        self._playing = False
+        self._played_at = 0.0  # perf_counter() when the last phrase finished playing
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def say(self, text, interrupt=False):
+        """
+        Queues `text` for speaking and returns immediately.
+
+        Args:
+            text (str): Text to speak.
+            interrupt (bool): Drop all pending phrases and cut off the one currently playing.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if interrupt:
+                self._drain()
+                if self.play:
+                    sd.stop()
+            if not (self.coalesce and text in self._pending):
+                self._pending.add(text)
+                self._queue.put((text, start))
+        self.stats.record("say_blocked", time.perf_counter() - start)
+
+    def start(self):
+        """Starts the worker and waits for the engine; raises RuntimeError if it cannot be created."""
+        super().start()
+        self._started.wait()
+        if self.error is not None:
+            raise RuntimeError(f"Text-to-speech engine unavailable: {self.error}") from self.error
+
+    def wait(self):
+        """Blocks until every queued phrase has been spoken."""
+        self._queue.join()
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        self._pending.clear()
+
+    def cache_path(self, text):
+        """Returns the WAV file `text` is (or will be) cached in."""
+        key = hashlib.sha1(f"{self.rate}:{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _load_audio(self, text):
+        """Returns cached (samples, samplerate) for `text`, synthesizing it on a miss."""
+        if text in self._audio:
+            self._audio.move_to_end(text)
+            self.cache_hits += 1
+            instrumentation.count("tts_cache", result="memory")
+            return self._audio[text]
+
+        path = self.cache_path(text)
+        try:
+            audio = _read_wav(path)
+            self.cache_hits += 1
+            instrumentation.count("tts_cache", result="disk")
+        except FileNotFoundError:
+            audio = None
+        except (wave.Error, EOFError) as e:
+            print(f"Error reading cached speech {path}, synthesizing it again: {e}")
+            audio = None
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Already replaced or removed by another process
+        if audio is None:
+            self.cache_misses += 1
+            instrumentation.count("tts_cache", result="miss")
+            audio = self._synthesize(text, path)
+
+        self._audio[text] = audio
+        while len(self._audio) > self.memory_phrases:
+            self._audio.popitem(last=False)
+        return audio
+
+    def _synthesize(self, text, path):
+        """
+        Synthesizes `text` into the cache file `path`.
+
+        The WAV is written to a temporary file and moved into place only once it
+        reads back, so an interrupted synthesis never leaves a truncated cache file.
+
+        Returns:
+            tuple: (samples, samplerate), or None if the platform cannot save WAV.
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=self.cache_dir)  # Same directory: os.replace is atomic
+        os.close(fd)
+        try:
+            self._engine.save_to_file(text, tmp_path)
+            self._engine.runAndWait()
+            audio = _read_wav(tmp_path)
+            os.replace(tmp_path, path)
+            return audio
+        except (wave.Error, EOFError):
+            return None  # e.g. macOS writes AIFF; fall back to speaking live
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _speak(self, text, queued_at):
+        if self._engine_rate != self.rate:  # Changed through get_speech_worker(rate=...)
+            self._engine.setProperty('rate', self.rate)
+            self._engine_rate = self.rate
+
+        audio = self._load_audio(text) if self.cache_dir is not None else None
+        self.stats.record("first_audio", time.perf_counter() - queued_at)
+        if not self.play:
+            return
+        self._playing = True
+        try:
+            if audio is not None:
+                sd.play(audio[0], audio[1])
+                sd.wait()
+            else:
+                self._engine.say(text)
+                self._engine.runAndWait()
+        finally:
+            self._playing = False
+            self._played_at = time.perf_counter()
+
+    def is_speaking(self, tail_seconds=0.3):
+        """
+        True while a phrase is playing and for `tail_seconds` after it, to cover room echo.
+
+        Microphone listeners use this to ignore the robot's own voice.
+        """
+        return self._playing or time.perf_counter() - self._played_at < tail_seconds
+
+    def run(self):
+        try:
+            self._engine = pyttsx3.init()
+        except Exception as e:
+            self.error = e
+            return
+        finally:
+            self._started.set()
+
+        while True:
+            text, queued_at = self._queue.get()
+            with self._lock:
+                self._pending.discard(text)
+            try:
+                self._speak(text, queued_at)
+            except Exception as e:
+                print(f"Error speaking '{text}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def report(self):
+        """Prints caller blocking time, time-to-first-audio and cache hit counts."""
+        self.stats.report()
+        print(f"TTS cache: {self.cache_hits} hits, {self.cache_misses} misses")
+
+
+_speech_worker = None
+_speech_worker_lock = threading.Lock()
+
+
+def get_speech_worker(rate=None):
+    """
+    Returns the process-wide SpeechWorker, starting it on first use.
+
+    Args:
+        rate (int): Speech rate in words per minute; applied to the running worker as well
+            (from its next phrase on). None keeps the current rate (200 for a new worker).
+
+    Raises:
+        RuntimeError: If the text-to-speech engine cannot be created.
+    """
+    global _speech_worker
+    with _speech_worker_lock:
+        if _speech_worker is None:
+            worker = SpeechWorker(rate=rate or 200)
+            worker.start()
+            _speech_worker = worker
+        elif rate is not None:
+            _speech_worker.rate = rate
+    return _speech_worker